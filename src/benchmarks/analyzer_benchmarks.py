@@ -0,0 +1,98 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+SkillAnalyzer benchmarks.
+
+Usage (from the repository root):
+    PYTHONPATH=src/jarvis python src/benchmarks/analyzer_benchmarks.py
+
+Every result is printed as a JSON line.
+"""
+
+import json
+import time
+import random
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from jarvis.settings import ANALYZER
+from jarvis.skills.skills_registry import SKILLS
+from jarvis.skills.skill_analyzer import SkillAnalyzer
+
+FILLER_WORDS = ['jarvis', 'please', 'can', 'you', 'me', 'the', 'tell', 'what', 'is', 'now']
+
+
+def create_transcripts(skills, size, seed=0):
+    """
+    Create transcripts of a random skill tag surrounded by filler words.
+    """
+    rand = random.Random(seed)
+    tags = [tag for skill in skills.values() for tag in sorted(skill['tags'])]
+    transcripts = []
+    for _ in range(size):
+        words = rand.sample(FILLER_WORDS, 3)
+        words.insert(rand.randint(0, len(words)), rand.choice(tags))
+        transcripts.append(' '.join(words))
+    return transcripts
+
+
+def bench_batch_throughput(analyzer, transcripts, batch_size):
+    """
+    Throughput (transcripts/sec) of extract() vs extract_many() in batches of batch_size.
+    """
+    start = time.perf_counter()
+    for transcript in transcripts:
+        analyzer.extract(transcript)
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(transcripts), batch_size):
+        analyzer.extract_many(transcripts[i: i + batch_size])
+    extract_many_seconds = time.perf_counter() - start
+
+    return {
+        'benchmark': 'batch_throughput',
+        'skills': len(analyzer.skills),
+        'transcripts': len(transcripts),
+        'batch_size': batch_size,
+        'extract_per_sec': len(transcripts) / extract_seconds,
+        'extract_many_per_sec': len(transcripts) / extract_many_seconds,
+    }
+
+
+def main():
+    analyzer = SkillAnalyzer(
+        weight_measure=TfidfVectorizer,
+        similarity_measure=cosine_similarity,
+        args=ANALYZER['args'],
+        skills_=SKILLS,
+        sensitivity=ANALYZER['sensitivity'])
+
+    transcripts = create_transcripts(SKILLS, size=2000)
+    for batch_size in (1, 10, 100, 1000):
+        print(json.dumps(bench_batch_throughput(analyzer, transcripts, batch_size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+SkillAnalyzer scaling benchmarks with synthetic skill registries.
+
+Usage (from the repository root):
+    PYTHONPATH=src/jarvis python src/benchmarks/analyzer_scaling_benchmarks.py \
+        --skills 10 100 1000 10000 50000 --backends sklearn inverted_index --output scaling.json
+
+Every configuration runs in a fresh process, so the resident memory of one index
+doesn't leak in the next one. Every result is printed as a JSON line and
+all the results are written to --output (JSON), for comparisons between
+backends and releases.
+"""
+
+import json
+import time
+import random
+import argparse
+import platform
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import psutil
+
+from jarvis.settings import ANALYZER
+from jarvis.skills.skill_analyzer import SkillAnalyzer
+from jarvis.skills.analyzer_backends import ANALYZER_BACKENDS
+from jarvis._version import __version__
+
+
+def create_vocabulary(size, rand):
+    vocabulary = set()
+    while len(vocabulary) < size:
+        vocabulary.add(''.join(rand.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rand.randint(3, 9))))
+    return sorted(vocabulary)
+
+
+def create_registry(skills, tags_per_skill=3, words_per_tag=2, seed=0):
+    """
+    Create a registry with the same shape as SKILLS (skill key --> enable/skill/tags/description).
+    """
+    rand = random.Random(seed)
+    vocabulary = create_vocabulary(max(100, skills * 2), rand)
+    registry = {}
+    for i in range(skills):
+        tags = {' '.join(rand.sample(vocabulary, rand.randint(1, words_per_tag))) for _ in range(tags_per_skill)}
+        registry['skill_{0}'.format(i)] = {
+            'enable': True,
+            'skill': None,
+            'tags': tags,
+            'description': 'Synthetic skill {0}'.format(i),
+        }
+    return registry, vocabulary
+
+
+def create_transcripts(registry, vocabulary, size, words, seed=1):
+    """
+    Create transcripts of 'words' words, a tag of a random skill and random vocabulary words.
+    """
+    rand = random.Random(seed)
+    skills = list(registry.values())
+    transcripts = []
+    for _ in range(size):
+        transcript = rand.choice(sorted(rand.choice(skills)['tags'])).split()[:words]
+        transcript += rand.sample(vocabulary, words - len(transcript))
+        rand.shuffle(transcript)
+        transcripts.append(' '.join(transcript))
+    return transcripts
+
+
+def run_configuration(backend, skills, tags_per_skill, transcript_words, queries, batch_size):
+    """
+    Benchmark one configuration (runs in its own process).
+    """
+    process = psutil.Process()
+    registry, vocabulary = create_registry(skills, tags_per_skill=tags_per_skill)
+    transcripts = create_transcripts(registry, vocabulary, queries, transcript_words)
+    weight_measure, similarity_measure = ANALYZER_BACKENDS[backend]()
+
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+    analyzer = SkillAnalyzer(weight_measure=weight_measure,
+                             similarity_measure=similarity_measure,
+                             args=ANALYZER['args'],
+                             skills_=registry,
+                             sensitivity=ANALYZER['sensitivity'])
+    fit_seconds = time.perf_counter() - start
+    rss_after = process.memory_info().rss
+
+    latencies = []
+    for transcript in transcripts:
+        start = time.perf_counter()
+        analyzer.extract(transcript)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(transcripts), batch_size):
+        analyzer.extract_many(transcripts[i: i + batch_size])
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'benchmark': 'analyzer_scaling',
+        'backend': backend,
+        'skills': skills,
+        'tags_per_skill': tags_per_skill,
+        'transcript_words': transcript_words,
+        'queries': queries,
+        'batch_size': batch_size,
+        'fit_seconds': fit_seconds,
+        'query_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'query_p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'batch_per_sec': len(transcripts) / batch_seconds,
+        'index_rss_mb': (rss_after - rss_before) / 2. ** 20,
+        'rss_mb': process.memory_info().rss / 2. ** 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skills', type=int, nargs='+', default=[10, 100, 1000, 10000, 50000])
+    parser.add_argument('--tags-per-skill', type=int, nargs='+', default=[3])
+    parser.add_argument('--transcript-words', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--backends', nargs='+', default=sorted(ANALYZER_BACKENDS), choices=sorted(ANALYZER_BACKENDS))
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--output', help='JSON file of all the results')
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backends:
+        for skills in args.skills:
+            for tags_per_skill in args.tags_per_skill:
+                for transcript_words in args.transcript_words:
+                    with ProcessPoolExecutor(max_workers=1) as executor:
+                        result = executor.submit(run_configuration, backend, skills, tags_per_skill,
+                                                 transcript_words, args.queries, args.batch_size).result()
+                    print(json.dumps(result))
+                    results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'version': __version__,
+                       'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'analyzer_args': ANALYZER['args'],
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
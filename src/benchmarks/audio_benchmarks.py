@@ -0,0 +1,227 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Audio benchmarks: wave chunks vs raw PCM chunks per utterance, the FLAC compression
+(ratio, encode CPU, bytes on the wire) and the CPU cost of the capture resampling
+per second of audio.
+
+Usage (from the repository root):
+    PYTHONPATH=src/jarvis python src/benchmarks/audio_benchmarks.py
+
+Every result is printed as a JSON line.
+"""
+
+import json
+import time
+import random
+
+import numpy as np
+
+from jarvis.settings import SPEECH_RECOGNITION
+from jarvis.engines.audio_capture import CaptureBuffer
+from jarvis.engines.resampler import PolyphaseResampler
+from jarvis.engines.flac_encoder import FlacChunkEncoder
+from jarvis.engines.stt import STTVernacularEngine
+
+from vernacular.vernacular import KaldiServeClient
+from vernacular.vernacular_pb2 import RecognizeRequest
+
+SAMPLE_WIDTH = 2  # paInt16
+
+
+def create_chunks(sample_rate, channels, chunk_size, seconds, seed=0):
+    """
+    Create random PCM chunks (bytes, as read from the input stream) worth `seconds` seconds.
+    """
+    rand = random.Random(seed)
+    chunk_bytes = chunk_size * channels * SAMPLE_WIDTH
+    return [bytes(rand.getrandbits(8) for _ in range(chunk_bytes))
+            for _ in range(int(sample_rate / chunk_size * seconds))]
+
+
+def create_voice_chunks(sample_rate, chunk_size, seconds, seed=0):
+    """
+    Create voice-like PCM chunks (harmonics of a gliding pitch, syllable envelope, background noise).
+    Random bytes don't compress, this is closer to what the FLAC encoder gets.
+    """
+    rand = np.random.RandomState(seed)
+    t = np.arange(int(sample_rate * seconds)) / float(sample_rate)
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None)
+    samples = (3000 * envelope * voice + rand.normal(0, 30, len(t))).astype(np.int16)
+    chunk_bytes = chunk_size * SAMPLE_WIDTH
+    data = samples.tobytes()
+    return [data[i:i + chunk_bytes] for i in range(0, len(data), chunk_bytes)]
+
+
+def stream_utterance(chunks, audio_format, capture_buffer, sample_rate, channels):
+    """
+    Capture the chunks, create and serialize the requests, as the engine does for one utterance.
+    :return: the bytes on the wire
+    """
+    capture_buffer.reset()
+    captured = (capture_buffer.append(chunk) for chunk in chunks)
+    if audio_format == 'wav':
+        captured = (STTVernacularEngine._raw_bytes_to_wav(chunk, sample_rate, channels, SAMPLE_WIDTH)
+                    for chunk in captured)
+    wire_bytes = 0
+    for config, audio in STTVernacularEngine._audio_params(captured, audio_format):
+        wire_bytes += len(RecognizeRequest(config=config, audio=audio, uuid='').SerializeToString())
+    return wire_bytes
+
+
+def bench_audio_format(audio_format, utterances=200):
+    """
+    Wire bytes and CPU time per utterance of the audio format.
+    """
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    channels = SPEECH_RECOGNITION['num_channels']
+    seconds = SPEECH_RECOGNITION['max_audio_length']
+    chunks = create_chunks(sample_rate, channels, SPEECH_RECOGNITION['chunk_size'], seconds)
+    capture_buffer = CaptureBuffer(sum(len(chunk) for chunk in chunks))
+
+    start = time.process_time()
+    for _ in range(utterances):
+        wire_bytes = stream_utterance(chunks, audio_format, capture_buffer, sample_rate, channels)
+    cpu_seconds = time.process_time() - start
+
+    return {
+        'benchmark': 'audio_format',
+        'audio_format': audio_format,
+        'utterance_seconds': seconds,
+        'chunks': len(chunks),
+        'pcm_bytes': sum(len(chunk) for chunk in chunks),
+        'wire_bytes_per_utterance': wire_bytes,
+        'cpu_ms_per_utterance': 1000 * cpu_seconds / utterances,
+    }
+
+
+def bench_config_once(seconds=30, chunk_size=800, utterances=20):
+    """
+    Wire bytes and CPU time of a long utterance (of small chunks), with the config
+    in every request vs only in the first one.
+    """
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    channels = SPEECH_RECOGNITION['num_channels']
+    chunks = create_chunks(sample_rate, channels, chunk_size, seconds)
+    results = {}
+    for config_once in (False, True):
+        start = time.process_time()
+        for _ in range(utterances):
+            if config_once:
+                audio = (STTVernacularEngine._create_audio(chunk, 'raw') for chunk in chunks)
+                requests = KaldiServeClient._config_once_requests(STTVernacularEngine._create_config(), audio, '')
+            else:
+                requests = (RecognizeRequest(config=config, audio=audio, uuid='')
+                            for config, audio in STTVernacularEngine._audio_params(chunks, 'raw'))
+            wire_bytes = sum(len(request.SerializeToString()) for request in requests)
+        results[config_once] = wire_bytes, 1000 * (time.process_time() - start) / utterances
+
+    return {
+        'benchmark': 'config_once',
+        'utterance_seconds': seconds,
+        'requests': len(chunks),
+        'wire_bytes_per_utterance': results[False][0],
+        'config_once_wire_bytes_per_utterance': results[True][0],
+        'cpu_ms_per_utterance': results[False][1],
+        'config_once_cpu_ms_per_utterance': results[True][1],
+    }
+
+
+def bench_flac(compression_level, seconds=4, chunk_size=800, utterances=50):
+    """
+    Compression ratio, encode CPU and bytes on the wire per utterance of the FLAC format, vs raw PCM.
+    """
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    chunks = create_voice_chunks(sample_rate, chunk_size, seconds)
+    raw_wire_bytes = sum(len(RecognizeRequest(config=config, audio=audio, uuid='').SerializeToString())
+                         for config, audio in STTVernacularEngine._audio_params(chunks, 'raw'))
+
+    start = time.process_time()
+    for _ in range(utterances):
+        encoder = FlacChunkEncoder(sample_rate, compression_level=compression_level)
+        parts = [part for part in map(encoder.encode, chunks) if part] + [encoder.finish()]
+        wire_bytes = sum(len(RecognizeRequest(config=config, audio=audio, uuid='').SerializeToString())
+                         for config, audio in STTVernacularEngine._audio_params(parts, 'flac'))
+    cpu_seconds = time.process_time() - start
+
+    report = encoder.report()
+    return {
+        'benchmark': 'flac',
+        'compression_level': compression_level,
+        'utterance_seconds': seconds,
+        'compression_ratio': report['compression_ratio'],
+        'encode_cpu_ms_per_utterance': report['encode_cpu_ms'],
+        'cpu_ms_per_utterance': 1000 * cpu_seconds / utterances,
+        'wire_bytes_per_utterance': wire_bytes,
+        'raw_wire_bytes_per_utterance': raw_wire_bytes,
+    }
+
+
+def bench_resampler(device_rate, device_channels, seconds=10, chunk_ms=100):
+    """
+    CPU time of the downmixing & resampling to the recognizer rate, per second of audio.
+    """
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    chunk_size = int(device_rate * chunk_ms / 1000)
+    chunks = create_chunks(device_rate, device_channels, chunk_size, seconds)
+    resampler = PolyphaseResampler(device_rate, sample_rate, device_channels)
+
+    start = time.process_time()
+    for chunk in chunks:
+        resampler.process(chunk)
+    cpu_seconds = time.process_time() - start
+
+    return {
+        'benchmark': 'resampler',
+        'device_rate': device_rate,
+        'device_channels': device_channels,
+        'sample_rate': sample_rate,
+        'chunk_ms': chunk_ms,
+        'taps_per_phase': resampler.taps_per_phase,
+        'cpu_ms_per_audio_sec': 1000 * cpu_seconds / (len(chunks) * chunk_size / float(device_rate)),
+    }
+
+
+def main():
+    results = [bench_audio_format(audio_format) for audio_format in ('wav', 'raw')]
+    for result in results:
+        print(json.dumps(result))
+
+    wav, raw = results
+    print(json.dumps({
+        'benchmark': 'audio_format_savings',
+        'wire_bytes_saved_per_utterance': wav['wire_bytes_per_utterance'] - raw['wire_bytes_per_utterance'],
+        'cpu_ms_saved_per_utterance': wav['cpu_ms_per_utterance'] - raw['cpu_ms_per_utterance'],
+    }))
+    print(json.dumps(bench_config_once()))
+    for compression_level in (0, 5, 8):
+        print(json.dumps(bench_flac(compression_level)))
+    for device_rate, device_channels in ((48000, 2), (44100, 2), (44100, 1), (16000, 1)):
+        print(json.dumps(bench_resampler(device_rate, device_channels)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Client-side overhead of STTVernacularEngine and KaldiServeClient, and the throughput of
+concurrent sessions with AsyncKaldiServeClient, against the fake KaldiServe server
+(in a separate process, so that only the client CPU time is measured).
+
+Usage (from the repository root):
+    PYTHONPATH=src/jarvis python src/benchmarks/vernacular_benchmarks.py
+
+Every result is printed as a JSON line.
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+
+from jarvis.engines.stt import STTVernacularEngine
+
+from vernacular.vernacular import KaldiServeClient
+from vernacular.aio import AsyncKaldiServeClient
+from vernacular.fake_server import FakeKaldiServeServicer, serve
+from audio_benchmarks import create_chunks, SAMPLE_WIDTH
+
+
+def run_server(port_queue, latency):
+    server, port = serve(FakeKaldiServeServicer(latency=latency), max_workers=200)
+    port_queue.put(port)
+    server.wait_for_termination()
+
+
+def recognize(client, chunks, mode, sample_rate, channels):
+    """
+    Send the utterance chunks as the engine does in the mode ('wav', 'raw' or 'config_once').
+    """
+    if mode == 'wav':
+        chunks = (STTVernacularEngine._raw_bytes_to_wav(chunk, sample_rate, channels, SAMPLE_WIDTH)
+                  for chunk in chunks)
+    if mode == 'config_once':
+        audio = (STTVernacularEngine._create_audio(chunk, 'raw') for chunk in chunks)
+        return client.streaming_recognize(STTVernacularEngine._create_config(), audio, uuid='', config_once=True)
+    audio_format = 'wav' if mode == 'wav' else 'raw'
+    return client.streaming_recognize_raw(STTVernacularEngine._audio_params(chunks, audio_format), uuid='')
+
+
+def bench_client_overhead(client, mode, chunks, utterances, sample_rate, channels):
+    """
+    Wall and client CPU time per utterance.
+    """
+    recognize(client, chunks, mode, sample_rate, channels)  # Warm up
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    for _ in range(utterances):
+        recognize(client, chunks, mode, sample_rate, channels)
+    wall_seconds, cpu_seconds = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+    return {
+        'benchmark': 'client_overhead',
+        'mode': mode,
+        'chunks': len(chunks),
+        'utterances': utterances,
+        'wall_ms_per_utterance': 1000 * wall_seconds / utterances,
+        'client_cpu_ms_per_utterance': 1000 * cpu_seconds / utterances,
+    }
+
+
+def bench_async_throughput(url, chunks, sessions, utterances_per_session, chunk_seconds):
+    """
+    Utterances/sec of `sessions` simultaneous audio sessions in one process (asyncio).
+    Every session streams its utterances one after the other, the chunks are paced
+    as a microphone produces them (`chunk_seconds`, 0: no pacing).
+    """
+    async def microphone():
+        for chunk in chunks:
+            if chunk_seconds:
+                await asyncio.sleep(chunk_seconds)
+            yield STTVernacularEngine._create_audio(chunk, 'raw')
+
+    async def session(client):
+        for _ in range(utterances_per_session):
+            await client.streaming_recognize(STTVernacularEngine._create_config(), microphone(), uuid='',
+                                             config_once=True)
+
+    async def run():
+        client = AsyncKaldiServeClient(url)
+        await client.wait_ready()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        await asyncio.gather(*[session(client) for _ in range(sessions)])
+        wall_seconds, cpu_seconds = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        await client.close()
+        return wall_seconds, cpu_seconds
+
+    loop = asyncio.new_event_loop()
+    try:
+        wall_seconds, cpu_seconds = loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+    utterances = sessions * utterances_per_session
+    return {
+        'benchmark': 'async_throughput',
+        'sessions': sessions,
+        'utterances': utterances,
+        'paced': bool(chunk_seconds),
+        'utterances_per_sec': utterances / wall_seconds,
+        'client_cpu_ms_per_utterance': 1000 * cpu_seconds / utterances,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utterances', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=2, help='Utterance length')
+    parser.add_argument('--chunk-size', type=int, default=800, help='Samples per chunk')
+    parser.add_argument('--sample-rate', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake server decode latency (sec)')
+    parser.add_argument('--sessions', default='1,10,50', help='Comma separated simultaneous async sessions')
+    parser.add_argument('--paced', action='store_true', help='Pace the async chunks in real time')
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=run_server, args=(port_queue, args.latency), daemon=True)
+    server.start()
+    url = 'localhost:{0}'.format(port_queue.get(timeout=30))
+    client = KaldiServeClient(url, health_check_interval=0)
+
+    chunks = create_chunks(args.sample_rate, 1, args.chunk_size, args.seconds)
+    try:
+        for mode in ('wav', 'raw', 'config_once'):
+            print(json.dumps(bench_client_overhead(client, mode, chunks, args.utterances, args.sample_rate, 1)))
+        chunk_seconds = args.chunk_size / float(args.sample_rate) if args.paced else 0
+        for sessions in map(int, args.sessions.split(',')):
+            print(json.dumps(bench_async_throughput(url, chunks, sessions, max(args.utterances // sessions, 1),
+                                                    chunk_seconds)))
+    finally:
+        client.close()
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Wake word benchmarks: the CPU usage of the detector (per core) and its false accept rate
+on a replay corpus of speech without the wake word, along with the detection rate of the
+wake word, for a few thresholds.
+
+The default corpus is synthetic (formant "words"), a recorded corpus is replayed with --corpus:
+    <corpus>/templates/*.wav  the enrolled samples of the wake word
+    <corpus>/positive/*.wav   utterances of the wake word
+    <corpus>/negative/*.wav   speech/noise without the wake word (the longer the better)
+
+Usage (from the repository root):
+    PYTHONPATH=src/jarvis python src/benchmarks/wake_word_benchmarks.py [--corpus DIR]
+
+Every result is printed as a JSON line.
+"""
+
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from jarvis.settings import SPEECH_RECOGNITION
+from jarvis.engines.wake_word import WakeWordDetector, read_wav
+
+WAKE_WORD = [(700, 1200), (300, 2300), (500, 900)]  # Formant (F1, F2) trajectory of the synthetic wake word
+VOWELS = [(700, 1200), (300, 2300), (500, 900), (600, 1800), (350, 800), (450, 1600), (650, 1000), (300, 1400)]
+
+
+def synthesize_word(formants, sample_rate, seconds=0.6, pitch=120, gain=1.0, seed=0):
+    """
+    A voiced "word" (16 bit PCM): harmonics of a pitch contour, shaped by a gliding formant trajectory.
+    """
+    rand = np.random.RandomState(seed)
+    n = int(sample_rate * seconds)
+    t = np.arange(n) / float(sample_rate)
+    f0 = pitch * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    position = np.linspace(0, len(formants) - 1, n)
+    f1 = np.interp(position, np.arange(len(formants)), [f for f, _ in formants])
+    f2 = np.interp(position, np.arange(len(formants)), [f for _, f in formants])
+    signal = np.zeros(n)
+    for k in range(1, 30):
+        amplitude = np.exp(-((k * f0 - f1) / 150.0) ** 2) + 0.6 * np.exp(-((k * f0 - f2) / 200.0) ** 2) + 0.02
+        signal += amplitude * np.sin(k * phase) / np.sqrt(k)
+    envelope = np.sqrt(np.sin(np.pi * np.linspace(0, 1, n)))
+    return (4000 * gain * envelope * signal / np.abs(signal).max() + rand.normal(0, 30, n)).astype(np.int16)
+
+
+def synthetic_corpus(sample_rate, negative_seconds=600, positives=50, seed=0):
+    """
+    :return: tuple (templates, positives, negatives), lists of 16 bit PCM (bytes)
+    """
+    rand = np.random.RandomState(seed)
+    templates = [synthesize_word(WAKE_WORD, sample_rate, 0.55 + 0.05 * i, 110 + 10 * i, seed=i).tobytes()
+                 for i in range(3)]
+
+    def silence(seconds):
+        return rand.normal(0, 30, int(sample_rate * seconds)).astype(np.int16)
+
+    positive = [np.concatenate((silence(0.5),
+                                synthesize_word(WAKE_WORD, sample_rate, rand.uniform(0.45, 0.8), rand.uniform(90, 160),
+                                                rand.uniform(0.3, 1.5), seed=rand.randint(1 << 30)),
+                                silence(0.5))).tobytes()
+                for _ in range(positives)]
+
+    # Random words of 2 - 4 vowels, in phrases, the words that contain the wake word trajectory are excluded
+    negative, length = [], 0
+    while length < negative_seconds * sample_rate:
+        formants = [VOWELS[i] for i in rand.choice(len(VOWELS), rand.randint(2, 5))]
+        if any(formants[i:i + len(WAKE_WORD)] == WAKE_WORD for i in range(len(formants))):
+            continue
+        word = synthesize_word(formants, sample_rate, rand.uniform(0.25, 0.9), rand.uniform(90, 220),
+                               rand.uniform(0.3, 1.5), seed=rand.randint(1 << 30))
+        gap = silence(rand.choice([0.05, 0.2, 1.0]))
+        negative += [word, gap]
+        length += len(word) + len(gap)
+    return templates, positive, [np.concatenate(negative).tobytes()]
+
+
+def recorded_corpus(directory, sample_rate):
+    def read_all(name):
+        path = os.path.join(directory, name)
+        return [read_wav(os.path.join(path, f), sample_rate) for f in sorted(os.listdir(path)) if f.endswith('.wav')]
+
+    return read_all('templates'), read_all('positive'), read_all('negative')
+
+
+def replay(detector, streams, chunk_size):
+    """
+    Feed the streams in chunks (as read from the microphone).
+    :return: tuple (hits per stream, CPU seconds)
+    """
+    chunk_bytes = 2 * chunk_size
+    hits = []
+    start = time.process_time()
+    for stream in streams:
+        detector.reset()
+        hits.append(sum(detector.process(stream[i:i + chunk_bytes]) for i in range(0, len(stream), chunk_bytes)))
+    return hits, time.process_time() - start
+
+
+def bench_wake_word(templates, positives, negatives, threshold, chunk_size):
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    settings = SPEECH_RECOGNITION['wake_word']
+    detector = WakeWordDetector(sample_rate, threshold=threshold, step_ms=settings['step_ms'],
+                                energy_threshold=settings['energy_threshold'])
+    for template in templates:
+        detector.enroll(template)
+
+    negative_hits, negative_cpu = replay(detector, negatives, chunk_size)
+    negative_seconds = sum(len(stream) for stream in negatives) / (2.0 * sample_rate)
+    positive_hits, positive_cpu = replay(detector, positives, chunk_size)
+    positive_seconds = sum(len(stream) for stream in positives) / (2.0 * sample_rate)
+
+    cpu_count = os.cpu_count() or 1
+    core_usage = (negative_cpu + positive_cpu) / (negative_seconds + positive_seconds)
+    return {
+        'benchmark': 'wake_word',
+        'threshold': threshold,
+        'templates': len(templates),
+        'chunk_size': chunk_size,
+        'negative_audio_seconds': negative_seconds,
+        'false_accepts': sum(negative_hits),
+        'false_accepts_per_hour': 3600 * sum(negative_hits) / negative_seconds,
+        'detection_rate': sum(1 for hits in positive_hits if hits) / float(len(positives)),
+        'cpu_percent_per_core': 100 * core_usage,  # Of the one core the detector runs on
+        'cpu_percent_of_machine': 100 * core_usage / cpu_count,
+        'cpu_count': cpu_count,
+        'matchings_per_audio_sec': detector.matchings / (negative_seconds + positive_seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wake word benchmarks')
+    parser.add_argument('--corpus', help='Recorded corpus directory (default: synthetic corpus)')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.03, 0.05, 0.1, 0.15])
+    args = parser.parse_args()
+
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    corpus = recorded_corpus(args.corpus, sample_rate) if args.corpus else synthetic_corpus(sample_rate)
+    for threshold in args.thresholds:
+        print(json.dumps(bench_wake_word(*corpus, threshold=threshold,
+                                         chunk_size=SPEECH_RECOGNITION['vad']['chunk_size'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -28,12 +28,14 @@ from jarvis.utils.startup_utils import log
 
 
 class Controller:
-    def __init__(self, settings_, input_engine, analyzer, control_skills):
+    def __init__(self, settings_, input_engine, analyzer, control_skills, basic_skills=None):
         self.settings_ = settings_
         self.input_engine = input_engine
         self.skill_analyzer = analyzer
         self.control_skills = control_skills
+        self.basic_skills = basic_skills if basic_skills is not None else {}
         self.latest_voice_transcript = ''
+        self.latest_alternatives = []
         self.is_assistant_enabled = False
         self.to_execute = []
         self.execute_state = {
@@ -44,8 +46,14 @@ class Controller:
     def get_transcript(self):
         """
         Updates the latest_voice_transcript with the latest user input.
+        Engines with N-best results also update the latest_alternatives.
         """
-        self.latest_voice_transcript = self.input_engine.recognize_input()
+        if hasattr(self.input_engine, 'recognize_alternatives'):
+            self.latest_alternatives = self.input_engine.recognize_alternatives()
+            self.latest_voice_transcript = self.latest_alternatives[0]['transcript'] if self.latest_alternatives else ''
+        else:
+            self.latest_alternatives = []
+            self.latest_voice_transcript = self.input_engine.recognize_input()
 
     def wake_up_check(self):
         """
@@ -63,8 +71,15 @@ class Controller:
     def _ready_to_start(self):
         """
         Checks for enable tag and if exists return a boolean
+        Engines with a wake word detector check for the wake word locally, without the recognition.
         return: boolean
         """
+        if getattr(self.input_engine, 'wake_word_detector', None) is not None:
+            if self.input_engine.wait_for_wake_word():
+                self.execute_state = self.control_skills['enable_assistant']['skill']()
+                self.is_assistant_enabled = True
+            return
+
         self.get_transcript()
         transcript_words = self.latest_voice_transcript.split()
         enable_tag = set(transcript_words).intersection(
@@ -96,30 +111,58 @@ class SkillController(Controller):
     def get_skills(self):
         """
         This method identifies the active skills from the voice transcript and updates the skills state.
-        e.x. latest_voice_transcript='open youtube'
+        e.x. latest_voice_transcript='open youtube and tell me the time'
         Then, the to_execute will be the following:
-        to_execute={'voice_transcript': 'open youtube', 'tag': 'open', 'skill': Skills.open_website_in_browser}
+        to_execute=[{'voice_transcript': 'open youtube', 'skill': Skills.open_website_in_browser},
+                    {'voice_transcript': 'tell me the time', 'skill': Skills.tell_the_time}]
+        With many recognition alternatives, the transcript is the alternative that matches best to a skill.
         """
-        skill = self.skill_analyzer.extract(self.latest_voice_transcript)
-        if skill:
-            self.to_execute = {
-                'voice_transcript': self.latest_voice_transcript,
-                'skill': skill,
-            }
+        if len(self.latest_alternatives) > 1:
+            self.latest_voice_transcript, _, _ = self.skill_analyzer.extract_best(self.latest_alternatives)
+        intents = self.skill_analyzer.extract_intents(self.latest_voice_transcript)
+        self.to_execute = [{'voice_transcript': voice_transcript,
+                            'skill': skill,
+                            } for voice_transcript, skill in intents]
         logging.debug('to_execute : {0}'.format(self.to_execute))
 
+    def register_skill(self, skill_key, skill):
+        """
+        Register a new skill at runtime, it's routable at once if it's enabled.
+        e.x. register_skill('tell_a_joke', {'enable': True, 'skill': Skills.tell_a_joke, 'tags': {'joke'},
+                                            'description': 'Ask me to tell a joke'})
+        """
+        self.basic_skills[skill_key] = skill
+        if skill.get('enable', True):
+            self.skill_analyzer.add_skills({skill_key: skill})
+
+    def enable_skill(self, skill_key):
+        """
+        Make a registered skill routable.
+        """
+        skill = self.basic_skills[skill_key]
+        skill['enable'] = True
+        self.skill_analyzer.add_skills({skill_key: skill})
+
+    def disable_skill(self, skill_key):
+        """
+        Stop routing a registered skill.
+        """
+        self.basic_skills[skill_key]['enable'] = False
+        self.skill_analyzer.remove_skills([skill_key])
+
     def execute(self):
         """
-        Execute the user skill and empty skill for execution.
+        Execute the user skills and empty skills for execution.
         """
-        try:
-            if self.to_execute:
-                skill = self.to_execute['skill']['skill']
+        if not self.to_execute:
+            logging.debug("Not matched skills to execute")
+
+        for to_execute in self.to_execute:
+            try:
+                skill = to_execute['skill']['skill']
                 logging.debug('Execute skill {0}'.format(skill))
-                skill(**self.to_execute)
-            else:
-                logging.debug("Not matched skills to execute")
-        except Exception as e:
-            logging.debug(
-                "Error with the execution of skill with message {0}".format(e))
-        self.to_execute = {}
+                skill(**to_execute)
+            except Exception as e:
+                logging.debug(
+                    "Error with the execution of skill with message {0}".format(e))
+        self.to_execute = []
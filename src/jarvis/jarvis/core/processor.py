@@ -21,19 +21,20 @@
 # SOFTWARE.
 
 import time
+import logging
 
 import keyboard
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
 from jarvis.core.controller import SkillController
 from jarvis.utils.startup_utils import start_up
 from jarvis.settings import GENERAL_SETTINGS, ANALYZER, ROOT_LOG_CONF
-from jarvis.skills.skills_registry import CONTROL_SKILLS, SKILLS
+from jarvis.skills.skills_registry import CONTROL_SKILLS, BASIC_SKILLS, SKILLS
 from jarvis.skills.skill_analyzer import SkillAnalyzer
+from jarvis.skills.analyzer_model import AnalyzerModelStore
+from jarvis.skills.analyzer_backends import ANALYZER_BACKENDS
 from jarvis.settings import SPEECH_RECOGNITION
 from jarvis.engines import SPEECH_ENGINES
+from jarvis.engines.audio_capture import AudioCaptureError
 from jarvis.engines.tts import TTSEngine
 from jarvis.engines.ttt import TTTEngine
 from jarvis.core.nlp_processor import ResponseCreator
@@ -41,6 +42,8 @@ from jarvis.core.console_manager import ConsoleManager
 
 
 class Processor:
+    capture_retry_delay = 1  # In seconds, after a failure of the wake word loop
+
     def __init__(self):
         self.input_engine = SPEECH_ENGINES[SPEECH_RECOGNITION['recognizer']]()
 
@@ -50,24 +53,53 @@ class Processor:
             speech_response_enabled=GENERAL_SETTINGS['response_in_speech'])
         self.response_creator = ResponseCreator()
 
+        # The backend is loaded only if the model isn't stored (e.g the scikit-learn import)
         self.skill_analyzer = SkillAnalyzer(
-            weight_measure=TfidfVectorizer,
-            similarity_measure=cosine_similarity,
+            weight_measure=None,
+            similarity_measure=None,
+            backend=ANALYZER_BACKENDS[ANALYZER['backend']],
             args=ANALYZER['args'],
             skills_=SKILLS,
-            sensitivity=ANALYZER['sensitivity'])
+            sensitivity=ANALYZER['sensitivity'],
+            model_store=AnalyzerModelStore(ANALYZER['model_cache']) if ANALYZER['model_cache'] else None,
+            conjunctions=ANALYZER['conjunctions'],
+            fuzzy_fallback=ANALYZER['fuzzy_fallback'],
+            fuzzy_sensitivity=ANALYZER['fuzzy_sensitivity'],
+            cache_size=ANALYZER['cache_size'])
 
         self.skill_controller = SkillController(
             settings_=GENERAL_SETTINGS,
             input_engine=self.input_engine,
             analyzer=self.skill_analyzer,
             control_skills=CONTROL_SKILLS,
+            basic_skills=BASIC_SKILLS,
         )
 
     def run(self):
         start_up()
-        keyboard.add_hotkey(GENERAL_SETTINGS['wake_up_hotkey'], self._process)
-        keyboard.wait()
+        if getattr(self.input_engine, 'wake_word_detector', None) is not None:
+            self._wake_word_loop()
+        else:
+            keyboard.add_hotkey(GENERAL_SETTINGS['wake_up_hotkey'], self._process)
+            keyboard.wait()
+
+    def _wake_word_loop(self):
+        """
+        The wake word replaces the hotkey, every detection wakes the assistant up
+        (the microphone is owned by the detector between the utterances).
+        A microphone failure closes the capture, it's reopened by the next detection after a delay.
+        """
+        while True:
+            try:
+                if self.input_engine.wait_for_wake_word():
+                    self._process()
+            except AudioCaptureError as e:
+                logging.error('Audio capture failed with message: {0}, reopen the microphone'.format(e))
+                self.input_engine.capture.close()
+                time.sleep(self.capture_retry_delay)
+            except Exception as e:
+                logging.exception('Error in the wake word loop with message: {0}'.format(e))
+                time.sleep(self.capture_retry_delay)
 
     def _process(self):
         print('Assistant has woken up')
@@ -1,7 +1,9 @@
 from .stt import STTGoogleEngine, STTVernacularEngine
+from .file_stt import STTFileEngine
 
 
 SPEECH_ENGINES = {
     'vernacular': STTVernacularEngine,
     'google': STTGoogleEngine,
+    'file': STTFileEngine,
 }
@@ -0,0 +1,389 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import atexit
+import logging
+import threading
+
+import numpy as np
+import pyaudio
+
+from jarvis.engines.resampler import PolyphaseResampler
+
+
+class AudioCaptureError(Exception):
+    pass
+
+
+class CaptureBuffer:
+    """
+    Preallocated buffer of one utterance.
+    The captured chunks are copied once into it and are handed out as memoryviews,
+    so they stay valid until the buffer is reset for the next utterance.
+    """
+    def __init__(self, size):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self.length = 0
+
+    @property
+    def size(self):
+        return len(self._buffer)
+
+    @property
+    def data(self):
+        """
+        The captured audio so far (memoryview).
+        """
+        return self._view[:self.length]
+
+    def reset(self):
+        self.length = 0
+
+    def append(self, chunk):
+        """
+        Copy the chunk at the end of the buffer.
+        :param chunk: bytes-like
+        :return: memoryview of the chunk in the buffer
+        """
+        end = self.length + len(chunk)
+        if end > len(self._buffer):
+            self._grow(end)
+        self._view[self.length:end] = chunk
+        view = self._view[self.length:end]
+        self.length = end
+        return view
+
+    def _grow(self, min_size):
+        # A new buffer, the views already handed out keep the old one alive
+        buffer = bytearray(max(min_size, 2 * len(self._buffer)))
+        view = memoryview(buffer)
+        view[:self.length] = self._view[:self.length]
+        self._buffer, self._view = buffer, view
+
+
+class RingBuffer:
+    """
+    The latest `seconds` of 16 bit PCM, in a preallocated int16 array.
+    Every sample is written twice (at i and i + capacity), so the latest N samples are always
+    one contiguous slice of the array and they are handed out as a memoryview, without copying.
+    Memory footprint: 2 * seconds * sample_rate * channels * 2 bytes.
+    """
+    def __init__(self, seconds, sample_rate, channels=1):
+        self.channels = channels
+        self.capacity = int(seconds * sample_rate) * channels  # In samples
+        self._array = np.zeros(2 * self.capacity, dtype=np.int16)
+        self._end = 0  # Write position, in [0, capacity)
+        self.filled = 0
+
+    @property
+    def nbytes(self):
+        return self._array.nbytes
+
+    def clear(self):
+        self.filled = 0
+
+    def write(self, data):
+        """
+        :param data: bytes-like, 16 bit PCM (whole frames)
+        """
+        samples = np.frombuffer(data, dtype=np.int16)[-self.capacity:]
+        n = len(samples)
+        first = min(n, self.capacity - self._end)
+        for offset in (0, self.capacity):
+            self._array[offset + self._end:offset + self._end + first] = samples[:first]
+            self._array[offset:offset + n - first] = samples[first:]
+        self._end = (self._end + n) % self.capacity
+        self.filled = min(self.filled + n, self.capacity)
+
+    def latest(self, seconds=None, sample_rate=None):
+        """
+        The latest audio (all of it, or the latest `seconds`).
+        :return: memoryview (bytes) of the array, valid until the next write
+        """
+        n = self.filled
+        if seconds is not None:
+            n = min(n, int(seconds * sample_rate) * self.channels)
+        end = self._end + self.capacity
+        return memoryview(self._array[end - n:end]).cast('B')
+
+
+class AudioCaptureService:
+    """
+    Long-lived microphone capture.
+    It owns one PyAudio input stream for the process lifetime and hands out
+    utterance-scoped audio iterators. Device errors are handled here, by
+    reopening the stream.
+
+    With `preroll_seconds`, a pump thread keeps reading the stream between the utterances
+    into a ring buffer, and the latest `preroll_seconds` are prepended to the next utterance,
+    so the speech that starts before the activation (e.g. the hotkey) is not lost.
+
+    The stream may be opened at a different device format (`device_rate`, `device_channels`,
+    'native': the device default), the audio is then downmixed and resampled to the
+    (mono) `sample_rate`.
+    """
+    def __init__(self, sample_rate, channels, chunk_size, device_index=None, sample_format=pyaudio.paInt16,
+                 reopen_attempts=3, reopen_delay=0.5, preroll_seconds=0, device_rate=None, device_channels=None):
+        self.logger = logging
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunk_size = chunk_size  # In samples (frames), not bytes
+        self.device_index = device_index
+        self.device_rate = device_rate or sample_rate
+        self.device_channels = device_channels or channels
+        self._resampler = None
+        self.sample_format = sample_format
+        self.sample_width = pyaudio.get_sample_size(sample_format)
+        self.reopen_attempts = reopen_attempts
+        self.reopen_delay = reopen_delay
+        self._audio = None
+        self._stream = None
+        self._capture_buffer = None
+        self.last_capture = None  # Endpointer report of the last utterance
+        self.preroll = RingBuffer(preroll_seconds, sample_rate, channels) if preroll_seconds else None
+        self._lock = threading.RLock()
+        self._active = threading.Event()  # An utterance is captured, the pump waits
+        self._pump_stop = threading.Event()
+        self._pump = None
+        atexit.register(self.close)
+
+    def open(self):
+        """
+        Open the input stream, if it's not already open.
+        """
+        with self._lock:
+            if self._stream is not None:
+                return
+            if self._audio is None:
+                self._audio = pyaudio.PyAudio()
+            self._set_device_format()
+            self._stream = self._audio.open(
+                format=self.sample_format,
+                channels=self.device_channels,
+                rate=self.device_rate,
+                frames_per_buffer=self._device_chunk_size,
+                input_device_index=self.device_index,
+                input=True)
+            self.logger.info('Audio input stream opened (rate: {0}, channels: {1}, device: {2})'.format(
+                self.device_rate, self.device_channels, self.device_index))
+            if self.preroll is not None and self._pump is None:
+                self.logger.info('Audio pre-roll ring buffer: {0} bytes'.format(self.preroll.nbytes))
+                self._pump_stop = threading.Event()
+                self._pump = threading.Thread(target=self._pump_loop, args=(self._pump_stop,),
+                                              name='audio-preroll-pump', daemon=True)
+                self._pump.start()
+
+    def close(self):
+        """
+        Close the input stream and release PortAudio.
+        """
+        self._pump_stop.set()
+        with self._lock:
+            self._pump = None
+            self._close_stream()
+            if self._audio is not None:
+                self._audio.terminate()
+                self._audio = None
+
+    def utterance(self, seconds, endpointer=None):
+        """
+        Generate raw PCM chunks (of chunk_size samples) of the next `seconds` seconds.
+        The chunks are memoryviews of one capture buffer that is reused by the next utterance.
+        The audio that was buffered before the call is dropped.
+        :param seconds: float, the (max) utterance length
+        :param endpointer: Endpointer, ends the utterance early and trims the silence
+        (the chunks are of variable length)
+        """
+        self._active.set()
+        try:
+            with self._lock:
+                preroll = self._take_preroll()
+                capture_buffer = self._reset_capture_buffer(seconds + len(preroll) / self._bytes_per_second)
+                if endpointer is None:
+                    if preroll:
+                        yield preroll
+                    for _ in range(int(self.sample_rate / self.chunk_size * seconds)):
+                        yield capture_buffer.append(self._read())
+                    return
+
+                # The endpointer analyzes the utterance as one contiguous buffer, the pre-roll is copied in it
+                capture_buffer.append(preroll)
+                endpointer.reset()
+                for _ in range(int(self.sample_rate / self.chunk_size * seconds)):
+                    capture_buffer.append(self._read())
+                    chunk = endpointer.process(capture_buffer.data)
+                    if chunk:
+                        yield chunk
+                    if endpointer.done:
+                        break
+                else:
+                    chunk = endpointer.finish(capture_buffer.data)
+                    if chunk:
+                        yield chunk
+
+                report = endpointer.report(capture_buffer.data)
+                self.logger.info(
+                    'Utterance captured in {0:.2f} sec (max: {1} sec), {2:.2f} sec of audio sent'.format(
+                        report['capture_seconds'], seconds, report['sent_seconds']))
+                self.last_capture = report
+        finally:
+            if self.preroll is not None:
+                self.preroll.clear()
+            self._active.clear()
+
+    def wait_for(self, detector, timeout=None):
+        """
+        Feed the stream to the detector (e.g. WakeWordDetector) until it fires.
+        The pre-roll is kept up to date and it's cleared on a hit, so the next utterance
+        gets only the audio after the detection.
+        :param detector: object with process(data) --> bool and reset()
+        :param timeout: float, in seconds (None: no timeout)
+        :return: bool, False on timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        self._active.set()
+        try:
+            with self._lock:
+                detector.reset()
+                while deadline is None or time.time() < deadline:
+                    chunk = self._read()
+                    if self.preroll is not None:
+                        self.preroll.write(chunk)
+                    if detector.process(chunk):
+                        if self.preroll is not None:
+                            self.preroll.clear()
+                        return True
+                return False
+        finally:
+            self._active.clear()
+
+    @property
+    def _bytes_per_second(self):
+        return float(self.sample_rate * self.channels * self.sample_width)
+
+    def _take_preroll(self):
+        """
+        The pre-roll audio (a memoryview of the ring buffer, empty without pre-roll).
+        Without pre-roll the audio that was buffered before the activation is dropped.
+        """
+        if self.preroll is None:
+            self._drop_buffered_audio()
+            return memoryview(b'')
+        try:
+            available = self._stream.get_read_available() if self._stream else 0
+            if available:
+                self.preroll.write(self._convert(self._stream.read(available, exception_on_overflow=False)))
+        except OSError as e:
+            self.logger.warning('Audio input error with message: {0}'.format(e))
+            self._close_stream()
+        return self.preroll.latest()
+
+    def _pump_loop(self, stop):
+        """
+        Keep the pre-roll ring buffer up to date between the utterances.
+        """
+        while not stop.is_set():
+            if self._active.is_set():
+                time.sleep(0.01)
+                continue
+            try:
+                with self._lock:
+                    if self._active.is_set() or stop.is_set():
+                        continue
+                    self.preroll.write(self._read())
+            except AudioCaptureError as e:
+                self.logger.warning('Audio pre-roll error with message: {0}'.format(e))
+                stop.wait(self.reopen_delay)
+
+    def _reset_capture_buffer(self, seconds):
+        size = int(self.sample_rate * seconds) * self.channels * self.sample_width
+        if self._capture_buffer is None or self._capture_buffer.size < size:
+            self._capture_buffer = CaptureBuffer(size)
+        self._capture_buffer.reset()
+        return self._capture_buffer
+
+    def _read(self):
+        """
+        Read one chunk, reopen the stream in case of device error.
+        """
+        for attempt in range(self.reopen_attempts + 1):
+            try:
+                self.open()
+                return self._convert(self._stream.read(self._device_chunk_size, exception_on_overflow=False))
+            except OSError as e:
+                self.logger.warning('Audio input error with message: {0}, reopen the stream (attempt {1})'.format(
+                    e, attempt + 1))
+                self._close_stream()
+                time.sleep(self.reopen_delay * (attempt + 1))
+        raise AudioCaptureError('Unable to read from the audio input device {0}'.format(self.device_index))
+
+    @property
+    def _device_chunk_size(self):
+        return int(round(self.chunk_size * float(self.device_rate) / self.sample_rate))
+
+    def _set_device_format(self):
+        """
+        Resolve the 'native' device format and create the resampler (if the formats differ).
+        """
+        if 'native' in (self.device_rate, self.device_channels):
+            info = self._audio.get_device_info_by_index(self.device_index) if self.device_index is not None \
+                else self._audio.get_default_input_device_info()
+            if self.device_rate == 'native':
+                self.device_rate = int(info['defaultSampleRate'])
+            if self.device_channels == 'native':
+                self.device_channels = min(int(info['maxInputChannels']), 2)
+
+        if (self.device_rate, self.device_channels) == (self.sample_rate, self.channels):
+            self._resampler = None
+        elif self.channels != 1:
+            raise AudioCaptureError('The resampled audio is mono, the channels should be 1 (not {0})'.format(
+                self.channels))
+        else:
+            # A new stream, no history from the previous one
+            self._resampler = PolyphaseResampler(self.device_rate, self.sample_rate, self.device_channels)
+            self.logger.info('Audio resampling {0} Hz ({1} channels) --> {2} Hz'.format(
+                self.device_rate, self.device_channels, self.sample_rate))
+
+    def _convert(self, data):
+        return self._resampler.process(data) if self._resampler else data
+
+    def _drop_buffered_audio(self):
+        try:
+            self.open()
+            available = self._stream.get_read_available()
+            if available:
+                self._stream.read(available, exception_on_overflow=False)
+        except OSError as e:
+            self.logger.warning('Audio input error with message: {0}'.format(e))
+            self._close_stream()
+
+    def _close_stream(self):
+        if self._stream is None:
+            return
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        except OSError as e:
+            self.logger.debug('Audio input stream close error with message: {0}'.format(e))
+        self._stream = None
@@ -0,0 +1,236 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Batch transcription of recorded audio with the vernacular (Kaldi serve) recognizer.
+
+Usage (from src/jarvis):
+    python -m jarvis.engines.file_stt recordings/ call.wav -
+    arecord -f S16_LE -r 8000 | python -m jarvis.engines.file_stt -
+
+Every transcript and the throughput report are printed as JSON lines.
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import logging
+import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from jarvis.settings import SPEECH_RECOGNITION
+from jarvis.engines.stt import STTEngine, STTVernacularEngine
+from jarvis.engines.resampler import PolyphaseResampler
+
+STDIN = '-'
+AUDIO_EXTENSIONS = ('.wav', '.raw', '.pcm')
+SAMPLE_WIDTH = 2  # 16 bit PCM
+
+
+class STTFileEngine(STTEngine):
+    """
+    Speech To Text Engine (STT) of recorded audio, for regression runs and batch jobs.
+    The inputs (wave or raw PCM files, directories of them, or stdin) are streamed to the
+    Kaldi serve as fast as it decodes them (not in real time), `concurrency` streams at a time.
+    The wave files of another sample rate (or stereo) are resampled to the recognizer format.
+    A file stream lasts as long as its audio, so it has its own deadline (none by default), and it
+    isn't retried once it started (the sent audio is not kept for a replay).
+    """
+
+    def __init__(self, inputs=None, concurrency=None, chunk_size=None, client=None):
+        settings = SPEECH_RECOGNITION['file']
+        self.logger = logging
+        self.inputs = list(settings['inputs'] if inputs is None else inputs)
+        self.concurrency = concurrency or settings['concurrency']
+        self.chunk_size = chunk_size or settings['chunk_size']  # In samples
+        self.sample_rate = SPEECH_RECOGNITION['sample_rate']
+        self.channels = SPEECH_RECOGNITION['num_channels']
+        self.client = client or STTVernacularEngine._create_client(
+            deadline=settings['deadline'], max_replay_requests=settings['max_replay_requests'])
+        self.last_report = None  # Throughput report of the last batch
+        self._next_sources = None
+
+    def recognize_input(self):
+        """
+        The transcript of the next input ('' once all the inputs are transcribed).
+        """
+        alternatives = self.recognize_alternatives()
+        return alternatives[0]['transcript'] if alternatives else ''
+
+    def recognize_alternatives(self):
+        """
+        The N-best alternatives of the next input, one input per call.
+        :return: list of dicts (transcript, confidence, am_score, lm_score)
+        """
+        if self._next_sources is None:
+            self._next_sources = self.sources()
+        source = next(self._next_sources, None)
+        return self._transcribe(source)['alternatives'] if source is not None else []
+
+    def sources(self):
+        """
+        The inputs, with the directories expanded to their audio files (recursively, sorted).
+        """
+        for path in self.inputs:
+            if path != STDIN and os.path.isdir(path):
+                for root, directories, files in os.walk(path):
+                    directories.sort()
+                    for name in sorted(files):
+                        if name.lower().endswith(AUDIO_EXTENSIONS):
+                            yield os.path.join(root, name)
+            else:
+                yield path
+
+    def transcribe(self, sources=None):
+        """
+        Transcribe the inputs, `concurrency` streams at a time.
+        The throughput (audio seconds per wall second) is in `last_report` once all are transcribed.
+        :param sources: iterable of paths (default: the inputs)
+        :return: generator of dicts (source, transcript, alternatives, audio_seconds, seconds, error),
+        in the input order
+        """
+        sources = self.sources() if sources is None else sources
+        start = time.perf_counter()
+        totals = _BatchTotals()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = collections.deque()
+            for source in sources:
+                pending.append(executor.submit(self._transcribe, source))
+                # The files are read lazily, only the results of the running streams are held
+                if len(pending) >= 2 * self.concurrency:
+                    yield totals.add(pending.popleft().result())
+            while pending:
+                yield totals.add(pending.popleft().result())
+        self.last_report = self._report(totals, time.perf_counter() - start)
+
+    def _report(self, totals, wall_seconds):
+        audio_seconds = totals.audio_seconds
+        report = {
+            'files': totals.files,
+            'errors': totals.errors,
+            'audio_seconds': audio_seconds,
+            'wall_seconds': wall_seconds,
+            'throughput': audio_seconds / wall_seconds if wall_seconds else 0.0,  # Audio sec per wall sec
+            'concurrency': self.concurrency,
+            'latency_mean': totals.seconds / totals.files if totals.files else 0.0,  # Sec per file
+            'latency_max': totals.max_seconds,
+        }
+        self.logger.info('Transcribed {0} files ({1:.1f} sec of audio) in {2:.1f} sec, {3:.1f}x real time'.format(
+            report['files'], audio_seconds, wall_seconds, report['throughput']))
+        return report
+
+    def _transcribe(self, source):
+        start = time.perf_counter()
+        result = {'source': source, 'transcript': '', 'alternatives': [], 'audio_seconds': 0.0, 'error': None}
+        streamed = [0]  # PCM bytes
+
+        def count(chunks):
+            for chunk in chunks:
+                streamed[0] += len(chunk)
+                yield chunk
+
+        try:
+            audio_params = STTVernacularEngine._audio_params(count(self._read_chunks(source)), 'raw')
+            response = self.client.streaming_recognize_raw(audio_params, uuid=os.path.basename(source))
+            output = STTVernacularEngine._parse_response(response)
+            result['alternatives'] = output[0] if output else []
+            result['transcript'] = result['alternatives'][0]['transcript'] if result['alternatives'] else ''
+        except Exception as e:
+            self.logger.warning('Transcription of {0} failed with message: {1}'.format(source, e))
+            result['error'] = str(e)
+        result['audio_seconds'] = streamed[0] / float(self.sample_rate * self.channels * SAMPLE_WIDTH)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    def _read_chunks(self, source):
+        """
+        Generate the PCM chunks (of chunk_size samples, in the recognizer format) of the input.
+        The wave files are detected by their header, anything else is raw PCM in the recognizer format.
+        """
+        f = sys.stdin.buffer if source == STDIN else open(source, 'rb')
+        try:
+            if f.peek(4)[:4] == b'RIFF':
+                wav = wave.open(f, 'rb')
+                if wav.getsampwidth() != SAMPLE_WIDTH:
+                    raise ValueError('16 bit PCM is supported, not {0} bit'.format(8 * wav.getsampwidth()))
+                rate, channels, read = wav.getframerate(), wav.getnchannels(), wav.readframes
+            else:
+                rate, channels = self.sample_rate, self.channels
+                read = lambda frames: f.read(frames * channels * SAMPLE_WIDTH)
+
+            resampler = None
+            if (rate, channels) != (self.sample_rate, self.channels):
+                resampler = PolyphaseResampler(rate, self.sample_rate, channels)
+            frame_bytes = channels * SAMPLE_WIDTH
+            frames = int(round(self.chunk_size * float(rate) / self.sample_rate))
+            while True:
+                data = read(frames)
+                data = data[:len(data) - len(data) % frame_bytes]
+                if not data:
+                    return
+                yield resampler.process(data) if resampler else data
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+
+
+class _BatchTotals(object):
+    """
+    Running totals of the transcribed files, so a batch of any size is reported in constant memory.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.errors = 0
+        self.audio_seconds = 0.0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, result):
+        self.files += 1
+        self.errors += 1 if result['error'] else 0
+        self.audio_seconds += result['audio_seconds']
+        self.seconds += result['seconds']
+        self.max_seconds = max(self.max_seconds, result['seconds'])
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch transcription of recorded audio')
+    parser.add_argument('inputs', nargs='*', help="Wave/raw PCM files, directories, '-': stdin "
+                                                  "(default: the settings)")
+    parser.add_argument('--concurrency', type=int, help='Parallel streams (default: the settings)')
+    args = parser.parse_args()
+
+    engine = STTFileEngine(inputs=args.inputs or None, concurrency=args.concurrency)
+    for result in engine.transcribe():
+        result.pop('alternatives')
+        print(json.dumps(result), flush=True)
+    print(json.dumps(dict(engine.last_report, report='throughput')))
+    engine.client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+
+import numpy as np
+
+try:
+    import pyflac
+except ImportError:  # Optional, only the 'flac' audio format needs it
+    pyflac = None
+
+
+class FlacChunkEncoder:
+    """
+    Streaming FLAC encoder of 16 bit PCM chunks (one per utterance).
+    The first encoded bytes carry the FLAC stream header, the rest are FLAC frames,
+    so the concatenation of the outputs is one FLAC stream.
+    The encoder emits whole blocks (of `blocksize` samples), the rest is flushed by finish().
+    """
+    def __init__(self, sample_rate, channels=1, compression_level=5, blocksize=1024):
+        if pyflac is None:
+            raise ImportError("The 'flac' audio format requires pyFLAC (pip install pyFLAC)")
+        self.channels = channels
+        self.pcm_bytes = 0
+        self.encoded_bytes = 0
+        self.cpu_seconds = 0.0
+        self._output = []
+        self._encoder = pyflac.StreamEncoder(sample_rate=sample_rate,
+                                             write_callback=self._write,
+                                             compression_level=compression_level,
+                                             blocksize=blocksize)
+
+    def encode(self, chunk):
+        """
+        :param chunk: bytes-like, 16 bit PCM
+        :return: bytes, the FLAC data encoded so far (may be empty)
+        """
+        start = time.thread_time()
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels)
+        self._encoder.process(samples)
+        self.pcm_bytes += len(chunk)
+        return self._flush(start)
+
+    def finish(self):
+        """
+        :return: bytes, the rest of the FLAC data
+        """
+        start = time.thread_time()
+        self._encoder.finish()
+        return self._flush(start)
+
+    def report(self):
+        return {
+            'pcm_bytes': self.pcm_bytes,
+            'encoded_bytes': self.encoded_bytes,
+            'compression_ratio': self.pcm_bytes / float(self.encoded_bytes) if self.encoded_bytes else None,
+            'encode_cpu_ms': 1000 * self.cpu_seconds,
+        }
+
+    def _write(self, buffer, num_bytes, num_samples, current_frame):
+        self._output.append(bytes(buffer))
+
+    def _flush(self, start):
+        data = b''.join(self._output)
+        self._output = []
+        self.encoded_bytes += len(data)
+        self.cpu_seconds += time.thread_time() - start
+        return data
@@ -0,0 +1,109 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+
+
+class MicrophoneNotFoundError(Exception):
+    pass
+
+
+def select_microphone(names, microphone=None):
+    """
+    Select the microphone of the settings.
+    :param names: list of str, the device names (by device index)
+    :param microphone: None (the default device), int (device index) or str (case-insensitive part of the name)
+    :return: tuple (device index or None, device name or None)
+    """
+    if microphone is None:
+        return None, None
+    if isinstance(microphone, int):
+        if not 0 <= microphone < len(names):
+            raise MicrophoneNotFoundError('No microphone with index {0} (devices: {1})'.format(
+                microphone, len(names)))
+        return microphone, names[microphone]
+    for index, name in enumerate(names):
+        if microphone.lower() in name.lower():
+            return index, name
+    raise MicrophoneNotFoundError("No microphone named '{0}' in: {1}".format(microphone, ', '.join(names)))
+
+
+def device_key(index, name):
+    """
+    The calibration profile key of the device.
+    """
+    return name if name is not None else 'default' if index is None else 'device-{0}'.format(index)
+
+
+class CalibrationProfiles:
+    """
+    Microphone calibration profiles (energy threshold, dynamic energy ratio), keyed by device,
+    persisted in one JSON file.
+    """
+    def __init__(self, path):
+        self.logger = logging
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        """
+        :return: dict (energy_threshold, dynamic_energy_ratio, updated) or None
+        """
+        return self._load_all().get(key)
+
+    def save(self, key, energy_threshold, dynamic_energy_ratio):
+        """
+        Store the profile of the device, the file is replaced atomically.
+        """
+        with self._lock:
+            profiles = self._load_all()
+            profiles[key] = {
+                'energy_threshold': energy_threshold,
+                'dynamic_energy_ratio': dynamic_energy_ratio,
+                'updated': time.time(),
+            }
+            try:
+                directory = os.path.dirname(self.path) or '.'
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(profiles, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self.logger.warning('Unable to save microphone calibration with message: {0}'.format(e))
+                return
+        self.logger.debug("Microphone calibration of '{0}' saved in {1}".format(key, self.path))
+
+    def _load_all(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning('Unable to load microphone calibration with message: {0}'.format(e))
+            return {}
@@ -0,0 +1,89 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+
+import numpy as np
+
+
+def design_lowpass(up, down, zero_crossings=8, rolloff=0.9, beta=8.0):
+    """
+    Windowed-sinc (Kaiser) low-pass FIR of the up/down resampling, at the upsampled rate.
+    The cutoff is `rolloff` * the lower Nyquist frequency, the gain is `up` (zero stuffing).
+    :return: ndarray (float64), of length zero_crossings * 2 * max(up, down) + 1
+    """
+    cutoff = rolloff * 0.5 / max(up, down)  # In cycles per upsampled sample
+    length = 2 * zero_crossings * max(up, down) + 1
+    n = np.arange(length) - (length - 1) / 2.0
+    return up * 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+
+
+class PolyphaseResampler:
+    """
+    Stateful rational resampler (and downmixer) of 16 bit PCM chunks.
+    The FIR is split in `up` phases, so every output sample costs one dot product of
+    len(filter) / up taps, computed for all the output samples of a chunk at once.
+    The input history (and the output phase) is kept across chunks, so the output of
+    a chunked stream is the same as the output of the whole stream.
+    """
+    def __init__(self, input_rate, output_rate, channels=1, zero_crossings=8):
+        divisor = math.gcd(int(input_rate), int(output_rate))
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.channels = channels
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+        taps = design_lowpass(self.up, self.down, zero_crossings)
+        self.taps_per_phase = -(-len(taps) // self.up)
+        taps = np.concatenate([taps, np.zeros(self.taps_per_phase * self.up - len(taps))])
+        # polyphase[p, k] = taps[p + up * k], the coefficient of the input sample base - k
+        self.polyphase = taps.reshape(self.taps_per_phase, self.up).T.astype(np.float32)
+        self._offsets = np.arange(self.taps_per_phase)
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._inputs = 0  # Input samples (frames) so far
+        self._outputs = 0  # Output samples so far
+
+    def process(self, data):
+        """
+        :param data: bytes-like, 16 bit PCM of `channels` channels
+        :return: bytes, mono 16 bit PCM at output_rate
+        """
+        samples = np.frombuffer(data, dtype=np.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        signal = np.concatenate([self._history, samples.astype(np.float32)])
+        self._inputs += len(samples)
+
+        # Output n is built from the input samples up to base(n) = n * down // up
+        end = (self._inputs * self.up + self.down - 1) // self.down
+        outputs = np.arange(self._outputs, end, dtype=np.int64)
+        base = outputs * self.down // self.up - (self._inputs - len(signal))
+        phase = outputs * self.down % self.up
+        window = signal[base[:, np.newaxis] - self._offsets]
+        resampled = np.einsum('nk,nk->n', window, self.polyphase[phase])
+
+        self._outputs = end
+        self._history = signal[len(signal) - len(self._history):]
+        return np.clip(np.rint(resampled), -32768, 32767).astype(np.int16).tobytes()
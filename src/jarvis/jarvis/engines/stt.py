@@ -21,19 +21,24 @@
 # SOFTWARE.
 
 import io
+import time
 import logging
 import wave
 import abc
+import threading
 import traceback
 from pprint import pprint
 
-import pyaudio
 import grpc
 import speech_recognition as sr
 
 from jarvis.utils.console_utils import user_input, clear
-from jarvis.engines.recognizer import UnknownValueError
-from jarvis.settings import SPEECH_RECOGNITION
+from jarvis.settings import SPEECH_RECOGNITION, KALDI_SERVE
+from jarvis.engines.audio_capture import AudioCaptureService
+from jarvis.engines.vad import VoiceActivityDetector, Endpointer
+from jarvis.engines.flac_encoder import FlacChunkEncoder
+from jarvis.engines.wake_word import WakeWordDetector
+from jarvis.engines.microphone import CalibrationProfiles, select_microphone, device_key
 
 from vernacular.vernacular import KaldiServeClient
 from vernacular.vernacular_pb2 import RecognitionConfig, RecognizeRequest, RecognitionAudio
@@ -49,20 +54,31 @@ class STTEngine(abc.ABC):
 class STTGoogleEngine(STTEngine):
     """
     Speech To Text Engine (STT)
+    The microphone is selected by the settings, its persisted calibration profile is
+    reused on startup and the calibration is refreshed in the background.
     """
 
-    def __init__(self, pause_threshold, energy_theshold, ambient_duration,
-                 dynamic_energy_threshold):
+    def __init__(self, pause_threshold=None, energy_theshold=None, ambient_duration=None,
+                 dynamic_energy_threshold=None, microphone=None, calibration_profiles=None,
+                 calibration_refresh_interval=None):
         self.logger = logging
         self.sr = sr
         self.speech_recognizer = sr.Recognizer()
+        self.speech_recognizer.pause_threshold = self._setting(pause_threshold, 'pause_threshold')
+        self.speech_recognizer.energy_threshold = self._setting(energy_theshold, 'energy_threshold')
+        self.speech_recognizer.dynamic_energy_threshold = self._setting(dynamic_energy_threshold,
+                                                                        'dynamic_energy_threshold')
+        self.ambient_duration = self._setting(ambient_duration, 'ambient_duration')
         self.dynamic_energy_ratio = self.speech_recognizer.dynamic_energy_ratio
-        self.dynamic_energy_threshold = self.speech_recognizer.energy_threshold
-        self.microphone = self._set_microphone(
-            pause_threshold=pause_threshold,
-            energy_threshold=energy_theshold,
-            ambient_duration=ambient_duration,
-            dynamic_energy_threshold=dynamic_energy_threshold)
+        self.microphone_lock = threading.Lock()  # The microphone is used by one of listen/calibration
+        self.microphone, self.device_key = self._set_microphone(self._setting(microphone, 'microphone'))
+
+        profiles_path = self._setting(calibration_profiles, 'calibration_profiles')
+        self.profiles = CalibrationProfiles(profiles_path) if profiles_path else None
+        self._load_calibration()
+        threading.Thread(target=self._calibration_loop,
+                         args=(self._setting(calibration_refresh_interval, 'calibration_refresh_interval'),),
+                         name='microphone-calibration', daemon=True).start()
 
     def recognize_input(self):
         """
@@ -85,7 +101,7 @@ class STTGoogleEngine(STTEngine):
         """
         self._update_microphone_noise_level()
 
-        with self.microphone as source:
+        with self.microphone_lock, self.microphone as source:
             audio_text = self.speech_recognizer.listen(source)
         return audio_text
 
@@ -94,20 +110,31 @@ class STTGoogleEngine(STTEngine):
         Update microphone variables in assistant state.
         """
         self.dynamic_energy_ratio = self.speech_recognizer.dynamic_energy_ratio  # Update dynamic energy ratio
-        self.energy_threshold = self.speech_recognizer.dynamic_energy_threshold  # Update microphone energy threshold
+        self.energy_threshold = self.speech_recognizer.energy_threshold  # Update microphone energy threshold
 
         self.logger.debug("Dynamic energy ration value is: {0}".format(
             self.dynamic_energy_ratio))
         self.logger.debug("Energy threshold is: {0}".format(
             self.energy_threshold))
 
-    def _set_microphone(self, pause_threshold, energy_threshold,
-                        ambient_duration, dynamic_energy_threshold):
+    @staticmethod
+    def _setting(value, key):
+        return SPEECH_RECOGNITION[key] if value is None else value
+
+    def _set_microphone(self, microphone):
         """
-        Setup the assistant microphone.
+        Setup the assistant microphone, by the settings (or ask the user, with 'ask').
+        :return: tuple (sr.Microphone, calibration profile key)
         """
         microphone_list = self.sr.Microphone.list_microphone_names()
-
+        if microphone == 'ask':
+            index, name = self._ask_microphone(microphone_list)
+        else:
+            index, name = select_microphone(microphone_list, microphone)
+        self.logger.info('Microphone: {0} (index: {1})'.format(name or 'default', index))
+        return self.sr.Microphone(device_index=index, chunk_size=512), device_key(index, name)
+
+    def _ask_microphone(self, microphone_list):
         clear()
         print("=" * 48)
         print("Microphone Setup")
@@ -128,92 +155,260 @@ class STTGoogleEngine(STTEngine):
             index = input(
                 "Please select a number between choices[1-{0}]: ".format(
                     len(microphone_list)))
+        return select_microphone(microphone_list, int(index))
 
-        with self.sr.Microphone(
-                device_index=int(index), chunk_size=512) as source:
-            self.speech_recognizer.pause_threshold = pause_threshold
-            self.speech_recognizer.energy_threshold = energy_threshold
-
-            clear()
-            print("-" * 48)
-            print("Microphone Calibration")
-            print("-" * 48)
-
-            print("Please wait.. for {} seconds ".format(ambient_duration))
-            self.speech_recognizer.adjust_for_ambient_noise(
-                source, duration=ambient_duration)
-            self.speech_recognizer.dynamic_energy_threshold = dynamic_energy_threshold
-            print("Microphone calibrated successfully!")
-
-            return source
+    def _load_calibration(self):
+        """
+        Reuse the calibration profile of the microphone (if any), without blocking the startup.
+        """
+        profile = self.profiles.load(self.device_key) if self.profiles else None
+        if profile:
+            self.speech_recognizer.energy_threshold = profile['energy_threshold']
+            self.speech_recognizer.dynamic_energy_ratio = profile['dynamic_energy_ratio']
+            self.logger.info("Microphone calibration of '{0}' loaded (energy threshold: {1:.0f})".format(
+                self.device_key, profile['energy_threshold']))
+
+    def _calibration_loop(self, refresh_interval):
+        """
+        Calibrate the microphone when it's idle, and then every `refresh_interval` seconds (0: once).
+        """
+        while True:
+            while not self._calibrate():
+                time.sleep(1)
+            if not refresh_interval:
+                return
+            time.sleep(refresh_interval)
+
+    def _calibrate(self):
+        """
+        Adjust the energy threshold to the ambient noise and persist the calibration profile.
+        :return: bool, False if the microphone is in use
+        """
+        if not self.microphone_lock.acquire(blocking=False):
+            return False
+        try:
+            recognizer = self.sr.Recognizer()
+            recognizer.energy_threshold = self.speech_recognizer.energy_threshold
+            recognizer.dynamic_energy_ratio = self.speech_recognizer.dynamic_energy_ratio
+            with self.microphone as source:
+                recognizer.adjust_for_ambient_noise(source, duration=self.ambient_duration)
+        except OSError as e:
+            self.logger.warning('Microphone calibration error with message: {0}'.format(e))
+            return True
+        finally:
+            self.microphone_lock.release()
+
+        self.speech_recognizer.energy_threshold = recognizer.energy_threshold
+        self.logger.debug('Microphone calibrated (energy threshold: {0:.0f})'.format(recognizer.energy_threshold))
+        if self.profiles:
+            self.profiles.save(self.device_key, recognizer.energy_threshold, recognizer.dynamic_energy_ratio)
+        return True
 
 
 class STTVernacularEngine(STTEngine):
     def __init__(self, *args, **kwargs):
-        self.client = KaldiServeClient()
+        self.logger = logging
+        self.client = self._create_client()
+        self.capture_end = None
+        self.flac_encoder = None
+        self.last_upload = None  # Upload report of the last utterance
+        self.endpointer = self._create_endpointer() if SPEECH_RECOGNITION['endpointing'] == 'vad' else None
+        self.capture = self._create_capture(
+            SPEECH_RECOGNITION['vad']['chunk_size'] if self.endpointer else SPEECH_RECOGNITION['chunk_size'])
+        self.wake_word_detector = self._create_wake_word_detector() \
+            if SPEECH_RECOGNITION['wake_word']['enabled'] else None
+        self.capture.open()
 
     def recognize_input(self):
         """
         Capture the words from the recorded audio (audio stream --> free text).
         """
+        alternatives = self.recognize_alternatives()
+        return alternatives[0]['transcript'] if alternatives else ''
+
+    def wait_for_wake_word(self, timeout=None):
+        """
+        Listen (locally) until the wake word is detected.
+        :return: bool, False on timeout
+        """
+        return self.capture.wait_for(self.wake_word_detector, timeout)
+
+    def recognize_alternatives(self):
+        """
+        Capture the N-best alternatives from the recorded audio, the most likely first.
+        :return: list of dicts (transcript, confidence, am_score, lm_score)
+        """
+        self.capture_end = None  # Set once the utterance is captured
         audio_chunks = self._record()
         response = {}
-        encoding = RecognitionConfig.AudioEncoding.LINEAR16
+
+        audio_format = SPEECH_RECOGNITION['audio_format']
 
         try:
-            print('streaming raw')
-            config = lambda chunk_len: RecognitionConfig(
-                sample_rate_hertz=SPEECH_RECOGNITION['sample_rate'],
-                encoding=encoding,
-                language_code=SPEECH_RECOGNITION['language_code'],
-                max_alternatives=5,
-                model=SPEECH_RECOGNITION['model'],
-                raw=True,
-                data_bytes=chunk_len
-            )
-            audio_params = [(config(len(chunk)),
-                             RecognitionAudio(content=chunk))
-                            for chunk in audio_chunks]
-            response = self.client.streaming_recognize_raw(
-                audio_params, uuid="")
+            # Everything is lazy, the chunks are sent while the microphone is still capturing
+            if SPEECH_RECOGNITION['config_once']:
+                audio = (self._create_audio(chunk, audio_format) for chunk in audio_chunks)
+                response = self.client.streaming_recognize(
+                    self._create_config(audio_format=audio_format), self._mark_capture_end(audio), uuid="",
+                    config_once=True)
+            else:
+                audio_params = self._audio_params(audio_chunks, audio_format)
+                response = self.client.streaming_recognize_raw(
+                    self._mark_capture_end(audio_params), uuid="")
+            if self.capture_end is not None:
+                self.logger.info('Transcript received {0:.3f} sec after the end of the capture'.format(
+                    time.perf_counter() - self.capture_end))
+            self._report_upload(audio_format)
         except Exception as e:
             traceback.print_exc()
 
-        output = self._parse_response(response)
-        return output[0][0]['transcript']
+        output = self._parse_response(response) if response else []
+        return output[0] if output else []
 
     def _record(self):
         """
-        Generate wave audio chunks from microphone worth `secs` seconds.
+        Generate audio chunks from microphone worth `max_audio_length` seconds, or until
+        the trailing silence with the VAD endpointing.
+        'raw' format: memoryviews of the capture buffer, 'wav' format: standalone wave chunks,
+        'flac' format: the parts of one FLAC stream.
+        """
+        if self.endpointer:
+            chunks = self.capture.utterance(SPEECH_RECOGNITION['vad']['max_audio_length'], self.endpointer)
+        else:
+            chunks = self.capture.utterance(SPEECH_RECOGNITION['max_audio_length'])
+        if SPEECH_RECOGNITION['audio_format'] == 'raw':
+            return chunks
+        if SPEECH_RECOGNITION['audio_format'] == 'flac':
+            return self._encode_flac(chunks)
+        return (self._raw_bytes_to_wav(chunk, self.capture.sample_rate, self.capture.channels,
+                                       self.capture.sample_width) for chunk in chunks)
+
+    def _encode_flac(self, chunks):
+        """
+        Encode the utterance as one FLAC stream, the encoded parts are generated as soon as
+        the encoder emits them.
+        """
+        settings = SPEECH_RECOGNITION['flac']
+        self.flac_encoder = FlacChunkEncoder(sample_rate=self.capture.sample_rate,
+                                             channels=self.capture.channels,
+                                             compression_level=settings['compression_level'],
+                                             blocksize=settings['blocksize'])
+        for chunk in chunks:
+            data = self.flac_encoder.encode(chunk)
+            if data:
+                yield data
+        data = self.flac_encoder.finish()
+        if data:
+            yield data
+
+    def _report_upload(self, audio_format):
+        """
+        Log the bytes on the wire of the utterance (and the FLAC compression).
         """
+        report = dict(self.client.last_stream or {}, audio_format=audio_format)
+        if audio_format == 'flac' and self.flac_encoder:
+            report.update(self.flac_encoder.report())
+            self.logger.info('FLAC upload: {0} --> {1} bytes (ratio: {2:.2f}), encode cpu: {3:.2f} ms'.format(
+                report['pcm_bytes'], report['encoded_bytes'], report['compression_ratio'] or 0,
+                report['encode_cpu_ms']))
+        self.logger.info('Utterance upload: {0} bytes on the wire ({1} requests)'.format(
+            report.get('wire_bytes'), report.get('requests')))
+        self.last_upload = report
+
+    def _mark_capture_end(self, requests):
+        for request in requests:
+            yield request
+        self.capture_end = time.perf_counter()
 
-        p = pyaudio.PyAudio()
-        sample_format = pyaudio.paInt16
-        sample_rate = SPEECH_RECOGNITION['sample_rate']
-        channels = SPEECH_RECOGNITION['num_channels']
+    @staticmethod
+    def _create_client(**overrides):
+        """
+        :param overrides: KALDI_SERVE settings of this client (e.g. deadline)
+        """
+        settings = dict(KALDI_SERVE, **overrides)
+        return KaldiServeClient(kaldi_serve_url=settings['backends'],
+                                ready_timeout=settings['ready_timeout'],
+                                deadline=settings['deadline'],
+                                keepalive_time_ms=settings['keepalive_time_ms'],
+                                keepalive_timeout_ms=settings['keepalive_timeout_ms'],
+                                reconnect_attempts=settings['reconnect_attempts'],
+                                backoff=settings['backoff'],
+                                max_backoff=settings['max_backoff'],
+                                eject_after_failures=settings['eject_after_failures'],
+                                eject_seconds=settings['eject_seconds'],
+                                health_check_interval=settings['health_check_interval'],
+                                max_replay_requests=settings['max_replay_requests'])
+
+    @staticmethod
+    def _create_capture(chunk_size):
+        return AudioCaptureService(
+            sample_rate=SPEECH_RECOGNITION['sample_rate'],
+            channels=SPEECH_RECOGNITION['num_channels'],
+            chunk_size=chunk_size,
+            device_index=SPEECH_RECOGNITION['input_device_index'],
+            preroll_seconds=SPEECH_RECOGNITION['preroll'],
+            device_rate=SPEECH_RECOGNITION['device_sample_rate'],
+            device_channels=SPEECH_RECOGNITION['device_channels'])
 
-        # This is in samples not seconds
-        chunk_size = 4000
+    @staticmethod
+    def _create_wake_word_detector():
+        settings = SPEECH_RECOGNITION['wake_word']
+        detector = WakeWordDetector(sample_rate=SPEECH_RECOGNITION['sample_rate'],
+                                    threshold=settings['threshold'],
+                                    step_ms=settings['step_ms'],
+                                    energy_threshold=settings['energy_threshold'])
+        detector.load_templates(settings['templates'])
+        return detector
 
-        stream = p.open(
-            format=sample_format,
-            channels=channels,
-            rate=sample_rate,
-            frames_per_buffer=chunk_size,
-            input=True)
+    @staticmethod
+    def _create_endpointer():
+        settings = SPEECH_RECOGNITION['vad']
+        vad = VoiceActivityDetector(sample_rate=SPEECH_RECOGNITION['sample_rate'],
+                                    channels=SPEECH_RECOGNITION['num_channels'],
+                                    frame_ms=settings['frame_ms'],
+                                    energy_threshold=settings['energy_threshold'],
+                                    zcr_threshold=settings['zcr_threshold'])
+        return Endpointer(vad,
+                          trailing_silence=settings['trailing_silence'],
+                          padding=settings['padding'],
+                          no_speech_timeout=settings['no_speech_timeout'])
 
-        sample_width = p.get_sample_size(sample_format)
+    @staticmethod
+    def _audio_params(audio_chunks, audio_format):
+        """
+        Generate (config, audio) pairs of the chunks.
+        The config depends only on the chunk length, so it's created once per length
+        (once per utterance for the fixed size raw chunks).
+        """
+        configs = {}
+        for chunk in audio_chunks:
+            config = configs.get(len(chunk))
+            if config is None:
+                config = configs[len(chunk)] = STTVernacularEngine._create_config(len(chunk), audio_format)
+            yield config, STTVernacularEngine._create_audio(chunk, audio_format)
 
-        for _ in range(
-                0,
-                int(sample_rate / chunk_size *
-                    SPEECH_RECOGNITION['max_audio_length'])):
-            yield self._raw_bytes_to_wav(
-                stream.read(chunk_size), sample_rate, channels, sample_width)
+    @staticmethod
+    def _create_config(data_bytes=0, audio_format='raw'):
+        """
+        The recognition config, `data_bytes` 0 (with config sent once): every chunk is of its content length.
+        """
+        flac = audio_format == 'flac'
+        return RecognitionConfig(
+            sample_rate_hertz=SPEECH_RECOGNITION['sample_rate'],
+            encoding=RecognitionConfig.AudioEncoding.FLAC if flac else RecognitionConfig.AudioEncoding.LINEAR16,
+            language_code=SPEECH_RECOGNITION['language_code'],
+            max_alternatives=5,
+            model=SPEECH_RECOGNITION['model'],
+            raw=not flac,
+            data_bytes=data_bytes
+        )
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+    @staticmethod
+    def _create_audio(chunk, audio_format):
+        # Protobuf bytes fields don't accept a memoryview, so the raw path isn't zero-copy: every chunk is
+        # copied into the capture buffer and once more here. It saves the per-chunk wave file, not the copies.
+        content = bytes(chunk) if audio_format == 'raw' else chunk
+        return RecognitionAudio(content=content)
 
     @staticmethod
     def _raw_bytes_to_wav(data: bytes, frame_rate: int, channels: int,
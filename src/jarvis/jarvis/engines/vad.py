@@ -0,0 +1,145 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    Frame level speech detection of 16 bit PCM, with short-time energy (RMS)
+    and zero-crossing rate features.
+    A frame is speech if it's loud, or if it's quieter but noisy like the unvoiced
+    consonants (s, f, t ..) that have low energy and high zero-crossing rate.
+    """
+    def __init__(self, sample_rate, channels=1, frame_ms=20, energy_threshold=400, zcr_threshold=0.3,
+                 low_energy_ratio=0.25):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_length = int(sample_rate * frame_ms / 1000)  # In samples (per channel)
+        self.frame_bytes = self.frame_length * channels * 2
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.low_energy_ratio = low_energy_ratio
+
+    def features(self, data):
+        """
+        Energy and zero-crossing rate of every complete frame of the data.
+        :param data: bytes-like, 16 bit PCM
+        :return: tuple of ndarrays (rms, zcr)
+        """
+        n_frames = len(data) // self.frame_bytes
+        samples = np.frombuffer(data, dtype=np.int16, count=n_frames * self.frame_length * self.channels)
+        frames = samples.reshape(n_frames, self.frame_length, self.channels).astype(np.float32).mean(axis=2)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(max(self.frame_length - 1, 1))
+        return rms, zcr
+
+    def is_speech(self, data):
+        """
+        Speech flag of every complete frame of the data.
+        :param data: bytes-like, 16 bit PCM
+        :return: ndarray of bool
+        """
+        rms, zcr = self.features(data)
+        return (rms >= self.energy_threshold) | \
+               ((rms >= self.energy_threshold * self.low_energy_ratio) & (zcr >= self.zcr_threshold))
+
+
+class Endpointer:
+    """
+    Ends an utterance after `trailing_silence` seconds of silence that follow speech,
+    or after `no_speech_timeout` seconds without speech.
+
+    It's fed the whole utterance audio captured so far (contiguous) and returns the
+    part that is ready to be sent: the leading silence is dropped and the silent frames
+    are held back until speech resumes, so the trailing silence is never sent.
+    `padding` seconds of silence are kept around the speech.
+    """
+    def __init__(self, vad, trailing_silence=0.6, padding=0.2, no_speech_timeout=3):
+        self.vad = vad
+        self.trailing_silence_frames = self._seconds_to_frames(trailing_silence)
+        self.padding_frames = self._seconds_to_frames(padding)
+        self.no_speech_timeout_frames = self._seconds_to_frames(no_speech_timeout)
+        self.reset()
+
+    def reset(self):
+        self.done = False
+        self._analyzed_frames = 0
+        self._speech_start = None  # First speech frame
+        self._speech_end = None  # Frame after the last speech frame
+        self._first = 0  # First byte to send
+        self._sent = 0  # Bytes sent until
+
+    def process(self, data):
+        """
+        Analyze the new frames of the utterance audio.
+        :param data: memoryview, the utterance audio captured so far
+        :return: memoryview, the audio ready to be sent (may be empty)
+        """
+        frame_bytes = self.vad.frame_bytes
+        n_frames = len(data) // frame_bytes
+        if n_frames > self._analyzed_frames:
+            speech = self.vad.is_speech(data[self._analyzed_frames * frame_bytes:n_frames * frame_bytes])
+            speech_frames = np.flatnonzero(speech)
+            if speech_frames.size:
+                if self._speech_start is None:
+                    self._speech_start = self._analyzed_frames + int(speech_frames[0])
+                    self._first = self._sent = max(self._speech_start - self.padding_frames, 0) * frame_bytes
+                self._speech_end = self._analyzed_frames + int(speech_frames[-1]) + 1
+            self._analyzed_frames = n_frames
+
+        if self._speech_start is None:
+            self.done = n_frames >= self.no_speech_timeout_frames
+            return data[:0]
+        if n_frames - self._speech_end >= self.trailing_silence_frames:
+            self.done = True
+            return self.finish(data)
+        return self._send(data, self._speech_end * frame_bytes)
+
+    def finish(self, data):
+        """
+        End of the utterance.
+        :return: memoryview, the rest of the speech with its trailing padding
+        """
+        self.done = True
+        if self._speech_start is None:
+            return data[:0]
+        return self._send(data, (self._speech_end + self.padding_frames) * self.vad.frame_bytes)
+
+    def report(self, data):
+        """
+        Duration (in seconds) of the captured and the sent audio of the utterance.
+        """
+        bytes_per_second = float(self.vad.sample_rate * self.vad.channels * 2)
+        return {
+            'capture_seconds': len(data) / bytes_per_second,
+            'sent_seconds': (self._sent - self._first) / bytes_per_second,
+        }
+
+    def _send(self, data, end):
+        end = min(end, len(data))
+        start, self._sent = self._sent, max(end, self._sent)
+        return data[start:max(end, start)]
+
+    def _seconds_to_frames(self, seconds):
+        return int(round(seconds * self.vad.sample_rate / self.vad.frame_length))
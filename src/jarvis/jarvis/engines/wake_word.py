@@ -0,0 +1,306 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import time
+import wave
+import logging
+import argparse
+
+import numpy as np
+
+from jarvis.engines.resampler import PolyphaseResampler
+
+
+class MfccExtractor:
+    """
+    Mel-frequency cepstral coefficients of 16 bit PCM (mono), in NumPy.
+    The cepstral coefficient c0 (the frame energy) is dropped, so the features don't depend
+    on the input gain, the frame RMS is returned along with them.
+    """
+    def __init__(self, sample_rate, frame_ms=25, hop_ms=10, n_filters=26, n_mfcc=13, preemphasis=0.97):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.hop_length = int(sample_rate * hop_ms / 1000)
+        self.preemphasis = preemphasis
+        self.n_fft = 1 << (self.frame_length - 1).bit_length()
+        self.window = np.hamming(self.frame_length).astype(np.float32)
+        self.filterbank = self._mel_filterbank(sample_rate, self.n_fft, n_filters)
+        # DCT-II of the log filterbank energies, c1 .. c(n_mfcc - 1)
+        k = np.arange(1, n_mfcc)[:, np.newaxis]
+        n = np.arange(n_filters)[np.newaxis, :]
+        self.dct = np.cos(np.pi * k * (2 * n + 1) / (2.0 * n_filters)).astype(np.float32)
+
+    def features(self, samples):
+        """
+        MFCCs of every complete frame of the samples.
+        Every frame is pre-emphasized with the sample before it, so the frames need
+        `frame_length + 1` samples.
+        :param samples: ndarray of float32
+        :return: tuple of ndarrays (mfcc (frames, n_mfcc - 1), rms (frames,))
+        """
+        span = self.frame_length + 1
+        n_frames = max(0, 1 + (len(samples) - span) // self.hop_length)
+        if not n_frames:
+            return np.zeros((0, self.dct.shape[0]), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        strides = (samples.strides[0] * self.hop_length, samples.strides[0])
+        frames = np.lib.stride_tricks.as_strided(samples, (n_frames, span), strides)
+        rms = np.sqrt(np.mean(frames[:, 1:] * frames[:, 1:], axis=1))
+        emphasized = frames[:, 1:] - self.preemphasis * frames[:, :-1]
+        power = np.abs(np.fft.rfft(emphasized * self.window, self.n_fft)) ** 2
+        energies = np.log(np.dot(power, self.filterbank.T) + 1e-3)
+        return np.dot(energies, self.dct.T).astype(np.float32), rms
+
+    @staticmethod
+    def _mel_filterbank(sample_rate, n_fft, n_filters):
+        def to_mel(hz):
+            return 2595 * np.log10(1 + hz / 700.0)
+
+        def to_hz(mel):
+            return 700 * (10 ** (mel / 2595.0) - 1)
+
+        mels = np.linspace(to_mel(0), to_mel(sample_rate / 2.0), n_filters + 2)
+        bins = np.floor((n_fft + 1) * to_hz(mels) / sample_rate).astype(int)
+        filterbank = np.zeros((n_filters, n_fft // 2 + 1), dtype=np.float32)
+        for i in range(n_filters):
+            left, center, right = bins[i], bins[i + 1], bins[i + 2]
+            filterbank[i, left:center] = (np.arange(left, center) - left) / float(max(center - left, 1))
+            filterbank[i, center:right] = (right - np.arange(center, right)) / float(max(right - center, 1))
+        return filterbank
+
+
+def subsequence_dtw(template, stream, last_columns=1):
+    """
+    Distance of the template to its best match in the stream, that ends in the `last_columns` frames.
+    The features are unit vectors and the frame distance is the cosine distance.
+    The steps (1, 1), (1, 2) and (2, 1) bound the warping to 0.5x - 2x the template speed and need
+    only the previous two rows, so every row is computed at once (vectorized).
+    Every template frame is matched once, the path cost is normalized by the template length.
+    :param template: ndarray (T, features)
+    :param stream: ndarray (N, features)
+    :return: float, the mean frame distance of the best path (inf: no path)
+    """
+    cost = 1 - np.dot(template, stream.T)
+    previous2 = None
+    previous = cost[0]  # The match may start at any stream frame
+    for i in range(1, len(template)):
+        best = np.full(len(stream), np.inf, dtype=cost.dtype)
+        best[1:] = previous[:-1]
+        best[2:] = np.minimum(best[2:], previous[:-2])
+        if previous2 is not None:
+            best[1:] = np.minimum(best[1:], previous2[:-1] + cost[i - 1, 1:])
+        previous2, previous = previous, cost[i] + best
+    return float(previous[-last_columns:].min()) / len(template)
+
+
+class WakeWordDetector:
+    """
+    Keyword spotting of the wake word, by DTW template matching of MFCCs against a few
+    enrolled samples of the wake word.
+
+    It's fed the microphone audio continuously, the features are computed incrementally
+    and every `step_ms` the latest frames are matched against the templates. The matching
+    is skipped while the audio is quiet, so the detector is almost free between utterances.
+    """
+    def __init__(self, sample_rate, threshold=0.03, step_ms=100, energy_threshold=400, min_template_ms=200):
+        self.logger = logging
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.energy_threshold = energy_threshold
+        self.mfcc = MfccExtractor(sample_rate)
+        self.step_frames = max(1, int(step_ms * sample_rate / 1000) // self.mfcc.hop_length)
+        self.min_template_frames = int(min_template_ms * sample_rate / 1000) // self.mfcc.hop_length
+        self.templates = []
+        self.last_distance = None  # Of the latest matching
+        self.matchings = 0
+        self.processing_seconds = 0.0  # Spent in process()
+        self.audio_seconds = 0.0  # Fed to process()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the audio history (e.g. after a hit, or a gap in the stream).
+        """
+        self._pending = np.zeros(0, dtype=np.float32)  # The samples of the incomplete frames
+        self._features = np.zeros((0, self.mfcc.dct.shape[0]), dtype=np.float32)
+        self._rms = np.zeros(0, dtype=np.float32)
+        self._new_frames = 0
+
+    @property
+    def window_frames(self):
+        """
+        The stream frames that are matched, the slowest match of the longest template.
+        """
+        return 2 * max(len(template) for template in self.templates) + self.step_frames
+
+    def enroll(self, data):
+        """
+        Add a sample of the wake word as a template, the silence around the word is trimmed.
+        :param data: bytes-like, 16 bit PCM (mono) at the detector sample rate
+        :return: int, the template frames
+        """
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        if not len(samples):
+            raise ValueError('Empty wake word sample')
+        features, rms = self.mfcc.features(samples)
+        loud = np.flatnonzero(rms >= self.energy_threshold)
+        if len(loud) == 0 or loud[-1] + 1 - loud[0] < self.min_template_frames:
+            raise ValueError('No wake word in the sample (too short or too quiet)')
+        self.templates.append(self._normalize(features[loud[0]:loud[-1] + 1]))
+        return len(self.templates[-1])
+
+    def load_templates(self, directory):
+        """
+        Enroll the wave files (16 bit PCM) of the directory, they're resampled if needed.
+        :return: int, the number of the templates
+        """
+        directory = os.path.expanduser(directory)
+        names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+        for name in names:
+            if name.endswith('.wav'):
+                self.enroll(read_wav(os.path.join(directory, name), self.sample_rate))
+        if not self.templates:
+            raise ValueError('No wake word samples in {0}, enroll with: python -m jarvis.engines.wake_word'.format(
+                directory))
+        self.logger.info('Wake word templates loaded: {0} (from {1})'.format(len(self.templates), directory))
+        return len(self.templates)
+
+    def process(self, data):
+        """
+        Analyze the next chunk of the stream.
+        :param data: bytes-like, 16 bit PCM (mono) at the detector sample rate
+        :return: bool, True if the wake word ended in the chunk
+        """
+        if not self.templates:
+            raise ValueError('No wake word templates, enroll samples of the wake word first')
+        start = time.perf_counter()
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        self.audio_seconds += len(samples) / float(self.sample_rate)
+        hit = False
+        if len(samples):
+            hit = self._process(samples)
+        self.processing_seconds += time.perf_counter() - start
+        return hit
+
+    def report(self):
+        """
+        The CPU usage of the detector, as a fraction of one core.
+        """
+        return {
+            'audio_seconds': self.audio_seconds,
+            'processing_seconds': self.processing_seconds,
+            'core_usage': self.processing_seconds / self.audio_seconds if self.audio_seconds else 0.0,
+            'matchings': self.matchings,
+        }
+
+    def _process(self, samples):
+        pending = np.concatenate((self._pending, samples))
+        features, rms = self.mfcc.features(pending)
+        self._pending = pending[len(rms) * self.mfcc.hop_length:]
+        if not len(rms):
+            return False
+
+        window = self.window_frames
+        self._features = np.concatenate((self._features, self._normalize(features)))[-window:]
+        self._rms = np.concatenate((self._rms, rms))[-window:]
+        self._new_frames += len(rms)
+        if self._new_frames < self.step_frames:
+            return False
+
+        last_columns, self._new_frames = self._new_frames, 0
+        if self._rms.max() < self.energy_threshold:
+            return False
+        self.matchings += 1
+        self.last_distance = min(subsequence_dtw(template, self._features, min(last_columns, len(self._rms)))
+                                 for template in self.templates)
+        if self.last_distance > self.threshold:
+            return False
+        self.logger.debug('Wake word detected (distance: {0:.3f})'.format(self.last_distance))
+        self.reset()
+        return True
+
+    @staticmethod
+    def _normalize(features):
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return features / np.maximum(norms, 1e-6)
+
+
+def read_wav(path, sample_rate):
+    """
+    Read a wave file (16 bit PCM) as mono 16 bit PCM at the sample rate.
+    """
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError('{0}: 16 bit PCM is supported, not {1} bit'.format(path, 8 * wav.getsampwidth()))
+        rate, channels = wav.getframerate(), wav.getnchannels()
+        data = wav.readframes(wav.getnframes())
+    if (rate, channels) != (sample_rate, 1):
+        data = PolyphaseResampler(rate, sample_rate, channels).process(data)
+    return data
+
+
+def write_wav(path, data, sample_rate):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(data)
+
+
+def enroll(samples, directory):
+    """
+    Record samples of the wake word (one utterance each) in the templates directory.
+    """
+    from jarvis.settings import SPEECH_RECOGNITION
+    from jarvis.engines.stt import STTVernacularEngine
+
+    settings = SPEECH_RECOGNITION['wake_word']
+    sample_rate = SPEECH_RECOGNITION['sample_rate']
+    directory = os.path.expanduser(directory or settings['templates'])
+    os.makedirs(directory, exist_ok=True)
+    detector = WakeWordDetector(sample_rate, energy_threshold=settings['energy_threshold'])
+    capture = STTVernacularEngine._create_capture(SPEECH_RECOGNITION['vad']['chunk_size'])
+    endpointer = STTVernacularEngine._create_endpointer()
+    for i in range(samples):
+        input('Press Enter and say the wake word ({0}/{1})'.format(i + 1, samples))
+        data = b''.join(bytes(chunk) for chunk in capture.utterance(2, endpointer))
+        try:
+            frames = detector.enroll(data)
+        except ValueError as e:
+            print('{0}, try again'.format(e))
+            continue
+        path = os.path.join(directory, 'wake_word_{0}.wav'.format(int(time.time() * 1000)))
+        write_wav(path, data, sample_rate)
+        print('Saved {0} ({1} frames)'.format(path, frames))
+    capture.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wake word enrollment')
+    parser.add_argument('--enroll', type=int, default=3, help='The samples to record')
+    parser.add_argument('--templates', help='The templates directory (default: the settings)')
+    args = parser.parse_args()
+    enroll(args.enroll, args.templates)
+
+
+if __name__ == '__main__':
+    main()
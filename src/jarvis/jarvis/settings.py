@@ -57,20 +57,97 @@ GENERAL_SETTINGS = {
 # Google API Speech recognition settings
 # SpeechRecognition: https://pypi.org/project/SpeechRecognition/2.1.3
 SPEECH_RECOGNITION = {
-    'recognizer': 'vernacular',
+    'recognizer': 'vernacular',  # 'vernacular', 'google' or 'file' (recorded audio, see 'file')
     'ambient_duration': 1,  # Time for auto microphone calibration
     'pause_threshold': 1,  # minimum length silence (in seconds) at the end of a sentence
     'energy_threshold': 3000,  # microphone sensitivity, for loud places, the energy level should be up to 4000
     'dynamic_energy_threshold': True,  # For unpredictable noise levels (Suggested to be TRUE)
+    # Google engine microphone: None (the default device), a device index, a part of the device name,
+    # or 'ask' (choose on every start)
+    'microphone': None,
+    'calibration_profiles': '~/.cache/jarvis/microphones.json',  # None: calibrate on every start
+    'calibration_refresh_interval': 600,  # In seconds, 0: calibrate only on start
     'sample_rate': 8000,
     'language_code': 'en',
     'model': 'eng',
     'max_audio_length': 2,
     'num_channels': 1,
+    'chunk_size': 4000,  # Samples per microphone read
+    'input_device_index': None,  # None: The default input device
+    # The microphone format, the audio is downmixed and resampled to sample_rate (mono)
+    # None: sample_rate & num_channels (no conversion), 'native': the device default, or a number
+    'device_sample_rate': None,
+    'device_channels': None,
+    # In seconds, the audio before the activation that's prepended to the utterance (0: disabled, e.g 0.5).
+    # Opt-in: with pre-roll the microphone is kept open and read continuously (also between the utterances),
+    # memory footprint: 4 * preroll * sample_rate * num_channels bytes
+    'preroll': 0,
+    # 'raw': PCM chunks streamed from the capture buffer, the format is declared in the config
+    # 'wav': Every chunk is sent as a standalone wave file (44 bytes header per chunk)
+    # 'flac': The utterance is streamed as one FLAC stream (less bandwidth, more CPU, requires pyFLAC)
+    'audio_format': 'raw',
+    'flac': {
+        'compression_level': 5,  # 0 (fastest) - 8 (smallest)
+        'blocksize': 1024,  # Samples per FLAC frame, the encoder emits whole frames
+    },
+    # Only the first message of the stream carries the config (the server must support it)
+    'config_once': False,
+    # 'vad': The capture ends after a trailing silence (the leading/trailing silence is not sent)
+    # 'fixed': Always capture max_audio_length seconds
+    'endpointing': 'vad',
+    'vad': {
+        'chunk_size': 800,  # Samples per microphone read, the endpointing granularity
+        'frame_ms': 20,
+        'energy_threshold': 400,  # Speech frame RMS (16 bit samples)
+        'zcr_threshold': 0.3,  # Zero-crossing rate of the quiet speech frames (unvoiced consonants)
+        'trailing_silence': 0.6,  # In seconds
+        'padding': 0.2,  # In seconds, silence kept around the speech
+        'no_speech_timeout': 3,  # In seconds
+        'max_audio_length': 8,  # In seconds
+    },
+    # Local wake word detection (vernacular recognizer), the speech is sent to the recognizer
+    # only after the wake word. Enroll samples of the wake word with: python -m jarvis.engines.wake_word
+    'wake_word': {
+        'enabled': False,
+        'templates': '~/.config/jarvis/wake_word',  # The enrolled samples (wave files)
+        # Max DTW distance (mean cosine distance of the MFCC frames), tune with the benchmark
+        # (wake_word_benchmarks.py): 0.03 --> ~6 false wakes/hour at 94% detection, 0.05 --> ~30/hour at 100%
+        'threshold': 0.03,
+        'step_ms': 100,  # The matching interval
+        'energy_threshold': 400,  # Frame RMS (16 bit samples), the quiet audio is not matched
+    },
+    # File recognizer ('file'): batch transcription of recorded audio with the vernacular server,
+    # python -m jarvis.engines.file_stt <files/directories/->
+    'file': {
+        'inputs': ['-'],  # Wave/raw PCM files, directories, '-': stdin (raw PCM is at sample_rate/num_channels)
+        'concurrency': 4,  # Parallel streams
+        'chunk_size': 16000,  # Samples per request
+        'deadline': None,  # In seconds per file (None: no deadline, the KALDI_SERVE deadline is per utterance)
+        'max_replay_requests': 0,  # A file stream is retried only if it failed before its first request
+    },
+}
+
+# Kaldi serve (vernacular speech recognition server) settings
+KALDI_SERVE = {
+    'backends': ['0.0.0.0:5016'],  # Every call is routed to the backend with the least outstanding calls
+    'ready_timeout': 5,  # In seconds, the startup wait for the server
+    'deadline': 30,  # In seconds, per call
+    'keepalive_time_ms': 30000,  # HTTP/2 keepalive ping interval
+    'keepalive_timeout_ms': 10000,
+    'reconnect_attempts': 3,  # Channel re-creations per call while the server is unavailable
+    'backoff': 0.5,  # In seconds, doubled on every attempt
+    'max_backoff': 8,
+    'eject_after_failures': 2,  # Consecutive failures that eject a backend
+    'eject_seconds': 10,
+    'health_check_interval': 5,  # In seconds, of the idle backends
+    'max_replay_requests': None,  # Sent requests kept to retry a stream (None: all, the utterances are short)
 }
 
 # SKill analyzer settings
 ANALYZER = {
+    # 'sklearn': TfidfVectorizer & cosine similarity,
+    # 'inverted_index': The same weights & similarity without the scikit-learn import
+    'backend': 'sklearn',
     # SKill analyzer (TfidfVectorizer args)
     'args': {
             "stop_words": None,
@@ -79,7 +156,20 @@ ANALYZER = {
             "use_idf": False,
             },
     'sensitivity': 0.2,
-
+    # Words that split a compound command into many skills (e.g 'open youtube and tell me the time'),
+    # empty: One skill per command
+    'conjunctions': ['and', 'then', 'and then', 'also'],
+    # True: When no skill is above the sensitivity, match the tags by sound/spelling
+    # (e.g 'create a remainder' --> 'reminder')
+    'fuzzy_fallback': True,
+    # Minimum score of a fuzzy match, higher than the sensitivity: a sound/spelling match is weaker
+    # evidence than a word match (e.g 'never mind' --> 'remind' scores ~0.42)
+    'fuzzy_sensitivity': 0.45,
+    # Number of cached transcript matches (e.g 'what time is it'), 0: No cache
+    'cache_size': 256,
+    # Directory of the fitted analyzer model (skips the fitting on the next start),
+    # None: The model is fitted in every start
+    'model_cache': '~/.cache/jarvis/analyzer',
 }
 
 # Google text to speech API settings
@@ -0,0 +1,331 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+from scipy import sparse
+
+from jarvis.skills.tokenizer import WordAnalyzer, DEFAULT_TOKEN_PATTERN
+
+MODEL_FORMAT_VERSION = 1
+
+# Vectorizer args that CompiledVectorizer reproduces at transform time,
+# every other TfidfVectorizer argument is a fit time argument.
+_TRANSFORM_ARGS = {
+    'lowercase': True,
+    'stop_words': None,
+    'token_pattern': DEFAULT_TOKEN_PATTERN,
+    'ngram_range': (1, 1),
+    'binary': False,
+    'norm': 'l2',
+    'use_idf': True,
+    'sublinear_tf': False,
+}
+_FIT_ARGS = {'smooth_idf', 'max_df', 'min_df', 'max_features'}
+_DEFAULT_ONLY_ARGS = {'analyzer': 'word', 'strip_accents': None}
+
+_MODEL_NAME = re.compile(r'^[0-9a-f]{40}$')  # A model directory is named by its model key (sha1)
+
+
+class CompiledVectorizer:
+    """
+    Lightweight replacement of a fitted TfidfVectorizer.
+    It keeps only the vocabulary, the idf weights and the transform
+    arguments, so it can be restored from disk without refitting.
+    """
+    def __init__(self, vocabulary, idf=None, stop_words=None, **transform_args):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.stop_words = frozenset(stop_words) if stop_words else None
+        self.transform_args = {name: transform_args.get(name, default)
+                               for (name, default) in _TRANSFORM_ARGS.items() if name != 'stop_words'}
+        self.analyze = WordAnalyzer(lowercase=self.transform_args['lowercase'],
+                                    stop_words=self.stop_words,
+                                    token_pattern=self.transform_args['token_pattern'],
+                                    ngram_range=self.transform_args['ngram_range'])
+
+    @staticmethod
+    def supports(args):
+        """
+        Checks if the vectorizer args can be reproduced without sklearn.
+        :param args: dict (TfidfVectorizer args)
+        :return: boolean
+        """
+        for name, value in args.items():
+            if name in _DEFAULT_ONLY_ARGS:
+                if value != _DEFAULT_ONLY_ARGS[name]:
+                    return False
+            elif name not in _TRANSFORM_ARGS and name not in _FIT_ARGS:
+                return False
+        return True
+
+    @classmethod
+    def from_fitted(cls, vectorizer, args):
+        """
+        Create a compiled vectorizer from a fitted sklearn vectorizer.
+        """
+        transform_args = {name: value for (name, value) in args.items() if name in _TRANSFORM_ARGS}
+        transform_args.pop('stop_words', None)
+        idf = vectorizer.idf_ if transform_args.get('use_idf', True) else None
+        return cls(vocabulary=dict(vectorizer.vocabulary_),
+                   idf=idf,
+                   stop_words=vectorizer.get_stop_words(),
+                   **transform_args)
+
+    @property
+    def incremental(self):
+        """
+        Rows can be added/removed without refitting, unless the idf weights depend on all the rows.
+        """
+        return self.idf is None
+
+    @property
+    def terms(self):
+        """
+        Vocabulary terms ordered by column index.
+        """
+        terms = [''] * len(self.vocabulary)
+        for term, column in self.vocabulary.items():
+            terms[column] = term
+        return terms
+
+    def transform(self, raw_documents):
+        """
+        Transform documents to a document-term matrix.
+        :param raw_documents: iterable of strings
+        :return: scipy.sparse.csr_matrix
+        """
+        indptr, indices, values = [0], [], []
+        for document in raw_documents:
+            counts = {}
+            for term in self.analyze(document):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            indices.extend(counts.keys())
+            values.extend(counts.values())
+            indptr.append(len(indices))
+
+        data = np.array(values, dtype=np.float64)
+        indices = np.array(indices, dtype=np.int32)
+        indptr = np.array(indptr, dtype=np.int32)
+
+        if self.transform_args['binary']:
+            data[:] = 1
+        if self.transform_args['sublinear_tf']:
+            np.log(data, out=data)
+            data += 1
+        if self.idf is not None:
+            data *= self.idf[indices]
+        if self.transform_args['norm']:
+            data = self._normalize(data, indptr, self.transform_args['norm'])
+
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(self.vocabulary)))
+
+    def add_rows(self, skill_matrix, raw_documents):
+        """
+        Add the rows of new documents, the new terms are appended to the vocabulary.
+        The vectorizer and the matrix are not modified, a new copy of them is returned.
+        :return: tuple (CompiledVectorizer, scipy.sparse.csr_matrix)
+        """
+        vocabulary = dict(self.vocabulary)
+        for document in raw_documents:
+            for term in self.analyze(document):
+                vocabulary.setdefault(term, len(vocabulary))
+
+        vectorizer = self._copy(vocabulary)
+        skill_matrix = sparse.csr_matrix(skill_matrix)
+        skill_matrix = sparse.csr_matrix((skill_matrix.data, skill_matrix.indices, skill_matrix.indptr),
+                                         shape=(skill_matrix.shape[0], len(vocabulary)))
+        return vectorizer, sparse.vstack([skill_matrix, vectorizer.transform(raw_documents)], format='csr')
+
+    def remove_rows(self, skill_matrix, rows):
+        """
+        Remove rows and the vocabulary terms which are not used by the remaining rows.
+        The vectorizer and the matrix are not modified, a new copy of them is returned.
+        :return: tuple (CompiledVectorizer, scipy.sparse.csr_matrix)
+        """
+        skill_matrix = sparse.csr_matrix(skill_matrix)
+        keep_rows = np.setdiff1d(np.arange(skill_matrix.shape[0]), rows)
+        skill_matrix = skill_matrix[keep_rows]
+
+        used_columns = np.flatnonzero(skill_matrix.getnnz(axis=0))
+        terms = self.terms
+        vocabulary = {terms[column]: new_column for (new_column, column) in enumerate(used_columns)}
+        return self._copy(vocabulary), skill_matrix[:, used_columns]
+
+    def _copy(self, vocabulary):
+        return CompiledVectorizer(vocabulary=vocabulary,
+                                  idf=self.idf,
+                                  stop_words=self.stop_words,
+                                  **self.transform_args)
+
+    @staticmethod
+    def _normalize(data, indptr, norm):
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        if norm == 'l1':
+            norms = np.bincount(rows, weights=np.abs(data), minlength=len(indptr) - 1)
+        else:
+            norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=len(indptr) - 1))
+        norms[norms == 0] = 1
+        return data / norms[rows]
+
+
+def cosine_similarity(skill_matrix, query_matrix):
+    """
+    Cosine similarity of the rows of two sparse matrices, the same as the sklearn cosine_similarity.
+    It scores the stored models without importing scikit-learn.
+    :return: numpy array (skill_matrix rows x query_matrix rows)
+    """
+    def normalize(matrix):
+        matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms).dot(matrix)
+
+    return normalize(skill_matrix).dot(normalize(query_matrix).T).toarray()
+
+
+def model_key(skills, args, weight_measure):
+    """
+    Hash of everything that affects a fitted analyzer model.
+    The key doesn't depend on the order of the skills or of the tags (dict/set order varies
+    between processes with the hash seed).
+    :param skills: dict (skills registry)
+    :param args: dict (vectorizer args)
+    :param weight_measure: vectorizer class (or the backend factory)
+    :return: string
+    """
+    content = {
+        'version': MODEL_FORMAT_VERSION,
+        'weight_measure': '{0}.{1}'.format(weight_measure.__module__, weight_measure.__qualname__),
+        'args': args,
+        'tags': [[key, sorted(skills[key]['tags'])] for key in sorted(skills)],
+    }
+    encoded = json.dumps(content, sort_keys=True, default=_canonical).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return repr(value)
+
+
+class AnalyzerModelStore:
+    """
+    On-disk store of fitted analyzer models.
+    Every model is a directory (named by its model key) of .npy arrays,
+    which are memory-mapped on load. Only the model directories are removed from the
+    store directory, any other file in it is left alone.
+    """
+    def __init__(self, directory):
+        self.logger = logging
+        self.directory = os.path.expanduser(directory)
+
+    def load(self, key, skill_keys):
+        """
+        Load a stored model.
+        :param key: string (model key)
+        :param skill_keys: tuple (expected order of the skill matrix rows), the stored rows are
+        reordered if the skills are in another order
+        :return: tuple (CompiledVectorizer, skill matrix) or None
+        """
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            rows = {skill_key: row for (row, skill_key) in enumerate(meta['skill_keys'])}
+            if sorted(rows) != sorted(skill_keys):
+                return None
+            order = [rows[skill_key] for skill_key in skill_keys]
+
+            terms = np.load(os.path.join(path, 'terms.npy'), mmap_mode='r')
+            idf = np.load(os.path.join(path, 'idf.npy'), mmap_mode='r') if meta['has_idf'] else None
+            skill_matrix = sparse.csr_matrix(
+                (np.load(os.path.join(path, 'data.npy'), mmap_mode='r'),
+                 np.load(os.path.join(path, 'indices.npy'), mmap_mode='r'),
+                 np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r')),
+                shape=tuple(meta['shape']), copy=False)
+            if order != sorted(order):
+                skill_matrix = skill_matrix[order]
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning('Unable to load analyzer model {0} with message: {1}'.format(key, e))
+            return None
+
+        transform_args = meta['transform_args']
+        transform_args['ngram_range'] = tuple(transform_args['ngram_range'])
+        vectorizer = CompiledVectorizer(vocabulary={term: column for (column, term) in enumerate(terms.tolist())},
+                                        idf=idf,
+                                        stop_words=meta['stop_words'],
+                                        **transform_args)
+        self.logger.debug('Analyzer model {0} loaded from {1}'.format(key, path))
+        return vectorizer, skill_matrix
+
+    def save(self, key, skill_keys, vectorizer, skill_matrix):
+        """
+        Store a model and remove the models of older registries/settings.
+        """
+        skill_matrix = sparse.csr_matrix(skill_matrix)
+        meta = {
+            'skill_keys': list(skill_keys),
+            'shape': list(skill_matrix.shape),
+            'has_idf': vectorizer.idf is not None,
+            'stop_words': sorted(vectorizer.stop_words) if vectorizer.stop_words else None,
+            'transform_args': vectorizer.transform_args,
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+            np.save(os.path.join(tmp_path, 'terms.npy'), np.array(vectorizer.terms, dtype=np.str_))
+            if vectorizer.idf is not None:
+                np.save(os.path.join(tmp_path, 'idf.npy'), np.asarray(vectorizer.idf, dtype=np.float64))
+            np.save(os.path.join(tmp_path, 'data.npy'), skill_matrix.data)
+            np.save(os.path.join(tmp_path, 'indices.npy'), skill_matrix.indices)
+            np.save(os.path.join(tmp_path, 'indptr.npy'), skill_matrix.indptr)
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+            path = os.path.join(self.directory, key)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        except OSError as e:
+            self.logger.warning('Unable to save analyzer model {0} with message: {1}'.format(key, e))
+            return
+
+        self.logger.debug('Analyzer model {0} saved in {1}'.format(key, path))
+        self._remove_stale_models(keep=key)
+
+    def _remove_stale_models(self, keep):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != keep and _MODEL_NAME.match(name) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
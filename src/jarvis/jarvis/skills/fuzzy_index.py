@@ -0,0 +1,143 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+
+from jarvis.skills.tokenizer import WordAnalyzer, DEFAULT_TOKEN_PATTERN, ENGLISH_STOP_WORDS
+
+_SOUNDEX_CODES = {letter: code
+                  for (letters, code) in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'),
+                                          ('l', '4'), ('mn', '5'), ('r', '6'))
+                  for letter in letters}
+
+
+def soundex(word):
+    """
+    Soundex phonetic key of a word (e.g 'weather', 'whether' --> 'W360').
+    """
+    letters = [letter for letter in word.lower() if 'a' <= letter <= 'z']
+    if not letters:
+        return ''
+    key = [letters[0].upper()]
+    last_code = _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        code = _SOUNDEX_CODES.get(letter)
+        if code and code != last_code:
+            key.append(code)
+        if letter not in 'hw':  # Vowels separate equal codes, 'h' and 'w' don't
+            last_code = code
+    return (''.join(key) + '000')[:4]
+
+
+def char_ngrams(word, n=3):
+    """
+    Character n-grams of a word padded with '#' (e.g 'time' --> {'#ti', 'tim', 'ime', 'me#'}).
+    """
+    padded = '#' + word + '#'
+    return {padded[i: i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class FuzzyTagIndex:
+    """
+    Phonetic keys and character n-grams of every tag word in the skills registry.
+    It scores transcripts with misrecognized words (e.g 'whether in london', 'create a remainder'),
+    all the keys are computed when the index is built.
+    The words are split as the skill analyzer splits them (lowercase, stop words, token pattern).
+    The English stop words and the words of `min_word_length` letters or less are not indexed (nor looked up),
+    their sounds/n-grams match too many unrelated words (e.g 'white' --> 'what').
+    """
+    def __init__(self, skills, lowercase=True, stop_words=None, token_pattern=DEFAULT_TOKEN_PATTERN, ngram_size=3,
+                 min_word_similarity=0.6, min_word_length=3):
+        self.analyze = WordAnalyzer(lowercase=lowercase, stop_words=stop_words, token_pattern=token_pattern)
+        self.min_word_length = min_word_length
+        self.ngram_size = ngram_size
+        self.min_word_similarity = min_word_similarity
+
+        self.skill_words = {}  # skill key --> set of tag words
+        self.word_skills = {}  # tag word --> set of skill keys
+        self.word_ngrams = {}  # tag word --> number of n-grams
+        self.phonetic_postings = {}  # phonetic key --> set of tag words
+        self.ngram_postings = {}  # n-gram --> set of tag words
+
+        for skill_key, skill in skills.items():
+            words = self._words(' '.join(skill['tags']))
+            if not words:
+                continue
+            self.skill_words[skill_key] = words
+            for word in words:
+                self.word_skills.setdefault(word, set()).add(skill_key)
+                if word in self.word_ngrams:
+                    continue
+                ngrams = char_ngrams(word, self.ngram_size)
+                self.word_ngrams[word] = len(ngrams)
+                self.phonetic_postings.setdefault(soundex(word), set()).add(word)
+                for ngram in ngrams:
+                    self.ngram_postings.setdefault(ngram, set()).add(word)
+
+    def match(self, transcript):
+        """
+        Find the most similar skill of a transcript.
+        :param transcript: string
+        :return: tuple (skill key, score), the skill key is None if no tag word is similar
+        """
+        transcript_words = self._words(transcript)
+        if not transcript_words:
+            return None, 0.0
+
+        skill_matches = {}  # skill key --> {tag word: best word similarity}
+        for transcript_word in transcript_words:
+            for word, similarity in self._similar_words(transcript_word).items():
+                for skill_key in self.word_skills[word]:
+                    matches = skill_matches.setdefault(skill_key, {})
+                    matches[word] = max(matches.get(word, 0), similarity)
+
+        best_key, best_score = None, 0.0
+        for skill_key, matches in skill_matches.items():
+            # Cosine of the binary word vectors, with the word similarities as weights
+            score = sum(matches.values()) / math.sqrt(len(self.skill_words[skill_key]) * len(transcript_words))
+            if score > best_score:
+                best_key, best_score = skill_key, score
+        return best_key, best_score
+
+    def _words(self, text):
+        return {word for word in self.analyze(text)
+                if len(word) > self.min_word_length and word.lower() not in ENGLISH_STOP_WORDS}
+
+    def _similar_words(self, transcript_word):
+        """
+        Tag words that are phonetically equal and/or share enough n-grams with the transcript word.
+        :return: dict (tag word --> similarity in [0, 1])
+        """
+        ngrams = char_ngrams(transcript_word, self.ngram_size)
+        shared_ngrams = {}
+        for ngram in ngrams:
+            for word in self.ngram_postings.get(ngram, ()):
+                shared_ngrams[word] = shared_ngrams.get(word, 0) + 1
+        phonetic_words = self.phonetic_postings.get(soundex(transcript_word), set())
+
+        similar_words = {}
+        for word in phonetic_words.union(shared_ngrams):
+            dice = 2.0 * shared_ngrams.get(word, 0) / (len(ngrams) + self.word_ngrams[word])
+            similarity = max(dice, (1 + dice) / 2) if word in phonetic_words else dice
+            if similarity >= self.min_word_similarity:
+                similar_words[word] = similarity
+        return similar_words
@@ -0,0 +1,205 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy
+import math
+
+import numpy as np
+
+from jarvis.skills.tokenizer import WordAnalyzer, DEFAULT_TOKEN_PATTERN, ENGLISH_STOP_WORDS
+
+
+class InvertedIndex:
+    """
+    Term --> [(row, weight), ..] postings of the skill vectors,
+    with the precomputed L2 norm of every row.
+    """
+    def __init__(self, postings, row_norms):
+        self.postings = postings
+        self.row_norms = row_norms
+
+    @property
+    def shape(self):
+        return len(self.row_norms), len(self.postings)
+
+
+class InvertedIndexVectorizer:
+    """
+    Dependency-free replacement of sklearn TfidfVectorizer for the skill analyzer.
+    fit_transform() returns an InvertedIndex of the skill vectors and transform()
+    returns the query vectors as {term: weight} dicts.
+    """
+    def __init__(self, lowercase=True, stop_words=None, token_pattern=DEFAULT_TOKEN_PATTERN, ngram_range=(1, 1),
+                 binary=False, norm='l2', use_idf=True, smooth_idf=True, sublinear_tf=False):
+        if stop_words == 'english':
+            stop_words = ENGLISH_STOP_WORDS
+        self.analyze = WordAnalyzer(lowercase=lowercase,
+                                    stop_words=stop_words,
+                                    token_pattern=token_pattern,
+                                    ngram_range=ngram_range)
+        self.binary = binary
+        self.norm = norm
+        self.use_idf = use_idf
+        self.smooth_idf = smooth_idf
+        self.sublinear_tf = sublinear_tf
+        self.idf = {}
+
+    def fit_transform(self, raw_documents):
+        """
+        Learn the vocabulary/idf of the documents and index their vectors.
+        :param raw_documents: list of strings
+        :return: InvertedIndex
+        """
+        term_counts = [self._count(document) for document in raw_documents]
+
+        document_frequency = {}
+        for counts in term_counts:
+            for term in counts:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        self.idf = {term: self._idf(frequency, len(term_counts))
+                    for (term, frequency) in document_frequency.items()}
+
+        postings = {term: [] for term in self.idf}
+        row_norms = []
+        for row, counts in enumerate(term_counts):
+            vector = self._weight(counts)
+            for term, weight in vector.items():
+                postings[term].append((row, weight))
+            row_norms.append(math.sqrt(sum(weight * weight for weight in vector.values())))
+        return InvertedIndex(postings=postings, row_norms=row_norms)
+
+    @property
+    def incremental(self):
+        """
+        Rows can be added/removed without refitting, unless the idf weights depend on all the rows.
+        """
+        return not self.use_idf
+
+    def add_rows(self, index, raw_documents):
+        """
+        Add the rows of new documents, the new terms are added to the vocabulary.
+        The vectorizer and the index are not modified, a new copy of them is returned.
+        :return: tuple (InvertedIndexVectorizer, InvertedIndex)
+        """
+        vectorizer = copy.copy(self)
+        vectorizer.idf = dict(self.idf)
+        postings = dict(index.postings)
+        row_norms = list(index.row_norms)
+
+        for document in raw_documents:
+            counts = vectorizer._count(document)
+            for term in counts:
+                vectorizer.idf.setdefault(term, 1.0)  # Not used, the vectorizer doesn't use idf weights
+            vector = vectorizer._weight(counts)
+            for term, weight in vector.items():
+                postings[term] = postings.get(term, []) + [(len(row_norms), weight)]
+            row_norms.append(math.sqrt(sum(weight * weight for weight in vector.values())))
+        return vectorizer, InvertedIndex(postings=postings, row_norms=row_norms)
+
+    def remove_rows(self, index, rows):
+        """
+        Remove rows and the vocabulary terms which are not used by the remaining rows.
+        The vectorizer and the index are not modified, a new copy of them is returned.
+        :return: tuple (InvertedIndexVectorizer, InvertedIndex)
+        """
+        removed_rows = set(rows)
+        new_rows, row_norms = {}, []
+        for row, row_norm in enumerate(index.row_norms):
+            if row not in removed_rows:
+                new_rows[row] = len(row_norms)
+                row_norms.append(row_norm)
+
+        postings = {}
+        for term, term_postings in index.postings.items():
+            term_postings = [(new_rows[row], weight) for (row, weight) in term_postings if row in new_rows]
+            if term_postings:
+                postings[term] = term_postings
+
+        vectorizer = copy.copy(self)
+        vectorizer.idf = {term: idf for (term, idf) in self.idf.items() if term in postings}
+        return vectorizer, InvertedIndex(postings=postings, row_norms=row_norms)
+
+    def transform(self, raw_documents):
+        """
+        Transform documents to vectors, terms out of the vocabulary are ignored.
+        :param raw_documents: list of strings
+        :return: list of {term: weight} dicts
+        """
+        vectors = []
+        for document in raw_documents:
+            counts = {term: count for (term, count) in self._count(document).items() if term in self.idf}
+            vectors.append(self._weight(counts))
+        return vectors
+
+    def _count(self, document):
+        counts = {}
+        for term in self.analyze(document):
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def _idf(self, document_frequency, documents):
+        if self.smooth_idf:
+            return math.log((1 + documents) / (1 + document_frequency)) + 1
+        return math.log(documents / document_frequency) + 1
+
+    def _weight(self, counts):
+        """
+        Apply the tf scaling, the idf weights and the normalization of a term --> count dict.
+        """
+        vector = {}
+        for term, count in counts.items():
+            tf = 1 if self.binary else count
+            if self.sublinear_tf:
+                tf = 1 + math.log(tf)
+            vector[term] = tf * self.idf[term] if self.use_idf else float(tf)
+
+        if self.norm == 'l1':
+            norm = sum(abs(weight) for weight in vector.values())
+        elif self.norm == 'l2':
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        else:
+            norm = 0
+        if norm:
+            vector = {term: weight / norm for (term, weight) in vector.items()}
+        return vector
+
+
+def inverted_index_similarity(index, vectors):
+    """
+    Cosine similarity of the indexed skills with the query vectors.
+    Only the skills that share a term with a query are scored.
+    :param index: InvertedIndex
+    :param vectors: list of {term: weight} dicts
+    :return: numpy array (skills x queries)
+    """
+    similarities = np.zeros((len(index.row_norms), len(vectors)))
+    for column, vector in enumerate(vectors):
+        vector_norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not vector_norm:
+            continue
+        scores = {}
+        for term, weight in vector.items():
+            for row, row_weight in index.postings[term]:
+                scores[row] = scores.get(row, 0) + weight * row_weight
+        for row, score in scores.items():
+            similarities[row, column] = score / (index.row_norms[row] * vector_norm)
+    return similarities
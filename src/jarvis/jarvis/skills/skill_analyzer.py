@@ -19,49 +19,394 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import re
 import logging
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from jarvis.skills.analyzer_model import CompiledVectorizer, model_key, cosine_similarity
+from jarvis.skills.fuzzy_index import FuzzyTagIndex
+from jarvis.skills.tokenizer import WordAnalyzer, ENGLISH_STOP_WORDS, DEFAULT_TOKEN_PATTERN
+
+
+class TranscriptCache:
+    """
+    Bounded LRU cache of (normalized transcript, fuzzy) --> (skill key, score) matches.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._matches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, transcript):
+        with self._lock:
+            match = self._matches.get(transcript)
+            if match is None:
+                self.misses += 1
+                return None
+            self._matches.move_to_end(transcript)
+            self.hits += 1
+            return match
+
+    def put(self, transcript, match):
+        with self._lock:
+            self._matches[transcript] = match
+            self._matches.move_to_end(transcript)
+            if len(self._matches) > self.maxsize:
+                self._matches.popitem(last=False)
+
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._matches), 'maxsize': self.maxsize}
+
+
+class SkillIndex:
+    """
+    Compiled, read-only view of the skills registry.
+    It holds the fitted vectorizer, the skills term-document matrix, the similarity measure
+    of them and the row index --> skill key mapping, so it can be shared between requests.
+    The optional fuzzy index scores the transcripts that the words don't match.
+    The optional cache belongs to the index, so a rebuilt index starts with an empty cache.
+    The content words analyzer drops the stop words, except the one word tags (e.g 'about').
+    """
+    def __init__(self, vectorizer, skill_matrix, skill_keys, skills, similarity_measure, content_words=None,
+                 fuzzy_index=None, cache=None):
+        self.vectorizer = vectorizer
+        self.skill_matrix = skill_matrix
+        self.similarity_measure = similarity_measure
+        self.skill_keys = skill_keys
+        self.skills = skills
+        self.content_words = content_words
+        self.fuzzy_index = fuzzy_index
+        self.cache = cache
 
 
 class SkillAnalyzer:
-    def __init__(self, weight_measure, similarity_measure, args, skills_, sensitivity):
+    """
+    With a `backend` (factory of (weight_measure, similarity_measure), e.g ANALYZER_BACKENDS['sklearn'])
+    instead of the measures, the backend is loaded only when a model is fitted, so a start with
+    a stored model doesn't import it.
+    """
+    def __init__(self, weight_measure, similarity_measure, args, skills_, sensitivity, model_store=None,
+                 conjunctions=None, fuzzy_fallback=False, cache_size=0, backend=None, fuzzy_sensitivity=0.45):
         self.logger = logging
         self.weight_measure = weight_measure
         self.similarity_measure = similarity_measure
+        self.backend = backend
         self.args = args
-        self.vectorizer = self._create_vectorizer()
         self.skills = skills_
         self.analyzer_sensitivity = sensitivity
+        self.model_store = model_store
+        self.conjunctions_pattern = self._create_conjunctions_pattern(conjunctions)
+        self.fuzzy_fallback = fuzzy_fallback
+        self.fuzzy_sensitivity = fuzzy_sensitivity
+        self.cache_size = cache_size
+        self._update_lock = threading.Lock()
+        self.index = self._compile_index()
 
     @property
     def tags(self):
-        tags_list = []
-        for skill in self.skills.values():
-            tags_list.append(list(skill['tags']))
-        return [' '.join(tag) for tag in tags_list]
+        return self._create_tags(self.skills)
 
-    def extract(self, user_transcript):
+    def cache_info(self):
+        """
+        Hit/miss counters of the transcript cache (since the last index change).
+        :return: dict or None (without cache)
+        """
+        index = self.index
+        return index.cache.info() if index.cache else None
 
-        train_tdm = self._train_model()
-        test_tdm = self.vectorizer.transform([user_transcript])
+    def rebuild(self, skills_=None):
+        """
+        Recompile the skill index, e.g. after a change in the skills registry.
+        :param skills_: dict (optional new skills registry)
+        """
+        with self._update_lock:
+            if skills_ is not None:
+                self.skills = dict(skills_)
+            self.index = self._compile_index()
 
-        similarities = self.similarity_measure(train_tdm, test_tdm)  # Calculate similarities
+    def add_skills(self, skills_):
+        """
+        Add (or replace) skills in the index without refitting the existing skills.
+        It's safe to call while other threads extract skills.
+        :param skills_: dict (skill key --> skill)
+        """
+        self._update_index(add=skills_, remove=())
 
-        skill_index = similarities.argsort(axis=None)[-1]  # Extract the most similar skill
-        if similarities[skill_index] > self.analyzer_sensitivity:
-            skill_key = [skill for skill in enumerate(self.skills) if skill[0] == skill_index][0][1]
-            return self.skills[skill_key]
-        else:
+    def remove_skills(self, skill_keys):
+        """
+        Remove skills from the index without refitting the remaining skills.
+        It's safe to call while other threads extract skills.
+        :param skill_keys: iterable of skill keys
+        """
+        self._update_index(add={}, remove=skill_keys)
+
+    def extract(self, user_transcript):
+        skill, _ = self.extract_many([user_transcript])[0]
+        if not skill:
             self.logger.debug('Not extracted skills from user voice transcript')
+        return skill
+
+    def extract_many(self, transcripts):
+        """
+        Extract the most similar skill of every transcript with one similarity computation.
+        :param transcripts: list of strings
+        :return: list of (skill, score) tuples, the skill is None if the score is not above the sensitivity
+        """
+        index = self.index
+        return [(index.skills[skill_key] if skill_key else None, score)
+                for skill_key, score in self._match_many(transcripts, index)]
+
+    def extract_best(self, alternatives):
+        """
+        Rescore the N-best alternatives of the speech recognition in one batch and
+        pick the best joint (recognition confidence x skill similarity) alternative.
+        :param alternatives: list of dicts with 'transcript' and 'confidence' keys (most likely first)
+        :return: tuple (transcript, skill, score), skill is None if no alternative matches a skill
+        """
+        if not alternatives:
+            return '', None, 0.0
+
+        index = self.index
+        transcripts = [alternative['transcript'] for alternative in alternatives]
+        confidences = np.array([alternative.get('confidence', 0.0) for alternative in alternatives], dtype=float)
+        if not confidences.max() > 0:  # The recognizer didn't give confidences
+            confidences = np.ones(len(alternatives))
+
+        matches = self._match_many(transcripts, index)
+        joint_scores = [confidence * score if skill_key else 0.0
+                        for confidence, (skill_key, score) in zip(confidences, matches)]
+
+        best = int(np.argmax(joint_scores))
+        skill_key, _ = matches[best]
+        if not skill_key:
+            return transcripts[0], None, 0.0
+        self.logger.debug('Best alternative: {0} ({1} of {2})'.format(transcripts[best], best + 1, len(transcripts)))
+        return transcripts[best], index.skills[skill_key], float(joint_scores[best])
+
+    def extract_intents(self, user_transcript):
+        """
+        Split a compound transcript on the conjunctions (e.g 'open youtube and tell me the time')
+        and extract the skill of every segment in one batched pass.
+        A segment is dispatched only if its content words (without the stop words) match the same skill
+        on their own, so a segment that matches only by words like 'the'/'of' (e.g 'the war of the worlds')
+        isn't dispatched. The segments are matched by words only, a fuzzy match of a single word
+        (e.g 'white' --> 'what') would split the transcript. If less than two segments are dispatched,
+        the whole transcript is matched (with the fuzzy fallback).
+        :param user_transcript: string
+        :return: list of (transcript, skill) tuples, in the order of the segments
+        """
+        index = self.index
+        segments = self._split_intents(user_transcript)
+        if len(segments) == 1:
+            skill_key, _ = self._match_many(segments, index)[0]
+            return [(user_transcript, index.skills[skill_key])] if skill_key else []
+
+        content_segments = [' '.join(index.content_words(segment)) for segment in segments]
+        matches = self._match_many(segments + content_segments + [user_transcript], index, fuzzy=False)
+        segment_matches, content_matches = matches[:len(segments)], matches[len(segments):-1]
+
+        intents, extracted_keys = [], set()
+        for segment, (skill_key, _), (content_key, _) in zip(segments, segment_matches, content_matches):
+            if skill_key and skill_key == content_key and skill_key not in extracted_keys:
+                extracted_keys.add(skill_key)
+                intents.append((segment, index.skills[skill_key]))
+
+        if len(intents) > 1:
+            return intents
+        if intents:
+            return [(user_transcript, intents[0][1])]
+        skill_key, _ = matches[-1]
+        if not skill_key:
+            skill_key, _ = self._match_many([user_transcript], index)[0]
+        return [(user_transcript, index.skills[skill_key])] if skill_key else []
+
+    def _split_intents(self, user_transcript):
+        if not self.conjunctions_pattern:
+            return [user_transcript]
+        segments = [segment.strip() for segment in self.conjunctions_pattern.split(user_transcript)]
+        return [segment for segment in segments if segment] or [user_transcript]
+
+    def _match_many(self, transcripts, index, fuzzy=True):
+        """
+        Match every transcript to the most similar skill key of the index.
+        :param fuzzy: bool, False: Match by words only (no fuzzy fallback)
+        :return: list of (skill key, score) tuples, the skill key is None if the score is not above the sensitivity
+        """
+        if not transcripts or not index.skill_keys:
+            return [(None, 0.0) for _ in transcripts]
+        if not index.cache:
+            return self._compute_matches(transcripts, index, fuzzy)
+
+        cache_keys = [(self._normalize(transcript), fuzzy) for transcript in transcripts]
+        results = [index.cache.get(cache_key) for cache_key in cache_keys]
+
+        missed = [i for (i, match) in enumerate(results) if match is None]
+        if missed:
+            matches = self._compute_matches([transcripts[i] for i in missed], index, fuzzy)
+            for i, match in zip(missed, matches):
+                index.cache.put(cache_keys[i], match)
+                results[i] = match
+        return results
+
+    def _compute_matches(self, transcripts, index, fuzzy=True):
+        index, similarities = self._similarities(transcripts, index)
+
+        skill_indexes = similarities.argmax(axis=0)  # Extract the most similar skill per transcript
+        scores = similarities[skill_indexes, np.arange(len(transcripts))]
+
+        results = []
+        for transcript, skill_index, score in zip(transcripts, skill_indexes, scores):
+            if score > self.analyzer_sensitivity:
+                results.append((index.skill_keys[skill_index], float(score)))
+            else:
+                match = self._fuzzy_match(transcript, index) if fuzzy else None
+                results.append(match or (None, float(score)))
+        return results
+
+    def _normalize(self, transcript):
+        """
+        Cache key of a transcript, transcripts with the same key have the same matches.
+        """
+        transcript = ' '.join(transcript.split())
+        return transcript.lower() if self.args.get('lowercase', True) else transcript
+
+    def _fuzzy_match(self, transcript, index):
+        """
+        Fallback for transcripts with misrecognized words (e.g 'create a remainder').
+        :return: tuple (skill key, score) or None
+        """
+        if not index.fuzzy_index:
+            return None
+        skill_key, score = index.fuzzy_index.match(transcript)
+        if score > self.fuzzy_sensitivity:
+            self.logger.debug('Fuzzy matched skill {0} with score {1}'.format(skill_key, score))
+            return skill_key, score
+        return None
+
+    def _similarities(self, transcripts, index):
+        """
+        Calculate the similarities of the transcripts with all the skills.
+        The caller keeps a local reference of the index, because it may be swapped by another thread.
+        :return: tuple (the used SkillIndex, array of shape (skills x transcripts))
+        """
+        test_tdm = index.vectorizer.transform(transcripts)
+        return index, np.asarray(index.similarity_measure(index.skill_matrix, test_tdm))
+
+    @staticmethod
+    def _create_conjunctions_pattern(conjunctions):
+        if not conjunctions:
             return None
+        # Longest first, so 'and then' wins over 'and'
+        words = sorted(conjunctions, key=len, reverse=True)
+        return re.compile(r'\b(?:{0})\b'.format('|'.join(re.escape(word) for word in words)), re.IGNORECASE)
 
     def _create_vectorizer(self):
         """
         Create vectorizer.
         """
+        self._load_backend()
         return self.weight_measure(**self.args)
 
-    def _train_model(self):
+    def _load_backend(self):
+        if self.backend and self.weight_measure is None:
+            self.weight_measure, self.similarity_measure = self.backend()
+
+    def _train_model(self, vectorizer):
         """
         Create/train the model.
         """
-        return self.vectorizer.fit_transform(self.tags)
+        return vectorizer.fit_transform(self.tags)
+
+    @staticmethod
+    def _create_tags(skills):
+        tags_list = []
+        for skill in skills.values():
+            tags_list.append(sorted(skill['tags']))  # The set order varies between processes
+        return [' '.join(tag) for tag in tags_list]
+
+    def _update_index(self, add, remove):
+        """
+        Apply added/removed skills to a copy of the index and swap it in.
+        Vectorizers that can't be updated incrementally (e.g with idf weights) are refitted.
+        """
+        with self._update_lock:
+            index = self.index
+            remove = set(remove).union(add).intersection(index.skills)
+
+            skills = {key: skill for (key, skill) in index.skills.items() if key not in remove}
+            skills.update(add)
+            self.skills = skills
+
+            if not getattr(index.vectorizer, 'incremental', False):
+                self.logger.debug('Refit the skill index, the vectorizer is not incremental')
+                self.index = self._compile_index()
+                return
+
+            vectorizer, skill_matrix, skill_keys = index.vectorizer, index.skill_matrix, index.skill_keys
+            if remove:
+                rows = [row for (row, key) in enumerate(skill_keys) if key in remove]
+                vectorizer, skill_matrix = vectorizer.remove_rows(skill_matrix, rows)
+                skill_keys = tuple(key for key in skill_keys if key not in remove)
+            if add:
+                vectorizer, skill_matrix = vectorizer.add_rows(skill_matrix, self._create_tags(add))
+                skill_keys += tuple(add)
+
+            self.index = self._create_index(vectorizer, skill_matrix, skill_keys, skills, index.similarity_measure)
+            self.logger.debug('Skill index updated, added: {0}, removed: {1}'.format(list(add), list(remove)))
+
+    def _compile_index(self):
+        """
+        Fit the vectorizer over the skill tags once and freeze the result.
+        With a model store, a stored model of the same registry/args is reused
+        and a freshly fitted model is stored for the next start.
+        """
+        skills = dict(self.skills)
+        skill_keys = tuple(skills)
+        key = model_key(skills, self.args, self.backend or self.weight_measure)
+
+        if self.model_store:
+            model = self.model_store.load(key, skill_keys)
+            if model:
+                vectorizer, skill_matrix = model
+                # Only the cosine similarity models are stored, it's computed without the backend
+                return self._create_index(vectorizer, skill_matrix, skill_keys, skills, cosine_similarity)
+
+        vectorizer = self._create_vectorizer()
+        skill_matrix = self._train_model(vectorizer)
+
+        if hasattr(vectorizer, 'vocabulary_') and CompiledVectorizer.supports(self.args):
+            vectorizer = CompiledVectorizer.from_fitted(vectorizer, self.args)
+            if self.model_store and getattr(self.similarity_measure, '__name__', None) == 'cosine_similarity':
+                self.model_store.save(key, skill_keys, vectorizer, skill_matrix)
+
+        return self._create_index(vectorizer, skill_matrix, skill_keys, skills)
+
+    def _create_index(self, vectorizer, skill_matrix, skill_keys, skills, similarity_measure=None):
+        """
+        The fuzzy index is cheap to build (no fitting), so it's rebuilt on every index change.
+        """
+        one_word_tags = {tag.lower() for skill in skills.values() for tag in skill['tags'] if ' ' not in tag}
+        content_words = WordAnalyzer(lowercase=self.args.get('lowercase', True),
+                                     stop_words=ENGLISH_STOP_WORDS.difference(one_word_tags),
+                                     token_pattern=self.args.get('token_pattern', DEFAULT_TOKEN_PATTERN))
+        return SkillIndex(vectorizer=vectorizer,
+                          skill_matrix=skill_matrix,
+                          skill_keys=skill_keys,
+                          skills=skills,
+                          similarity_measure=similarity_measure or self.similarity_measure,
+                          content_words=content_words,
+                          fuzzy_index=self._create_fuzzy_index(skills) if self.fuzzy_fallback else None,
+                          cache=TranscriptCache(self.cache_size) if self.cache_size else None)
+
+    def _create_fuzzy_index(self, skills):
+        return FuzzyTagIndex(skills,
+                             lowercase=self.args.get('lowercase', True),
+                             stop_words=self.args.get('stop_words'),
+                             token_pattern=self.args.get('token_pattern', DEFAULT_TOKEN_PATTERN))
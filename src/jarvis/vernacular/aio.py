@@ -0,0 +1,240 @@
+"""
+asyncio KaldiServe client (grpc.aio), one process can drive many audio sessions at the same time.
+It requires grpcio >= 1.32 and Python >= 3.6 (async generators), so it's not imported by the
+synchronous client.
+"""
+
+import time
+import random
+import asyncio
+
+import grpc
+import grpc.aio
+
+from vernacular.balancer import LeastOutstandingBalancer
+from vernacular.vernacular import _latency
+from vernacular.vernacular_pb2_grpc import KaldiServeStub
+from vernacular.vernacular_pb2 import RecognitionConfig, RecognizeRequest
+
+
+class AsyncKaldiServeChannel(object):
+    """
+    grpc.aio channel (and stub) of one KaldiServe endpoint, the asyncio counterpart of
+    channel.KaldiServeChannel. grpc.aio reconnects the channel by itself.
+    """
+
+    def __init__(self, url, keepalive_time_ms=30000, keepalive_timeout_ms=10000):
+        self.url = url
+        self.options = [
+            ('grpc.keepalive_time_ms', keepalive_time_ms),
+            ('grpc.keepalive_timeout_ms', keepalive_timeout_ms),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+        ]
+        self._channel = grpc.aio.insecure_channel(url, options=self.options)
+        self.stub = KaldiServeStub(self._channel)
+
+    @property
+    def state(self):
+        return self._channel.get_state(try_to_connect=False)
+
+    async def is_ready(self, timeout):
+        """
+        Check (and trigger) the connection.
+        """
+        try:
+            await asyncio.wait_for(self._channel.channel_ready(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self):
+        await self._channel.close()
+
+
+class AsyncKaldiServeClient(object):
+    """
+    asyncio variant of KaldiServeClient.
+    The calls are coroutines, the audio chunks (or the (config, audio) pairs) may be
+    async or plain iterables, they are consumed as they are produced.
+    The backends are balanced as in the synchronous client (LeastOutstandingBalancer: least outstanding
+    calls, ejection of the failing backends), the health checks run as a task of the event loop.
+    A call is retried (with the requests sent so far) on UNAVAILABLE, a stream only while it sent
+    at most `max_replay_requests` requests (None: any stream).
+    """
+
+    def __init__(self, kaldi_serve_url="0.0.0.0:5016", deadline=None, keepalive_time_ms=30000,
+                 keepalive_timeout_ms=10000, reconnect_attempts=3, backoff=0.5, max_backoff=8,
+                 eject_after_failures=2, eject_seconds=10, health_check_interval=5, health_check_timeout=1,
+                 max_replay_requests=None):
+        """
+        :param kaldi_serve_url: str or list of str, the backend(s) address
+        """
+        self.deadline = deadline
+        self.max_replay_requests = max_replay_requests
+        self.reconnect_attempts = reconnect_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        urls = [kaldi_serve_url] if isinstance(kaldi_serve_url, str) else list(kaldi_serve_url)
+        self.balancer = LeastOutstandingBalancer(urls,
+                                                 eject_after_failures=eject_after_failures,
+                                                 eject_seconds=eject_seconds,
+                                                 health_check_interval=0,  # Checked by _health_check_loop
+                                                 channel_factory=AsyncKaldiServeChannel,
+                                                 keepalive_time_ms=keepalive_time_ms,
+                                                 keepalive_timeout_ms=keepalive_timeout_ms)
+        self._health_check = None
+
+    @property
+    def backends(self):
+        return self.balancer.backends
+
+    async def wait_ready(self, timeout=5):
+        """
+        Wait until every backend is connected.
+        :return: bool, True if all of them are ready
+        """
+        ready = await asyncio.gather(*[backend.channel.is_ready(timeout) for backend in self.backends])
+        return all(ready)
+
+    async def recognize(self, config: RecognitionConfig, audio, uuid: str, timeout=None):
+        request = RecognizeRequest(config=config, audio=audio, uuid=uuid)
+        return await self._call('Recognize', lambda: request, timeout)
+
+    async def streaming_recognize(self, config: RecognitionConfig, audio_chunks, uuid: str, timeout=None,
+                                  config_once=False):
+        """
+        Stream the audio chunks with the same config.
+        With `config_once` only the first request carries the config (and the uuid).
+        """
+        async def request_gen():
+            first = True
+            async for chunk in _aiter(audio_chunks):
+                if first or not config_once:
+                    yield RecognizeRequest(config=config, audio=chunk, uuid=uuid)
+                else:
+                    yield RecognizeRequest(audio=chunk)
+                first = False
+
+        requests = _AsyncReplayableRequests(request_gen(), self.max_replay_requests)
+        return await self._call('StreamingRecognize', requests, timeout)
+
+    async def streaming_recognize_raw(self, audio_params, uuid: str, timeout=None):
+        """
+        Stream (config, audio) pairs, each request is sent as soon as its pair is produced.
+        """
+        async def request_gen():
+            async for config, chunk in _aiter(audio_params):
+                yield RecognizeRequest(config=config, audio=chunk, uuid=uuid)
+
+        requests = _AsyncReplayableRequests(request_gen(), self.max_replay_requests)
+        return await self._call('StreamingRecognize', requests, timeout)
+
+    def stats(self):
+        """
+        Per backend load and latency stats (url --> dict).
+        """
+        return self.balancer.stats()
+
+    async def close(self):
+        if self._health_check is not None:
+            self._health_check.cancel()
+            self._health_check = None
+        await asyncio.gather(*[backend.channel.close() for backend in self.backends])
+
+    async def _call(self, method, requests, timeout):
+        """
+        Call the method on the least loaded backend with the per-call deadline.
+        While the backend is unavailable, retry (with the requests sent so far) on the
+        other backends, and once all of them failed after the backoff delay.
+        :param requests: callable that returns the request(s) of the attempt
+        """
+        self._start_health_check()
+        timeout = self.deadline if timeout is None else timeout
+        failed = set()
+        for attempt in range(self.reconnect_attempts + 1):
+            backend = self.balancer.acquire(exclude=failed)
+            start = time.perf_counter()
+            try:
+                response = await getattr(backend.channel.stub, method)(requests(), timeout=timeout)
+            except grpc.aio.AioRpcError as e:
+                unavailable = e.code() == grpc.StatusCode.UNAVAILABLE
+                self.balancer.release(backend, time.perf_counter() - start, failed=unavailable)
+                if not unavailable or attempt == self.reconnect_attempts or not getattr(requests, 'replayable', True):
+                    raise
+                if backend in failed or len(self.backends) == 1:
+                    delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1))
+                failed.add(backend)
+                continue
+            except asyncio.CancelledError:  # The session was cancelled, the call is not outstanding anymore
+                self.balancer.release(backend, time.perf_counter() - start)
+                raise
+            self.balancer.release(backend, _latency(requests, start))
+            return response
+
+    def _start_health_check(self):
+        if self.health_check_interval and self._health_check is None:
+            self._health_check = asyncio.ensure_future(self._health_check_loop())
+
+    async def _health_check_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for backend in self.backends:
+                if not backend.outstanding:
+                    self.balancer.update_health(backend, await backend.channel.is_ready(self.health_check_timeout))
+
+
+async def _aiter(iterable):
+    """
+    Iterate an async or a plain iterable. The items of a plain iterator (e.g. a microphone
+    generator) are produced in the default executor, so a blocking read doesn't block the event loop.
+    """
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    elif isinstance(iterable, (list, tuple)):
+        for item in iterable:
+            yield item
+    else:
+        loop = asyncio.get_event_loop()
+        iterator = iter(iterable)
+        done = object()
+        while True:
+            item = await loop.run_in_executor(None, next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+
+class _AsyncReplayableRequests(object):
+    """
+    Async request stream that can be restarted, see vernacular._ReplayableRequests.
+    Only the first `max_replay` requests are kept (None: all of them), once more are sent
+    the stream isn't `replayable` anymore.
+    A unary request (Recognize) is passed as a callable that returns it.
+    """
+
+    def __init__(self, requests, max_replay=None):
+        self._requests = requests
+        self.max_replay = max_replay
+        self.replayable = True
+        self.end_time = None  # time.perf_counter() once the stream is exhausted
+        self._sent = []
+
+    async def _replay(self):
+        for request in list(self._sent):
+            yield request
+        async for request in self._requests:
+            if self.replayable and self.max_replay is not None and len(self._sent) >= self.max_replay:
+                self.replayable = False
+                self._sent = []
+            if self.replayable:
+                self._sent.append(request)
+            yield request
+        self.end_time = self.end_time or time.perf_counter()
+
+    def __call__(self):
+        return self._replay()
@@ -0,0 +1,144 @@
+import time
+import logging
+import threading
+from collections import deque
+
+from vernacular.channel import KaldiServeChannel
+
+
+class Backend(object):
+    """
+    One KaldiServe endpoint, with its channel, load and latency stats.
+    """
+
+    def __init__(self, channel, latency_window=1000):
+        self.channel = channel
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0
+        self.latencies = deque(maxlen=latency_window)  # In seconds, of the latest successful calls (decode time)
+
+    @property
+    def url(self):
+        return self.channel.url
+
+    def is_ejected(self, now=None):
+        return (time.monotonic() if now is None else now) < self.ejected_until
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        percentile = lambda p: latencies[min(int(p * len(latencies)), len(latencies) - 1)] if latencies else None
+        return {
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'errors': self.errors,
+            'ejected': self.is_ejected(),
+            'state': self.channel.state.name if self.channel.state else None,
+            'latency_mean': sum(latencies) / len(latencies) if latencies else None,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+        }
+
+
+class LeastOutstandingBalancer(object):
+    """
+    Routes every call to the backend with the least outstanding requests.
+
+    A backend is ejected for `eject_seconds` after `eject_after_failures` consecutive
+    failures. The idle backends are health checked (a channel readiness check) every
+    `health_check_interval` seconds, an ejected backend that is ready again is reinstated.
+    When every backend is ejected, the calls are still routed to them (fail open).
+
+    The channels are created by `channel_factory(url, **channel_args)`. With `health_check_interval` 0
+    there is no health check thread, the owner of the channels reports the checks with update_health()
+    (e.g. the asyncio client, whose channels are checked on the event loop).
+    """
+
+    def __init__(self, urls, eject_after_failures=2, eject_seconds=10, health_check_interval=5,
+                 health_check_timeout=1, channel_factory=KaldiServeChannel, **channel_args):
+        self.logger = logging
+        self.backends = [Backend(channel_factory(url, **channel_args)) for url in urls]
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self._lock = threading.Lock()
+        self._next = 0  # Round robin among the equally loaded backends
+        self._closed = threading.Event()
+        if health_check_interval:
+            threading.Thread(target=self._health_check_loop, name='kaldi-serve-health-check', daemon=True).start()
+
+    def acquire(self, exclude=()):
+        """
+        Pick a backend and count the call as outstanding.
+        :param exclude: the backends to avoid (already failed in this call), if possible
+        :return: Backend
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if not b.is_ejected(now) and b not in exclude] or \
+                         [b for b in self.backends if b not in exclude] or self.backends
+            self._next = (self._next + 1) % len(self.backends)
+            backend = min(candidates, key=lambda b: (
+                b.outstanding, (self.backends.index(b) - self._next) % len(self.backends)))
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, latency, failed=False):
+        """
+        The call of the backend is completed.
+        :param latency: float, in seconds (of a stream, since its last request)
+        :param failed: bool, the backend failed (unavailable, not an application error)
+        """
+        with self._lock:
+            backend.outstanding -= 1
+            if not failed:
+                backend.consecutive_failures = 0
+                backend.latencies.append(latency)
+                return
+            backend.errors += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures >= self.eject_after_failures:
+                self._eject(backend)
+
+    def update_health(self, backend, ready):
+        """
+        The result of a health check, an ejected backend that is ready is reinstated
+        and an idle backend that is not ready is ejected.
+        :param ready: bool, the channel of the backend is ready
+        """
+        with self._lock:
+            if ready and backend.is_ejected():
+                self.logger.info('Reinstate KaldiServe backend {0}'.format(backend.url))
+                backend.ejected_until = 0
+                backend.consecutive_failures = 0
+            elif not ready and not backend.outstanding:
+                self._eject(backend)
+
+    def stats(self):
+        """
+        Per backend load and latency stats.
+        :return: dict, url --> dict
+        """
+        with self._lock:
+            return {backend.url: backend.stats() for backend in self.backends}
+
+    def close(self):
+        self._closed.set()
+        for backend in self.backends:
+            backend.channel.close()
+
+    def _eject(self, backend):
+        if not backend.is_ejected():
+            self.logger.warning('Eject KaldiServe backend {0} for {1} sec'.format(backend.url, self.eject_seconds))
+        backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    def _health_check_loop(self):
+        while not self._closed.wait(self.health_check_interval):
+            for backend in self.backends:
+                if backend.outstanding or self._closed.is_set():
+                    continue
+                self.update_health(backend, backend.channel.is_ready(self.health_check_timeout))
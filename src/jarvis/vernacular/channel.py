@@ -0,0 +1,94 @@
+import time
+import random
+import logging
+import threading
+from collections import Counter
+
+import grpc
+
+from vernacular.vernacular_pb2_grpc import KaldiServeStub
+
+
+class KaldiServeChannel(object):
+    """
+    gRPC channel (and stub) of one KaldiServe endpoint.
+    It waits for the server readiness, re-creates the channel with exponential backoff
+    and counts the connectivity state transitions.
+    """
+
+    def __init__(self, url, ready_timeout=5, keepalive_time_ms=30000, keepalive_timeout_ms=10000,
+                 backoff=0.5, max_backoff=8):
+        self.logger = logging
+        self.url = url
+        self.ready_timeout = ready_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.options = [
+            ('grpc.keepalive_time_ms', keepalive_time_ms),
+            ('grpc.keepalive_timeout_ms', keepalive_timeout_ms),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+        ]
+        self.state = None
+        self.state_transitions = Counter()  # (from state name, to state name) --> count
+        self.reconnects = 0
+        self._lock = threading.Lock()
+        self._channel = None
+        self.stub = None
+        self._create()
+
+    def wait_ready(self, timeout=None):
+        """
+        Wait until the channel is connected.
+        :param timeout: float, in seconds (default: ready_timeout)
+        :return: bool, True if the server is ready
+        """
+        timeout = self.ready_timeout if timeout is None else timeout
+        if self.is_ready(timeout):
+            return True
+        self.logger.warning('KaldiServe at {0} is not ready after {1} sec'.format(self.url, timeout))
+        return False
+
+    def is_ready(self, timeout):
+        """
+        Check (and trigger) the connection, without logging.
+        """
+        try:
+            grpc.channel_ready_future(self._channel).result(timeout=timeout)
+            return True
+        except grpc.FutureTimeoutError:
+            return False
+
+    def reconnect(self, attempt=0):
+        """
+        Re-create the channel, after the backoff delay of the attempt.
+        :return: bool, True if the new channel is ready
+        """
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        time.sleep(delay * random.uniform(0.5, 1))
+        with self._lock:
+            self.reconnects += 1
+            self.logger.info('Re-create the KaldiServe channel to {0} (attempt {1})'.format(self.url, attempt + 1))
+            self._close()
+            self._create()
+        return self.wait_ready()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _create(self):
+        self._channel = grpc.insecure_channel(self.url, options=self.options)
+        self._channel.subscribe(self._on_state_change, try_to_connect=True)
+        self.stub = KaldiServeStub(self._channel)
+
+    def _close(self):
+        if self._channel is not None:
+            self._channel.unsubscribe(self._on_state_change)
+            self._channel.close()
+            self._channel = None
+
+    def _on_state_change(self, state):
+        previous, self.state = self.state, state
+        self.state_transitions[(previous.name if previous else None, state.name)] += 1
+        self.logger.debug('KaldiServe channel to {0}: {1}'.format(self.url, state.name))
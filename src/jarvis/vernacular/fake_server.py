@@ -0,0 +1,209 @@
+"""
+Local stand-in of the KaldiServe server, for tests and benchmarks.
+
+Usage (from src/jarvis):
+    python -m vernacular.fake_server --port 5016 --transcripts transcripts.json --latency 0.1
+
+transcripts.json: {"<audio fingerprint>": "transcript" or [["transcript", confidence], ...]}
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import collections
+from concurrent import futures
+
+import grpc
+
+from vernacular.vernacular_pb2_grpc import KaldiServeServicer, add_KaldiServeServicer_to_server
+from vernacular.vernacular_pb2 import RecognizeResponse, SpeechRecognitionResult, SpeechRecognitionAlternative
+
+WAV_HEADER_SIZE = 44
+
+
+def audio_fingerprint(chunks):
+    """
+    The sha1 of the audio of the chunks (the wave headers are skipped), it doesn't depend on the chunking
+    or on the wave header. The compressed audio (FLAC) is not decoded, its fingerprint is the one of
+    the encoded bytes, so it differs from the fingerprint of the same PCM audio.
+    :param chunks: iterable of bytes-like
+    :return: str, hex digest
+    """
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        chunk = memoryview(chunk)
+        digest.update(chunk[WAV_HEADER_SIZE:] if chunk[:4] == b'RIFF' else chunk)
+    return digest.hexdigest()
+
+
+class FakeKaldiServeServicer(KaldiServeServicer):
+    """
+    KaldiServe servicer that answers with canned transcripts, keyed by the audio fingerprint.
+    The audio without a canned transcript gets the default `transcript` (None: no results).
+
+    The decode latency is `latency` + `real_time_factor` * the audio seconds, after the end
+    of the stream. The calls fail with `failure_code`, at random (`failure_rate`) or on demand
+    (`fail_next`).
+
+    It records every request, with its arrival time, per call (`records`, the last `max_records` calls
+    in their start order), so concurrent streams don't overwrite each other's records.
+    A stream may carry the config only in its first request, the config is then
+    applied to the rest of the stream (`configs` are the configs in effect).
+    """
+
+    def __init__(self, transcript='hello world', transcripts=None, latency=0, real_time_factor=0,
+                 failure_rate=0, failure_code=grpc.StatusCode.UNAVAILABLE, seed=None, max_records=100):
+        self.transcript = transcript
+        self.transcripts = dict(transcripts or {})  # fingerprint --> transcript or [(transcript, confidence)]
+        self.latency = latency
+        self.real_time_factor = real_time_factor
+        self.failure_rate = failure_rate
+        self.failure_code = failure_code
+        self.records = collections.deque(maxlen=max_records)  # CallRecord per call
+        self.calls = 0
+        self.failures = 0
+        self.request_received = threading.Event()
+        self._random = random.Random(seed)
+        self._fail_next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def requests(self):
+        """
+        The (time.perf_counter(), request) tuples of the last started call.
+        """
+        with self._lock:
+            return list(self.records[-1].requests) if self.records else []
+
+    @property
+    def configs(self):
+        """
+        The configs in effect of the requests of the last started call.
+        """
+        with self._lock:
+            return list(self.records[-1].configs) if self.records else []
+
+    def add_transcript(self, chunks, transcript):
+        """
+        Can the transcript (or the [(transcript, confidence)] alternatives) of the audio.
+        :return: str, the audio fingerprint
+        """
+        fingerprint = audio_fingerprint(chunks)
+        self.transcripts[fingerprint] = transcript
+        return fingerprint
+
+    def fail_next(self, calls=1, code=None):
+        """
+        Fail the next `calls` calls (with `code`, default: failure_code).
+        """
+        with self._lock:
+            self._fail_next = calls
+            self.failure_code = code or self.failure_code
+
+    def Recognize(self, request, context):
+        record = self._start_record()
+        self._record(record, request, request.config)
+        return self._decode(context, [request.audio.content], request.config)
+
+    def StreamingRecognize(self, request_iterator, context):
+        record = self._start_record()
+        config = None
+        chunks = []
+        for request in request_iterator:
+            if request.HasField('config'):
+                config = request.config
+            elif config is None:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'The first request of the stream has no config')
+            self._record(record, request, config)
+            chunks.append(request.audio.content)
+        return self._decode(context, chunks, config)
+
+    def _start_record(self):
+        record = CallRecord()
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def _record(self, record, request, config):
+        with self._lock:
+            record.requests.append((time.perf_counter(), request))
+            record.configs.append(config)
+        self.request_received.set()
+
+    def _decode(self, context, chunks, config):
+        with self._lock:
+            self.calls += 1
+            fail = self._fail_next > 0 or self._random.random() < self.failure_rate
+            self._fail_next = max(self._fail_next - 1, 0)
+            self.failures += fail
+        if fail:
+            context.abort(self.failure_code, 'Injected failure')
+
+        sample_rate = config.sample_rate_hertz if config and config.sample_rate_hertz else 8000
+        audio_seconds = sum(len(chunk) for chunk in chunks) / (2.0 * sample_rate)
+        time.sleep(self.latency + self.real_time_factor * audio_seconds)
+        return self._create_response(self.transcripts.get(audio_fingerprint(chunks), self.transcript))
+
+    @staticmethod
+    def _create_response(transcript):
+        if transcript is None:
+            return RecognizeResponse()
+        alternatives = [(transcript, 1.0)] if isinstance(transcript, str) else transcript
+        return RecognizeResponse(results=[SpeechRecognitionResult(alternatives=[
+            SpeechRecognitionAlternative(transcript=text, confidence=confidence)
+            for text, confidence in alternatives])])
+
+
+class CallRecord(object):
+    """
+    The requests (with their arrival time) and the configs in effect of one call.
+    """
+
+    def __init__(self):
+        self.requests = []  # (time.perf_counter(), request)
+        self.configs = []
+
+
+def serve(servicer=None, port=0, host='localhost', max_workers=10):
+    """
+    Start a gRPC server of the servicer.
+    :param port: int, 0: any free port
+    :return: tuple (grpc.Server, port)
+    """
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    add_KaldiServeServicer_to_server(servicer or FakeKaldiServeServicer(), server)
+    port = server.add_insecure_port('{0}:{1}'.format(host, port))
+    server.start()
+    return server, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake KaldiServe server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5016)
+    parser.add_argument('--transcripts', help='JSON file of fingerprint --> transcript')
+    parser.add_argument('--transcript', default='hello world', help='The transcript of the unknown audio')
+    parser.add_argument('--latency', type=float, default=0, help='Decode latency (sec)')
+    parser.add_argument('--real-time-factor', type=float, default=0, help='Decode seconds per audio second')
+    parser.add_argument('--failure-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    transcripts = {}
+    if args.transcripts:
+        with open(args.transcripts) as f:
+            transcripts = json.load(f)
+    servicer = FakeKaldiServeServicer(transcript=args.transcript,
+                                      transcripts=transcripts,
+                                      latency=args.latency,
+                                      real_time_factor=args.real_time_factor,
+                                      failure_rate=args.failure_rate)
+    server, port = serve(servicer, port=args.port, host=args.host)
+    print('Fake KaldiServe listening on {0}:{1}'.format(args.host, port))
+    server.wait_for_termination()
+
+
+if __name__ == '__main__':
+    main()
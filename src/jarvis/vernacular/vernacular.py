@@ -1,6 +1,9 @@
+import time
+import threading
+
 import grpc
 
-from vernacular.vernacular_pb2_grpc import KaldiServeStub
+from vernacular.balancer import LeastOutstandingBalancer
 from vernacular.vernacular_pb2 import RecognitionConfig, RecognizeRequest
 
 
@@ -11,18 +14,185 @@ class KaldiServeClient(object):
     Reference: https://github.com/googleapis/google-cloud-python/blob/3ba1ae73070769854a1f7371305c13752c0374ba/speech/google/cloud/speech_v1/gapic/speech_client.py
     """
 
-    def __init__(self, kaldi_serve_url="0.0.0.0:5016"):
-        self.channel = grpc.insecure_channel(kaldi_serve_url)
-        self._client = KaldiServeStub(self.channel)
+    def __init__(self, kaldi_serve_url="0.0.0.0:5016", ready_timeout=5, deadline=None, keepalive_time_ms=30000,
+                 keepalive_timeout_ms=10000, reconnect_attempts=3, backoff=0.5, max_backoff=8, wait_ready=True,
+                 eject_after_failures=2, eject_seconds=10, health_check_interval=5, max_replay_requests=None):
+        """
+        :param kaldi_serve_url: str or list of str, the backend(s) address
+        :param max_replay_requests: int, the sent requests of a stream that are kept to retry it
+        (None: all of them). A stream that sent more is not retried, so long streams (e.g. whole files)
+        are not held in memory.
+        """
+        self.deadline = deadline
+        self.reconnect_attempts = reconnect_attempts
+        self.max_replay_requests = max_replay_requests
+        self.last_stream = None  # Requests & bytes on the wire of the last stream
+        urls = [kaldi_serve_url] if isinstance(kaldi_serve_url, str) else list(kaldi_serve_url)
+        self.balancer = LeastOutstandingBalancer(urls,
+                                                 eject_after_failures=eject_after_failures,
+                                                 eject_seconds=eject_seconds,
+                                                 health_check_interval=health_check_interval,
+                                                 ready_timeout=ready_timeout,
+                                                 keepalive_time_ms=keepalive_time_ms,
+                                                 keepalive_timeout_ms=keepalive_timeout_ms,
+                                                 backoff=backoff,
+                                                 max_backoff=max_backoff)
+        if wait_ready:
+            for backend in self.balancer.backends:
+                backend.channel.wait_ready()
+
+    @property
+    def backends(self):
+        return self.balancer.backends
+
+    def stats(self):
+        """
+        Per backend load and latency stats (url --> dict).
+        """
+        return self.balancer.stats()
 
     def recognize(self, config: RecognitionConfig, audio, uuid: str, timeout=None):
         request = RecognizeRequest(config=config, audio=audio, uuid=uuid)
-        return self._client.Recognize(request, timeout=timeout)
+        return self._call('Recognize', lambda: request, timeout)
 
-    def streaming_recognize(self, config: RecognitionConfig, audio_chunks, uuid: str, timeout=None):
-        request_gen = (RecognizeRequest(config=config, audio=chunk, uuid=uuid) for chunk in audio_chunks)
-        return self._client.StreamingRecognize(request_gen, timeout=timeout)
+    def streaming_recognize(self, config: RecognitionConfig, audio_chunks, uuid: str, timeout=None,
+                            config_once=False):
+        """
+        Stream the audio chunks with the same config.
+        With `config_once` only the first request carries the config (and the uuid),
+        the server applies it to the rest of the stream.
+        """
+        if config_once:
+            request_gen = self._config_once_requests(config, audio_chunks, uuid)
+        else:
+            request_gen = (RecognizeRequest(config=config, audio=chunk, uuid=uuid) for chunk in audio_chunks)
+        return self._stream(request_gen, timeout)
 
     def streaming_recognize_raw(self, audio_params, uuid: str, timeout=None):
+        """
+        Stream (config, audio) pairs. The pairs are consumed lazily, each request is sent
+        as soon as its pair is generated, so the server decodes while the audio is captured.
+        """
         request_gen = (RecognizeRequest(config=config, audio=chunk, uuid=uuid) for config, chunk in audio_params)
-        return self._client.StreamingRecognize(request_gen, timeout=timeout)
+        return self._stream(request_gen, timeout)
+
+    def close(self):
+        self.balancer.close()
+
+    def _stream(self, request_gen, timeout):
+        requests = _ReplayableRequests(request_gen, self.max_replay_requests)
+        try:
+            return self._call('StreamingRecognize', requests, timeout)
+        finally:
+            self.last_stream = {'requests': requests.count, 'wire_bytes': requests.wire_bytes}
+
+    def _call(self, method, requests, timeout):
+        """
+        Call the method on the least loaded backend with the per-call deadline.
+        While the backend is unavailable, retry (with the requests sent so far) on the
+        other backends, and once all of them failed re-create the channel.
+        A stream that can't be replayed anymore is not retried.
+        The latency of a stream is measured from its last request (the end of the capture), so it's
+        the decode time of the backend, not the length of the utterance.
+        :param requests: callable that returns the request(s) of the attempt
+        """
+        timeout = self.deadline if timeout is None else timeout
+        failed = set()
+        for attempt in range(self.reconnect_attempts + 1):
+            backend = self.balancer.acquire(exclude=failed)
+            start = time.perf_counter()
+            try:
+                response = getattr(backend.channel.stub, method)(requests(), timeout=timeout)
+            except grpc.RpcError as e:
+                if hasattr(requests, 'stop'):
+                    requests.stop()  # The failed call may still be reading the stream
+                unavailable = e.code() == grpc.StatusCode.UNAVAILABLE
+                self.balancer.release(backend, time.perf_counter() - start, failed=unavailable)
+                if not unavailable or attempt == self.reconnect_attempts or not getattr(requests, 'replayable', True):
+                    raise
+                if backend in failed or len(self.backends) == 1:
+                    backend.channel.reconnect(attempt)
+                failed.add(backend)
+                continue
+            self.balancer.release(backend, _latency(requests, start))
+            return response
+
+    @staticmethod
+    def _config_once_requests(config: RecognitionConfig, audio_chunks, uuid: str):
+        for i, chunk in enumerate(audio_chunks):
+            if i == 0:
+                yield RecognizeRequest(config=config, audio=chunk, uuid=uuid)
+            else:
+                yield RecognizeRequest(audio=chunk)
+
+
+def _latency(requests, start):
+    """
+    Seconds since the start of the call, or since the last request of a stream that ended later.
+    """
+    end_time = getattr(requests, 'end_time', None)
+    return time.perf_counter() - max(start, end_time or start)
+
+
+class _ReplayableRequests(object):
+    """
+    Lazy request stream that can be restarted: every call returns an iterator that
+    replays the requests sent so far and continues with the rest of the stream.
+    Only the first `max_replay` requests are kept (None: all of them), once more are sent
+    the stream isn't `replayable` anymore and the kept requests are released.
+
+    gRPC reads the requests of a call in its own thread, which may still be waiting for the next
+    request when the call fails. The stream is read under a lock and only by the iterator of the
+    latest call, the iterators of the previous calls stop at their next request.
+    """
+
+    def __init__(self, requests, max_replay=None):
+        self._requests = iter(requests)
+        self.max_replay = max_replay
+        self.replayable = True
+        self.sent = []
+        self.count = 0  # Sent requests (the replays are not counted)
+        self.wire_bytes = 0  # Serialized size of the sent requests (the replays are not counted)
+        self.end_time = None  # time.perf_counter() once the stream is exhausted
+        self._attempt = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self._attempt += 1
+            return self._iterate(self._attempt)
+
+    def stop(self):
+        """
+        Stop the iterator of the current call, e.g. of a failed call. It waits for the request
+        being read, so the sent requests (and `replayable`) are final once it returns.
+        """
+        with self._lock:
+            self._attempt += 1
+
+    def _iterate(self, attempt):
+        replayed = 0
+        while True:
+            with self._lock:
+                if attempt != self._attempt:
+                    return
+                if replayed < len(self.sent):
+                    request = self.sent[replayed]
+                    replayed += 1
+                else:
+                    request = next(self._requests, None)
+                    if request is None:
+                        self.end_time = self.end_time or time.perf_counter()
+                        return
+                    self._add_sent(request)
+                    replayed = len(self.sent)
+            yield request
+
+    def _add_sent(self, request):
+        self.count += 1
+        self.wire_bytes += request.ByteSize()
+        if self.replayable and self.max_replay is not None and len(self.sent) >= self.max_replay:
+            self.replayable = False
+            self.sent = []
+        if self.replayable:
+            self.sent.append(request)
@@ -0,0 +1,170 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import asyncio
+import unittest
+import threading
+
+import grpc
+
+from vernacular.vernacular_pb2 import RecognitionConfig, RecognitionAudio
+from vernacular.fake_server import FakeKaldiServeServicer, serve
+
+try:
+    from vernacular import aio  # Python >= 3.6, grpcio >= 1.32
+except (ImportError, SyntaxError):
+    aio = None
+
+
+class Microphone(object):
+    """
+    Async iterator of the audio chunks of a session (an async generator needs Python >= 3.6).
+    """
+
+    def __init__(self, i):
+        self.chunks = [bytes([i]) * 160, bytes([i + 1]) * 160]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(0.01)
+        return RecognitionAudio(content=self.chunks.pop(0))
+
+
+@unittest.skipIf(aio is None, 'grpc.aio is not available (Python >= 3.6, grpcio >= 1.32)')
+class AsyncClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.servicer = FakeKaldiServeServicer(latency=0.2)
+        self.server, port = serve(self.servicer, max_workers=50)
+        self.url = 'localhost:{0}'.format(port)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.server.stop(None)
+
+    def _run(self, coroutine_function, url=None, **kwargs):
+        async def run():
+            client = aio.AsyncKaldiServeClient(url or self.url, deadline=10, **kwargs)
+            try:
+                return await coroutine_function(client)
+            finally:
+                await client.close()
+        return self.loop.run_until_complete(run())
+
+    def test_concurrent_sessions(self):
+        async def sessions(client):
+            return await asyncio.gather(*[
+                client.streaming_recognize(RecognitionConfig(raw=True), Microphone(i), uuid=str(i), config_once=True)
+                for i in range(30)])
+
+        start = time.perf_counter()
+        responses = self._run(sessions)
+
+        self.assertLess(time.perf_counter() - start, 0.2 * 30 / 3)
+        self.assertEqual(len(responses), 30)
+        self.assertTrue(all(r.results[0].alternatives[0].transcript == 'hello world' for r in responses))
+
+    def test_recognize_and_raw(self):
+        config = RecognitionConfig(raw=True, data_bytes=2)
+        audio = RecognitionAudio(content=b'\x00\x01')
+
+        async def calls(client):
+            return (await client.recognize(config, audio, uuid=''),
+                    await client.streaming_recognize_raw([(config, audio)] * 3, uuid=''))
+
+        recognized, streamed = self._run(calls)
+
+        self.assertEqual(recognized.results[0].alternatives[0].transcript, 'hello world')
+        self.assertEqual(streamed.results[0].alternatives[0].transcript, 'hello world')
+        self.assertEqual(len(self.servicer.requests), 3)
+
+    def test_retry_on_unavailable(self):
+        self.servicer.latency = 0
+        self.servicer.fail_next(1)
+
+        async def call(client):
+            response = await client.streaming_recognize(
+                RecognitionConfig(raw=True), [RecognitionAudio(content=b'\x00\x01')] * 2, uuid='')
+            return response, client.stats()[self.url]
+
+        response, stats = self._run(call)
+
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'hello world')
+        self.assertEqual((stats['requests'], stats['errors']), (2, 1))
+        self.assertEqual(len(self.servicer.requests), 2)
+
+    def test_bounded_replay(self):
+        self.servicer.latency = 0
+        self.servicer.fail_next(1)
+
+        async def call(client):
+            await client.streaming_recognize(
+                RecognitionConfig(raw=True), [RecognitionAudio(content=b'\x00\x01')] * 3, uuid='')
+
+        # The stream sent more requests than it keeps, it's not retried
+        with self.assertRaises(grpc.aio.AioRpcError) as raised:
+            self._run(call, max_replay_requests=2, backoff=0)
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(self.servicer.calls, 1)
+
+    def test_eject_failing_backend(self):
+        self.servicer.latency = 0
+        down = '127.0.0.1:1'  # Nothing listens there
+
+        async def calls(client):
+            responses = [await client.recognize(RecognitionConfig(raw=True), RecognitionAudio(content=b'\x00\x01'),
+                                                uuid='') for _ in range(4)]
+            return responses, client.stats()
+
+        responses, stats = self._run(calls, url=[down, self.url], backoff=0, eject_after_failures=1,
+                                     health_check_interval=0)
+
+        self.assertEqual(len(responses), 4)
+        self.assertTrue(stats[down]['ejected'])
+        self.assertEqual(stats[down]['errors'], stats[down]['requests'])
+        self.assertEqual(stats[self.url]['requests'], 4)
+
+    def test_blocking_chunks_run_in_the_executor(self):
+        self.servicer.latency = 0
+        main_thread = threading.current_thread()
+        threads = []
+
+        def microphone():
+            for i in range(3):
+                threads.append(threading.current_thread())
+                time.sleep(0.01)  # Blocking read
+                yield RecognitionAudio(content=bytes([i]) * 160)
+
+        async def call(client):
+            return await client.streaming_recognize(RecognitionConfig(raw=True), microphone(), uuid='')
+
+        response = self._run(call)
+
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'hello world')
+        self.assertEqual(len(self.servicer.requests), 3)
+        self.assertNotIn(main_thread, threads)
@@ -0,0 +1,360 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from jarvis.settings import ANALYZER
+from jarvis.skills.skills_registry import SKILLS
+from jarvis.skills.skill_analyzer import SkillAnalyzer
+from jarvis.skills.analyzer_model import CompiledVectorizer, AnalyzerModelStore, model_key
+from jarvis.skills import tokenizer
+from jarvis.skills.analyzer_backends import sklearn_backend, inverted_index_backend
+
+
+class SkillIndexCompilationTests(unittest.TestCase):
+
+    transcripts = ['open youtube', 'what time is it', 'tell me the weather in london', 'nothing to match here', '']
+
+    args_list = [
+        ANALYZER['args'],
+        {'norm': 'l2', 'use_idf': True, 'smooth_idf': False},
+        {'norm': None, 'binary': True, 'sublinear_tf': True, 'ngram_range': (1, 2), 'stop_words': 'english'},
+    ]
+
+    def test_compiled_vectorizer_matches_the_fitted_one(self):
+        weight_measure, _ = sklearn_backend()
+        tags = SkillAnalyzer._create_tags(SKILLS)
+        for args in self.args_list:
+            fitted = weight_measure(**args)
+            fitted.fit_transform(tags)
+            compiled = CompiledVectorizer.from_fitted(fitted, args)
+            expected = fitted.transform(self.transcripts).toarray()
+            self.assertTrue(np.allclose(compiled.transform(self.transcripts).toarray(), expected),
+                            msg='args: {0}'.format(args))
+
+    def test_the_index_is_fitted_once(self):
+        weight_measure, similarity_measure = sklearn_backend()
+        with mock.patch.object(SkillAnalyzer, '_train_model', autospec=True,
+                               side_effect=SkillAnalyzer._train_model) as train_model:
+            analyzer = SkillAnalyzer(weight_measure, similarity_measure, ANALYZER['args'], SKILLS,
+                                     ANALYZER['sensitivity'])
+            for transcript in self.transcripts * 3:
+                analyzer.extract(transcript)
+            analyzer.extract_many(self.transcripts)
+        self.assertEqual(train_model.call_count, 1)
+        self.assertIsInstance(analyzer.index.vectorizer, CompiledVectorizer)
+        self.assertEqual(analyzer.index.skill_keys, tuple(SKILLS))
+        self.assertEqual(analyzer.index.skill_matrix.shape[0], len(SKILLS))
+
+
+class ExtractManyTests(unittest.TestCase):
+
+    transcripts = ['open youtube', 'what time is it', 'tell me the weather in london', 'nothing to match here', '']
+
+    def test_batch_matches_single_extractions(self):
+        weight_measure, similarity_measure = sklearn_backend()
+        similarity_measure = mock.Mock(side_effect=similarity_measure)
+        analyzer = SkillAnalyzer(weight_measure, similarity_measure, ANALYZER['args'], SKILLS,
+                                 ANALYZER['sensitivity'])
+
+        results = analyzer.extract_many(self.transcripts)
+        self.assertEqual(similarity_measure.call_count, 1)  # One similarity computation for the batch
+        self.assertEqual(len(results), len(self.transcripts))
+        for transcript, (skill, score) in zip(self.transcripts, results):
+            self.assertIs(skill, analyzer.extract(transcript))
+            self.assertEqual(skill is None, score <= ANALYZER['sensitivity'])
+        self.assertIs(results[0][0], SKILLS['open_site_in_browser'])
+        self.assertIsNone(results[-1][0])
+        self.assertEqual(analyzer.extract_many([]), [])
+
+
+class AnalyzerModelStoreTests(unittest.TestCase):
+
+    transcripts = ['open youtube', 'what time is it', 'tell me the weather in london', 'nothing to match here']
+    args = {'norm': 'l2', 'use_idf': True}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = mock.Mock(side_effect=sklearn_backend, __module__=__name__, __qualname__='sklearn_backend')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _create_analyzer(self, skills=SKILLS, args=None):
+        return SkillAnalyzer(weight_measure=None, similarity_measure=None, args=args or self.args, skills_=skills,
+                             sensitivity=ANALYZER['sensitivity'], model_store=AnalyzerModelStore(self.directory),
+                             backend=self.backend)
+
+    def _similarities(self, analyzer):
+        return analyzer._similarities(self.transcripts, analyzer.index)[1]
+
+    def test_round_trip(self):
+        fitted = self._create_analyzer()
+        self.assertEqual(self.backend.call_count, 1)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        with mock.patch.object(SkillAnalyzer, '_train_model') as train_model:
+            loaded = self._create_analyzer()
+        train_model.assert_not_called()
+        self.assertEqual(self.backend.call_count, 1)  # The backend isn't loaded for a stored model
+        self.assertEqual(loaded.index.skill_keys, fitted.index.skill_keys)
+        self.assertTrue(np.allclose(self._similarities(loaded), self._similarities(fitted)))
+        for transcript in self.transcripts:
+            self.assertIs(loaded.extract(transcript), fitted.extract(transcript))
+
+    def test_invalidation(self):
+        self._create_analyzer()
+        skills = dict(SKILLS, tell_a_joke={'enable': True, 'skill': None, 'tags': {'joke', 'funny'}})
+        for analyzer_args in ({'skills': skills}, {'args': {'norm': 'l1', 'use_idf': True}}):
+            with mock.patch.object(SkillAnalyzer, '_train_model', autospec=True,
+                                   side_effect=SkillAnalyzer._train_model) as train_model:
+                self._create_analyzer(**analyzer_args)
+            self.assertEqual(train_model.call_count, 1, msg=analyzer_args)
+            self.assertEqual(len(os.listdir(self.directory)), 1)  # The stale model is removed
+
+    def test_other_files_are_kept(self):
+        os.makedirs(os.path.join(self.directory, 'notes'))
+        with open(os.path.join(self.directory, 'a' * 40 + '.npy'), 'w') as f:
+            f.write('not a model')
+        self._create_analyzer()
+        self._create_analyzer(args={'norm': 'l1', 'use_idf': True})
+        names = sorted(os.listdir(self.directory))
+        self.assertEqual(len(names), 3)
+        self.assertIn('notes', names)
+        self.assertIn('a' * 40 + '.npy', names)
+
+    def test_key_is_stable_under_reordering(self):
+        reordered = {key: dict(SKILLS[key], tags=set(sorted(SKILLS[key]['tags'], reverse=True)))
+                     for key in reversed(list(SKILLS))}
+        self.assertEqual(model_key(reordered, self.args, sklearn_backend),
+                         model_key(SKILLS, self.args, sklearn_backend))
+        self.assertEqual(model_key(SKILLS, {'use_idf': True, 'norm': 'l2'}, sklearn_backend),
+                         model_key(SKILLS, self.args, sklearn_backend))
+        self.assertNotEqual(model_key(SKILLS, self.args, inverted_index_backend),
+                            model_key(SKILLS, self.args, sklearn_backend))
+
+        fitted = self._create_analyzer()
+        with mock.patch.object(SkillAnalyzer, '_train_model') as train_model:
+            loaded = self._create_analyzer(skills=reordered)
+        train_model.assert_not_called()
+        # The stored rows follow the order of the reordered skills
+        self.assertEqual(loaded.index.skill_keys, tuple(reordered))
+        rows = [fitted.index.skill_keys.index(key) for key in reordered]
+        self.assertTrue(np.allclose(self._similarities(loaded), self._similarities(fitted)[rows]))
+
+    def test_key_is_stable_across_processes(self):
+        code = ("from jarvis.skills.analyzer_model import model_key\n"
+                "from jarvis.skills.analyzer_backends import sklearn_backend\n"
+                "skills = {'b': {'tags': {'open', 'open firefox'}}, 'a': {'tags': {'time', 'hour'}}}\n"
+                "print(model_key(skills, {'stop_words': {'the', 'of', 'me'}}, sklearn_backend))")
+        keys = {subprocess.check_output([sys.executable, '-c', code],
+                                        env=dict(os.environ, PYTHONHASHSEED=str(seed),
+                                                 PYTHONPATH=os.pathsep.join(sys.path)))
+                for seed in range(1, 4)}
+        self.assertEqual(len(keys), 1)
+
+
+class InvertedIndexParityTests(unittest.TestCase):
+
+    transcripts = [
+        'open youtube',
+        'what time is it',
+        'tell me the weather in london',
+        'jarvis can you spell the word animal',
+        'how much memory are you using',
+        'hi jarvis',
+        'nothing to match here',
+        '',
+    ]
+
+    args_list = [
+        ANALYZER['args'],
+        {'norm': 'l2', 'use_idf': True},
+        {'norm': 'l1', 'use_idf': True, 'smooth_idf': False, 'sublinear_tf': True},
+        {'norm': None, 'binary': True, 'ngram_range': (1, 2)},
+        {'norm': 'l2', 'use_idf': True, 'stop_words': 'english'},
+    ]
+
+    def _create_analyzers(self, args):
+        analyzers = []
+        for backend in (sklearn_backend, inverted_index_backend):
+            weight_measure, similarity_measure = backend()
+            analyzers.append(SkillAnalyzer(weight_measure=weight_measure,
+                                           similarity_measure=similarity_measure,
+                                           args=args,
+                                           skills_=SKILLS,
+                                           sensitivity=ANALYZER['sensitivity']))
+        return analyzers
+
+    def test_similarities(self):
+        transcripts = self.transcripts + [tag for skill in SKILLS.values() for tag in skill['tags']]
+        for args in self.args_list:
+            sklearn_analyzer, inverted_index_analyzer = self._create_analyzers(args)
+            _, expected = sklearn_analyzer._similarities(transcripts, sklearn_analyzer.index)
+            _, actual = inverted_index_analyzer._similarities(transcripts, inverted_index_analyzer.index)
+            self.assertTrue(np.allclose(expected, actual), msg='args: {0}'.format(args))
+
+    def test_english_stop_words_without_sklearn(self):
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        self.assertEqual(tokenizer.ENGLISH_STOP_WORDS, ENGLISH_STOP_WORDS)
+
+        code = ("import sys\n"
+                "from jarvis.skills.analyzer_backends import inverted_index_backend\n"
+                "weight_measure, _ = inverted_index_backend()\n"
+                "vectorizer = weight_measure(stop_words='english')\n"
+                "vectorizer.fit_transform(['tell me the time', 'open youtube'])\n"
+                "assert vectorizer.transform(['what is the time'])[0].keys() == {'time'}\n"
+                "print(any(name.startswith('sklearn') for name in sys.modules))")
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        self.assertEqual(output.strip(), b'False')
+
+    def test_extract(self):
+        sklearn_analyzer, inverted_index_analyzer = self._create_analyzers(ANALYZER['args'])
+        for transcript in self.transcripts:
+            self.assertIs(sklearn_analyzer.extract(transcript), inverted_index_analyzer.extract(transcript))
+
+
+class IncrementalUpdateTests(unittest.TestCase):
+
+    new_skills = {
+        'tell_a_joke': {'enable': True, 'skill': None, 'tags': {'joke', 'funny'}},
+        'play_music': {'enable': True, 'skill': None, 'tags': {'play music', 'guitar'}},
+    }
+    transcripts = ['open youtube', 'what time is it', 'tell me a funny joke', 'play the guitar', 'weather in london']
+
+    def test_updates_match_a_refitted_index(self):
+        for backend in (sklearn_backend, inverted_index_backend):
+            weight_measure, similarity_measure = backend()
+            analyzer = SkillAnalyzer(weight_measure, similarity_measure, ANALYZER['args'], SKILLS,
+                                     ANALYZER['sensitivity'])
+            analyzer.remove_skills(['tell_time', 'tells_the_weather'])
+            analyzer.add_skills(self.new_skills)
+            analyzer.remove_skills(['tell_a_joke'])
+
+            refitted = SkillAnalyzer(weight_measure, similarity_measure, ANALYZER['args'], analyzer.skills,
+                                     ANALYZER['sensitivity'])
+            self.assertEqual(refitted.index.skill_keys, analyzer.index.skill_keys)
+            _, expected = refitted._similarities(self.transcripts, refitted.index)
+            _, actual = analyzer._similarities(self.transcripts, analyzer.index)
+            self.assertTrue(np.allclose(expected, actual), msg='backend: {0}'.format(backend.__name__))
+
+
+class FuzzyFallbackTests(unittest.TestCase):
+
+    def _create_analyzer(self, args=None, fuzzy_sensitivity=None):
+        weight_measure, similarity_measure = sklearn_backend()
+        return SkillAnalyzer(weight_measure, similarity_measure, args or ANALYZER['args'], SKILLS,
+                             ANALYZER['sensitivity'], fuzzy_fallback=True,
+                             fuzzy_sensitivity=fuzzy_sensitivity or ANALYZER['fuzzy_sensitivity'])
+
+    def test_misrecognized_words(self):
+        analyzer = self._create_analyzer()
+        self.assertIs(analyzer.extract('create a remainder'), SKILLS['create_reminder'])
+        self.assertIs(analyzer.extract('temprature'), SKILLS['tells_the_weather'])
+
+    def test_below_the_sensitivity(self):
+        self.assertIsNone(self._create_analyzer().extract('xylophone quartz'))
+        # 'create a remainder' --> 'create', 'reminder' scores ~0.78
+        self.assertIsNone(self._create_analyzer(fuzzy_sensitivity=0.8).extract('create a remainder'))
+
+    def test_out_of_domain(self):
+        analyzer = self._create_analyzer()
+        # 'mind' sounds like 'remind' (~0.42)
+        self.assertIsNone(analyzer.extract('never mind'))
+        # 'white' sounds like 'what', a stop word of the skills tags
+        self.assertIsNone(analyzer.extract('white'))
+
+    def test_short_and_stop_words_not_indexed(self):
+        fuzzy_index = self._create_analyzer().index.fuzzy_index
+        self.assertEqual(fuzzy_index.skill_words['tell_the_skills'], {'skills'})
+        self.assertEqual(fuzzy_index.match('what are you'), (None, 0.0))
+
+    def test_analyzer_args(self):
+        args = dict(ANALYZER['args'], stop_words=['in'])
+        analyzer = self._create_analyzer(args)
+        self.assertEqual(analyzer.index.fuzzy_index.analyze('wether in london'), ['wether', 'london'])
+        self.assertIs(analyzer.extract('wheather'), SKILLS['tells_the_weather'])
+
+        analyzer = self._create_analyzer(dict(ANALYZER['args'], stop_words='english'))
+        self.assertEqual(analyzer.index.fuzzy_index.analyze('tell me the wether'), ['tell', 'wether'])
+
+
+class ExtractBestTests(unittest.TestCase):
+
+    def setUp(self):
+        weight_measure, similarity_measure = sklearn_backend()
+        self.analyzer = SkillAnalyzer(weight_measure, similarity_measure, ANALYZER['args'], SKILLS,
+                                      ANALYZER['sensitivity'])
+
+    def test_lower_ranked_alternative(self):
+        alternatives = [{'transcript': 'dime please', 'confidence': 0.6},
+                        {'transcript': 'time please', 'confidence': 0.3}]
+        transcript, skill, score = self.analyzer.extract_best(alternatives)
+        self.assertEqual(transcript, 'time please')
+        self.assertIs(skill, SKILLS['tell_time'])
+        self.assertGreater(score, 0.0)
+
+    def test_no_alternative_above_the_sensitivity(self):
+        alternatives = [{'transcript': 'nothing to match here', 'confidence': 0.6},
+                        {'transcript': 'xylophone quartz', 'confidence': 0.3}]
+        self.assertEqual(self.analyzer.extract_best(alternatives), ('nothing to match here', None, 0.0))
+        self.assertEqual(self.analyzer.extract_best([]), ('', None, 0.0))
+
+
+class TranscriptCacheTests(unittest.TestCase):
+
+    transcript = 'what time is it'
+
+    def setUp(self):
+        weight_measure, similarity_measure = sklearn_backend()
+        self.analyzer = SkillAnalyzer(weight_measure, similarity_measure, ANALYZER['args'], SKILLS,
+                                      ANALYZER['sensitivity'], cache_size=16)
+
+    def _assert_cached(self, skill):
+        self.assertIs(self.analyzer.extract(self.transcript), skill)
+        self.assertIs(self.analyzer.extract(self.transcript.upper()), skill)  # Normalized transcript hit
+        self.assertEqual(self.analyzer.cache_info()['hits'], 1)
+
+    def test_invalidated_on_index_change(self):
+        self._assert_cached(SKILLS['tell_time'])
+
+        self.analyzer.remove_skills(['tell_time'])
+        self.assertEqual(self.analyzer.cache_info()['hits'], 0)
+        self.assertIsNot(self.analyzer.extract(self.transcript), SKILLS['tell_time'])
+
+        new_skill = {'enable': True, 'skill': None, 'tags': {'time'}}
+        self.analyzer.add_skills({'tell_the_time': new_skill})
+        self._assert_cached(new_skill)
+
+        skills = {key: skill for (key, skill) in SKILLS.items() if key != 'tell_time'}
+        self.analyzer.rebuild(skills)
+        self.assertEqual(self.analyzer.cache_info()['hits'], 0)
+        self.assertIsNot(self.analyzer.extract(self.transcript), new_skill)
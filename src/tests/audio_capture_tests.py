@@ -0,0 +1,115 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from jarvis.engines import audio_capture
+from jarvis.engines.audio_capture import RingBuffer, CaptureBuffer, AudioCaptureService, AudioCaptureError
+
+
+class RingBufferTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = RingBuffer(seconds=0.01, sample_rate=1000, channels=1)  # 10 samples
+
+    def _write(self, *values):
+        self.ring.write(np.array(values, dtype=np.int16).tobytes())
+
+    def _latest(self, **kwargs):
+        return np.frombuffer(self.ring.latest(**kwargs), dtype=np.int16).tolist()
+
+    def test_partial(self):
+        self._write(1, 2, 3)
+        self.assertEqual(self._latest(), [1, 2, 3])
+
+    def test_wrap_around(self):
+        self._write(*range(8))
+        self._write(*range(8, 13))
+        self.assertEqual(self._latest(), list(range(3, 13)))
+        self.assertEqual(self._latest(seconds=0.004, sample_rate=1000), [9, 10, 11, 12])
+
+    def test_longer_than_capacity(self):
+        self._write(*range(25))
+        self.assertEqual(self._latest(), list(range(15, 25)))
+
+    def test_latest_is_a_view(self):
+        self._write(*range(5))
+        view = self.ring.latest()
+        self.assertIs(view.obj.base, self.ring._array)
+
+    def test_clear(self):
+        self._write(1, 2)
+        self.ring.clear()
+        self.assertEqual(self._latest(), [])
+        self.assertEqual(self.ring.nbytes, 2 * 10 * 2)
+
+
+class CaptureBufferTests(unittest.TestCase):
+
+    def test_views_survive_growth(self):
+        capture_buffer = CaptureBuffer(4)
+        first = capture_buffer.append(b'ab')
+        second = capture_buffer.append(b'cde')
+        self.assertEqual((bytes(first), bytes(second), bytes(capture_buffer.data)), (b'ab', b'cde', b'abcde'))
+
+
+class AudioCaptureServiceTests(unittest.TestCase):
+
+    chunk = np.arange(160, dtype=np.int16).tobytes()
+
+    def _create_stream(self, *reads):
+        stream = mock.Mock()
+        stream.read.side_effect = reads
+        stream.get_read_available.return_value = 0
+        return stream
+
+    def _create_service(self, *streams):
+        audio = mock.Mock()
+        audio.open.side_effect = streams
+        patcher = mock.patch.object(audio_capture.pyaudio, 'PyAudio', return_value=audio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        service = AudioCaptureService(sample_rate=16000, channels=1, chunk_size=160, reopen_attempts=2, reopen_delay=0)
+        self.addCleanup(service.close)
+        return service, audio
+
+    def test_reopen_after_read_failure(self):
+        failing_stream = self._create_stream(OSError(-9981, 'Input overflowed'))
+        stream = self._create_stream(*[self.chunk] * 10)
+        service, audio = self._create_service(failing_stream, stream)
+
+        chunks = [bytes(chunk) for chunk in service.utterance(seconds=0.05)]
+        self.assertEqual(chunks, [self.chunk] * 5)
+        self.assertEqual(audio.open.call_count, 2)
+        failing_stream.close.assert_called_once_with()
+        stream.close.assert_not_called()
+
+    def test_reopen_attempts(self):
+        streams = [self._create_stream(OSError(-9999, 'Unanticipated host error')) for _ in range(3)]
+        service, audio = self._create_service(*streams)
+
+        with self.assertRaises(AudioCaptureError):
+            list(service.utterance(seconds=0.05))
+        self.assertEqual(audio.open.call_count, 3)
@@ -0,0 +1,202 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import threading
+from unittest import mock
+
+from jarvis.core.controller import SkillController
+from jarvis.skills.skill_analyzer import SkillAnalyzer
+from jarvis.skills.analyzer_backends import inverted_index_backend
+
+
+def create_skills():
+    tags = {
+        'enable_assistant': {'hi', 'jarvis', 'start'},
+        'open_site_in_browser': {'open'},
+        'tell_time': {'hour', 'time'},
+        'tell_about': {'about'},
+        'tells_the_weather': {'temperature', 'weather', 'weather prediction'},
+        'spell_a_word': {'spell', 'spell the word'},
+    }
+    return {key: {'enable': True, 'skill': mock.Mock(name=key), 'tags': skill_tags}
+            for key, skill_tags in tags.items()}
+
+
+class SkillControllerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.skills = create_skills()
+        weight_measure, similarity_measure = inverted_index_backend()
+        analyzer = SkillAnalyzer(weight_measure, similarity_measure,
+                                 args={'stop_words': None, 'lowercase': True, 'norm': 'l1', 'use_idf': False},
+                                 skills_=self.skills, sensitivity=0.2, conjunctions=['and', 'then', 'and then', 'also'],
+                                 fuzzy_fallback=True)
+        self.input_engine = mock.Mock(spec=['recognize_input'])
+        self.controller = SkillController(settings_={'user_voice_input': True, 'enable_period': 60},
+                                          input_engine=self.input_engine,
+                                          analyzer=analyzer,
+                                          control_skills={'enable_assistant': self.skills['enable_assistant']},
+                                          basic_skills=self.skills)
+
+    def _dispatch(self, transcript):
+        self.input_engine.recognize_input.return_value = transcript
+        self.controller.get_transcript()
+        self.controller.get_skills()
+        dispatched = self._to_execute()
+        self.controller.execute()
+        return dispatched
+
+    def _to_execute(self):
+        return [(to_execute['voice_transcript'], to_execute['skill']) for to_execute in self.controller.to_execute]
+
+    def test_single_intent(self):
+        self.assertEqual(self._dispatch('what time is it'), [('what time is it', self.skills['tell_time'])])
+        self.skills['tell_time']['skill'].assert_called_once_with(voice_transcript='what time is it',
+                                                                  skill=self.skills['tell_time'])
+        self.assertEqual(self.controller.to_execute, [])
+
+    def test_multi_intent(self):
+        dispatched = self._dispatch('open youtube and then tell me the weather in london')
+        self.assertEqual(dispatched, [('open youtube', self.skills['open_site_in_browser']),
+                                      ('tell me the weather in london', self.skills['tells_the_weather'])])
+        self.skills['open_site_in_browser']['skill'].assert_called_once_with(
+            voice_transcript='open youtube', skill=self.skills['open_site_in_browser'])
+        self.skills['tells_the_weather']['skill'].assert_called_once_with(
+            voice_transcript='tell me the weather in london', skill=self.skills['tells_the_weather'])
+
+    def test_false_split(self):
+        # 'the war of the worlds' matches 'spell the word' only by the stop words
+        transcript = 'tell me about the time machine and then the war of the worlds'
+        self.assertEqual(self._dispatch(transcript), [(transcript, self.skills['tell_about'])])
+        self.skills['spell_a_word']['skill'].assert_not_called()
+
+    def test_fuzzy_segment_not_split(self):
+        # The segments are split only by word matches, 'white' sounds like 'what' and
+        # 'temprature' is spelled like 'temperature'
+        for transcript in ('tell me about black and white', 'tell me about black and temprature'):
+            self.assertEqual(self._dispatch(transcript), [(transcript, self.skills['tell_about'])])
+        self.skills['tells_the_weather']['skill'].assert_not_called()
+
+    def test_no_intent(self):
+        self.assertEqual(self._dispatch('nothing to match here'), [])
+
+    def test_best_alternative(self):
+        self.input_engine = mock.Mock(spec=['recognize_input', 'recognize_alternatives'])
+        self.input_engine.recognize_alternatives.return_value = [
+            {'transcript': 'dime please', 'confidence': 0.6},
+            {'transcript': 'time please', 'confidence': 0.3},
+        ]
+        self.controller.input_engine = self.input_engine
+        self.controller.get_transcript()
+        self.controller.get_skills()
+        self.assertEqual(self._to_execute(), [('time please', self.skills['tell_time'])])
+        self.input_engine.recognize_input.assert_not_called()
+
+    def test_engine_without_alternatives(self):
+        with mock.patch.object(SkillAnalyzer, 'extract_best') as extract_best:
+            self.assertEqual(self._dispatch('what time is it'), [('what time is it', self.skills['tell_time'])])
+        extract_best.assert_not_called()
+        self.assertEqual(self.controller.latest_alternatives, [])
+
+
+class SkillRegistrationTests(unittest.TestCase):
+
+    joke = {'enable': True, 'skill': mock.Mock(name='tell_a_joke'), 'tags': {'joke', 'tell me a joke'}}
+
+    def setUp(self):
+        self.skills = create_skills()
+        weight_measure, similarity_measure = inverted_index_backend()
+        self.analyzer = SkillAnalyzer(weight_measure, similarity_measure,
+                                      args={'stop_words': None, 'lowercase': True, 'norm': 'l1', 'use_idf': False},
+                                      skills_=dict(self.skills), sensitivity=0.2)
+        self.controller = SkillController(settings_={'user_voice_input': True, 'enable_period': 60},
+                                          input_engine=mock.Mock(spec=['recognize_input']),
+                                          analyzer=self.analyzer,
+                                          control_skills={'enable_assistant': self.skills['enable_assistant']},
+                                          basic_skills=self.skills)
+
+    def _skills_of(self, transcript):
+        self.controller.latest_voice_transcript = transcript
+        self.controller.get_skills()
+        return [to_execute['skill'] for to_execute in self.controller.to_execute]
+
+    def test_register_enable_disable(self):
+        self.assertEqual(self._skills_of('tell me a joke'), [])
+
+        self.controller.register_skill('tell_a_joke', dict(self.joke))
+        self.assertIn('tell_a_joke', self.analyzer.index.skill_keys)
+        self.assertEqual(self._skills_of('tell me a joke'), [self.skills['tell_a_joke']])
+
+        self.controller.disable_skill('tell_a_joke')
+        self.assertFalse(self.skills['tell_a_joke']['enable'])
+        self.assertNotIn('tell_a_joke', self.analyzer.index.skill_keys)
+        self.assertEqual(self._skills_of('tell me a joke'), [])
+
+        self.controller.enable_skill('tell_a_joke')
+        self.assertTrue(self.skills['tell_a_joke']['enable'])
+        self.assertEqual(self._skills_of('tell me a joke'), [self.skills['tell_a_joke']])
+        # The other skills are still routed
+        self.assertEqual(self._skills_of('what time is it'), [self.skills['tell_time']])
+
+    def test_register_disabled(self):
+        self.controller.register_skill('tell_a_joke', dict(self.joke, enable=False))
+        self.assertIn('tell_a_joke', self.skills)
+        self.assertNotIn('tell_a_joke', self.analyzer.index.skill_keys)
+        self.assertEqual(self._skills_of('tell me a joke'), [])
+
+    def test_unknown_skill(self):
+        skill_keys = self.analyzer.index.skill_keys
+        with self.assertRaises(KeyError):
+            self.controller.enable_skill('unknown')
+        with self.assertRaises(KeyError):
+            self.controller.disable_skill('unknown')
+        self.assertEqual(self.analyzer.index.skill_keys, skill_keys)
+
+    def test_concurrent_registration(self):
+        done = threading.Event()
+        errors = []
+
+        def update():
+            try:
+                for _ in range(100):
+                    self.controller.register_skill('tell_a_joke', dict(self.joke))
+                    self.controller.disable_skill('tell_a_joke')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        updater = threading.Thread(target=update)
+        updater.start()
+        try:
+            while not done.is_set():
+                index = self.analyzer.index
+                self.assertEqual(len(index.skill_keys), index.skill_matrix.shape[0])
+                self.assertEqual(set(index.skill_keys), set(index.skills))
+                self.assertEqual(self._skills_of('what time is it'), [self.skills['tell_time']])
+                joke_skills = [skill['skill'] for skill in self._skills_of('tell me a joke')]
+                self.assertIn(joke_skills, ([], [self.joke['skill']]))
+        finally:
+            updater.join()
+        self.assertEqual(errors, [])
+        self.assertNotIn('tell_a_joke', self.analyzer.index.skill_keys)
@@ -0,0 +1,186 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import os
+import sys
+import wave
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from jarvis.settings import SPEECH_RECOGNITION, KALDI_SERVE
+from jarvis.engines.file_stt import STTFileEngine
+from jarvis.engines.stt import STTVernacularEngine
+
+from vernacular.vernacular import KaldiServeClient
+from vernacular.fake_server import FakeKaldiServeServicer, serve
+
+SAMPLE_RATE = SPEECH_RECOGNITION['sample_rate']
+
+
+def create_pcm(seconds, seed=0, rate=SAMPLE_RATE, channels=1):
+    rand = np.random.RandomState(seed)
+    return rand.randint(-3000, 3000, int(rate * seconds) * channels).astype(np.int16).tobytes()
+
+
+def write_wav(path, data, rate=SAMPLE_RATE, channels=1):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(data)
+
+
+class STTFileEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.servicer = FakeKaldiServeServicer(transcript=None)
+        self.server, port = serve(self.servicer)
+        self.url = 'localhost:{0}'.format(port)
+        self.client = KaldiServeClient(self.url, deadline=10, reconnect_attempts=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop(None)
+        shutil.rmtree(self.directory)
+
+    def _engine(self, inputs, concurrency=2):
+        return STTFileEngine(inputs=inputs, concurrency=concurrency, chunk_size=4000, client=self.client)
+
+    def _path(self, *names):
+        path = os.path.join(self.directory, *names)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def test_files_and_directories(self):
+        transcripts = ['open youtube', 'what time is it', 'tell me a joke']
+        paths = [self._path('calls', 'b', '1.wav'), self._path('calls', 'a.raw'), self._path('single.wav')]
+        for i, (path, transcript) in enumerate(zip(paths, transcripts)):
+            pcm = create_pcm(1 + i, seed=i)
+            self.servicer.add_transcript([pcm], transcript)
+            if path.endswith('.wav'):
+                write_wav(path, pcm)
+            else:
+                with open(path, 'wb') as f:
+                    f.write(pcm)
+        with open(self._path('calls', 'notes.txt'), 'w') as f:
+            f.write('not audio')
+
+        engine = self._engine([self._path('calls'), self._path('single.wav')])
+        results = list(engine.transcribe())
+
+        # The directories are expanded in sorted order
+        self.assertEqual([result['source'] for result in results], [paths[1], paths[0], paths[2]])
+        self.assertEqual([result['transcript'] for result in results],
+                         ['what time is it', 'open youtube', 'tell me a joke'])
+        self.assertEqual([result['audio_seconds'] for result in results], [2, 1, 3])
+        self.assertEqual(engine.last_report['files'], 3)
+        self.assertEqual(engine.last_report['errors'], 0)
+        self.assertEqual(engine.last_report['audio_seconds'], 6)
+        self.assertGreater(engine.last_report['throughput'], 1)
+        self.assertEqual(engine.last_report['latency_max'], max(result['seconds'] for result in results))
+
+    def test_one_input_per_call(self):
+        pcm = create_pcm(1)
+        self.servicer.add_transcript([pcm], 'open youtube')
+        write_wav(self._path('a.wav'), pcm)
+        write_wav(self._path('b.wav'), create_pcm(1, seed=1))
+
+        engine = self._engine([self.directory])
+        self.assertEqual(engine.recognize_input(), 'open youtube')
+        self.assertEqual(engine.recognize_input(), '')  # No transcript of b.wav
+        self.assertEqual(engine.recognize_alternatives(), [])
+        self.assertEqual(len(self.servicer.requests), SAMPLE_RATE // 4000)  # Of b.wav, in 4000 samples chunks
+
+    def test_stdin(self):
+        pcm = create_pcm(0.5)
+        self.servicer.add_transcript([pcm], 'open youtube')
+        stdin = mock.Mock(buffer=io.BufferedReader(io.BytesIO(pcm)))
+        with mock.patch.object(sys, 'stdin', stdin):
+            result, = self._engine(['-']).transcribe()
+        self.assertEqual(result['transcript'], 'open youtube')
+
+    def test_resampled_wav(self):
+        self.servicer.transcript = 'hello world'
+        write_wav(self._path('stereo.wav'), create_pcm(2, rate=48000, channels=2), rate=48000, channels=2)
+        result, = self._engine([self._path('stereo.wav')]).transcribe()
+        self.assertEqual(result['transcript'], 'hello world')
+        self.assertAlmostEqual(result['audio_seconds'], 2, places=2)
+        self.assertEqual(self.servicer.configs[0].sample_rate_hertz, SAMPLE_RATE)
+
+    def test_errors(self):
+        with wave.open(self._path('8bit.wav'), 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(1)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(bytes(100))
+
+        engine = self._engine([self._path('8bit.wav'), self._path('missing.wav')])
+        results = list(engine.transcribe())
+        self.assertTrue(all(result['error'] for result in results))
+        self.assertEqual(engine.last_report['errors'], 2)
+
+    def test_bounded_concurrency(self):
+        self.servicer.latency = 0.2
+        for i in range(8):
+            write_wav(self._path('{0}.wav'.format(i)), create_pcm(0.1, seed=i))
+
+        engine = self._engine([self.directory], concurrency=4)
+        results = list(engine.transcribe())
+        self.assertEqual(len(results), 8)
+        # 2 rounds of 4 parallel streams
+        self.assertGreater(engine.last_report['wall_seconds'], 0.4)
+        self.assertLess(engine.last_report['wall_seconds'], 0.8)
+
+    def test_long_input_with_a_short_deadline(self):
+        self.servicer.transcript = 'hello world'
+        self.servicer.real_time_factor = 0.05  # 20 sec of audio --> 1 sec decode
+        write_wav(self._path('long.wav'), create_pcm(20))
+
+        with mock.patch.dict(KALDI_SERVE, {'backends': [self.url], 'deadline': 0.5, 'health_check_interval': 0}):
+            engine = STTFileEngine(inputs=[self._path('long.wav')], concurrency=1, chunk_size=4000)
+            self.addCleanup(engine.client.close)
+            result, = engine.transcribe()
+            self.assertEqual((result['transcript'], result['error']), ('hello world', None))
+
+            # The utterance deadline applies to every call of the microphone client
+            client = STTVernacularEngine._create_client()
+            self.addCleanup(client.close)
+            result, = STTFileEngine(inputs=[self._path('long.wav')], concurrency=1, client=client).transcribe()
+            self.assertIn('Deadline', result['error'])
+
+    def test_started_stream_is_not_replayed(self):
+        self.servicer.transcript = 'hello world'
+        self.servicer.fail_next(1)
+        write_wav(self._path('a.wav'), create_pcm(2))
+
+        with mock.patch.dict(KALDI_SERVE, {'backends': [self.url], 'backoff': 0, 'health_check_interval': 0}):
+            engine = STTFileEngine(inputs=[self._path('a.wav')], concurrency=1, chunk_size=4000)
+            self.addCleanup(engine.client.close)
+            result, = engine.transcribe()
+        self.assertIn('Injected failure', result['error'])
+        self.assertEqual(self.servicer.calls, 1)
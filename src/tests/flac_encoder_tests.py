@@ -0,0 +1,65 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import numpy as np
+
+from jarvis.engines import flac_encoder
+from jarvis.engines.flac_encoder import FlacChunkEncoder
+
+
+def decode(data):
+    blocks = []
+    decoder = flac_encoder.pyflac.StreamDecoder(
+        write_callback=lambda samples, sample_rate, channels, num_samples: blocks.append(samples))
+    decoder.process(data)
+    decoder.finish()
+    return np.concatenate(blocks)
+
+
+@unittest.skipIf(flac_encoder.pyflac is None, 'pyFLAC is not installed')
+class FlacChunkEncoderTests(unittest.TestCase):
+
+    def setUp(self):
+        t = np.arange(16000) / 8000.0
+        noise = np.random.RandomState(0).normal(0, 50, len(t))
+        self.samples = (3000 * np.sin(2 * np.pi * 300 * t) + noise).astype(np.int16)
+
+    def test_chunks_are_one_stream(self):
+        encoder = FlacChunkEncoder(8000, blocksize=1024)
+        pcm = memoryview(self.samples.tobytes())
+        parts = [encoder.encode(pcm[i:i + 1600]) for i in range(0, len(pcm), 1600)] + [encoder.finish()]
+
+        self.assertTrue(parts[0].startswith(b'fLaC'))
+        self.assertTrue(any(part == b'' for part in parts))  # Whole frames only
+        np.testing.assert_array_equal(decode(b''.join(parts)).ravel(), self.samples)
+
+    def test_report(self):
+        encoder = FlacChunkEncoder(8000)
+        encoded = len(encoder.encode(self.samples.tobytes())) + len(encoder.finish())
+
+        report = encoder.report()
+        self.assertEqual(report['pcm_bytes'], 32000)
+        self.assertEqual(report['encoded_bytes'], encoded)
+        self.assertGreater(report['compression_ratio'], 1.5)
+        self.assertGreaterEqual(report['encode_cpu_ms'], 0)
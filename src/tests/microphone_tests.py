@@ -0,0 +1,86 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from jarvis.engines.microphone import select_microphone, device_key, CalibrationProfiles, MicrophoneNotFoundError
+
+
+class SelectMicrophoneTests(unittest.TestCase):
+
+    names = ['HDA Intel PCH: ALC3246 Analog', 'USB PnP Sound Device: Audio', 'default']
+
+    def test_default_device(self):
+        self.assertEqual(select_microphone(self.names), (None, None))
+
+    def test_select_by_index(self):
+        self.assertEqual(select_microphone(self.names, 1), (1, 'USB PnP Sound Device: Audio'))
+        with self.assertRaises(MicrophoneNotFoundError):
+            select_microphone(self.names, 3)
+
+    def test_select_by_name(self):
+        self.assertEqual(select_microphone(self.names, 'usb pnp'), (1, 'USB PnP Sound Device: Audio'))
+        with self.assertRaises(MicrophoneNotFoundError):
+            select_microphone(self.names, 'webcam')
+
+    def test_device_key(self):
+        self.assertEqual(device_key(None, None), 'default')
+        self.assertEqual(device_key(1, 'USB PnP Sound Device: Audio'), 'USB PnP Sound Device: Audio')
+        self.assertEqual(device_key(2, None), 'device-2')
+
+
+class CalibrationProfilesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'jarvis', 'microphones.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        profiles = CalibrationProfiles(self.path)
+        self.assertIsNone(profiles.load('default'))
+
+        profiles.save('default', 350.5, 1.5)
+        profiles.save('USB PnP Sound Device: Audio', 900, 2)
+
+        profile = CalibrationProfiles(self.path).load('default')
+        self.assertEqual(profile['energy_threshold'], 350.5)
+        self.assertEqual(profile['dynamic_energy_ratio'], 1.5)
+        self.assertEqual(CalibrationProfiles(self.path).load('USB PnP Sound Device: Audio')['energy_threshold'], 900)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['microphones.json'])
+
+    def test_corrupted_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{"default": ')
+
+        profiles = CalibrationProfiles(self.path)
+        self.assertIsNone(profiles.load('default'))
+        profiles.save('default', 400, 1.5)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['default']['energy_threshold'], 400)
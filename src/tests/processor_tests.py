@@ -0,0 +1,55 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+from unittest import mock
+
+from jarvis.core.processor import Processor
+from jarvis.engines.audio_capture import AudioCaptureError
+
+
+class WakeWordLoopTests(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = Processor.__new__(Processor)  # Without the engines
+        self.processor.input_engine = mock.Mock(spec=['wait_for_wake_word', 'capture'])
+        self.processor._process = mock.Mock()
+        self.processor.capture_retry_delay = 0
+
+    def _run(self, *wake_words):
+        # The loop runs until the interruption
+        self.processor.input_engine.wait_for_wake_word.side_effect = list(wake_words) + [KeyboardInterrupt]
+        with self.assertRaises(KeyboardInterrupt):
+            self.processor._wake_word_loop()
+
+    def test_capture_error(self):
+        self._run(True, AudioCaptureError('Unable to read from the audio input device'), True)
+
+        self.processor.input_engine.capture.close.assert_called_once_with()
+        self.assertEqual(self.processor._process.call_count, 2)
+
+    def test_processing_error(self):
+        self.processor._process.side_effect = [RuntimeError('Recognition failed'), None]
+        self._run(True, False, True)
+
+        self.assertEqual(self.processor._process.call_count, 2)
+        self.processor.input_engine.capture.close.assert_not_called()
@@ -0,0 +1,72 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import numpy as np
+
+from jarvis.engines.resampler import PolyphaseResampler
+
+
+def create_tone(frequency, rate, seconds, channels=1, amplitude=10000):
+    t = np.arange(int(rate * seconds)) / float(rate)
+    tone = amplitude * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(tone[:, np.newaxis], channels, axis=1).astype(np.int16).tobytes()
+
+
+class PolyphaseResamplerTests(unittest.TestCase):
+
+    formats = [(48000, 2), (44100, 2), (44100, 1), (16000, 1)]
+
+    def test_chunked_equals_whole_stream(self):
+        for rate, channels in self.formats:
+            audio = create_tone(440, rate, 1, channels)
+            whole = PolyphaseResampler(rate, 8000, channels).process(audio)
+
+            resampler = PolyphaseResampler(rate, 8000, channels)
+            chunk_bytes = 1234 * channels * 2
+            chunked = b''.join(resampler.process(audio[i:i + chunk_bytes])
+                               for i in range(0, len(audio), chunk_bytes))
+
+            self.assertEqual(chunked, whole, (rate, channels))
+            self.assertEqual(len(whole), 8000 * 2)
+
+    def test_tone_is_kept(self):
+        for rate, channels in self.formats:
+            resampled = np.frombuffer(
+                PolyphaseResampler(rate, 8000, channels).process(create_tone(500, rate, 1, channels)), np.int16)
+            steady = resampled[1000:]
+            spectrum = np.abs(np.fft.rfft(steady))
+            self.assertAlmostEqual(np.argmax(spectrum) * 8000.0 / len(steady), 500, delta=2)
+            self.assertAlmostEqual(np.abs(steady).max(), 10000, delta=200)
+
+    def test_aliasing_is_rejected(self):
+        for rate, channels in self.formats:
+            resampled = np.frombuffer(
+                PolyphaseResampler(rate, 8000, channels).process(create_tone(5000, rate, 1, channels)), np.int16)
+            self.assertLess(np.abs(resampled[1000:]).max(), 100, (rate, channels))
+
+    def test_downmix(self):
+        left = create_tone(300, 16000, 0.5)
+        stereo = np.stack([np.frombuffer(left, np.int16), np.zeros(8000, np.int16)], axis=1).tobytes()
+        mono = np.frombuffer(PolyphaseResampler(16000, 8000, 2).process(stereo), np.int16)
+        self.assertAlmostEqual(np.abs(mono[500:]).max(), 5000, delta=100)
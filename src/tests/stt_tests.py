@@ -0,0 +1,84 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+from unittest import mock
+
+from jarvis.settings import SPEECH_RECOGNITION
+from jarvis.engines.stt import STTVernacularEngine
+
+from vernacular.vernacular import KaldiServeClient
+from vernacular.fake_server import FakeKaldiServeServicer, serve
+
+
+class STTVernacularEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.servicer = FakeKaldiServeServicer(transcript='what time is it')
+        self.server, port = serve(self.servicer)
+        self.client = KaldiServeClient('localhost:{0}'.format(port), deadline=10, reconnect_attempts=0)
+        self.capture = mock.Mock()
+        patchers = [mock.patch.object(STTVernacularEngine, '_create_client', return_value=self.client),
+                    mock.patch.object(STTVernacularEngine, '_create_capture', return_value=self.capture)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop(None)
+
+    def test_requests_are_sent_while_capturing(self):
+        for config_once in (False, True):
+            received_during_capture = []
+
+            def utterance(*args):
+                yield memoryview(bytes(range(8)))
+                # The capture is not finished, the first chunk must have reached the server
+                received_during_capture.append(self.servicer.request_received.wait(timeout=5))
+                yield memoryview(bytes(range(8, 16)))
+
+            self.servicer.request_received.clear()
+            self.capture.utterance.side_effect = utterance
+            with mock.patch.dict(SPEECH_RECOGNITION, {'audio_format': 'raw', 'config_once': config_once}):
+                engine = STTVernacularEngine()
+                alternatives = engine.recognize_alternatives()
+
+            self.assertEqual(received_during_capture, [True], msg='config_once: {0}'.format(config_once))
+            self.assertEqual(alternatives[0]['transcript'], 'what time is it')
+            self.assertIsNotNone(engine.capture_end)
+
+    def test_capture_end_of_every_utterance(self):
+        self.capture.utterance.return_value = [memoryview(bytes(8))]
+        with mock.patch.dict(SPEECH_RECOGNITION, {'audio_format': 'raw', 'config_once': False}):
+            engine = STTVernacularEngine()
+            engine.recognize_alternatives()
+            first_capture_end = engine.capture_end
+
+            # The response came before the end of the stream (e.g. a server error), there's no capture end
+            with mock.patch.object(self.client, 'streaming_recognize_raw', return_value={}), \
+                    self.assertLogs(level='DEBUG') as logs:
+                engine.recognize_alternatives()
+
+        self.assertIsNotNone(first_capture_end)
+        self.assertIsNone(engine.capture_end)
+        self.assertFalse(any('after the end of the capture' in line for line in logs.output))
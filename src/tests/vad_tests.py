@@ -0,0 +1,102 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import numpy as np
+
+from jarvis.engines.vad import VoiceActivityDetector, Endpointer
+
+SAMPLE_RATE = 8000
+
+
+def create_audio(*segments):
+    """
+    Create 16 bit PCM of (kind, seconds) segments, kind: 'silence', 'tone' or 'hiss'.
+    """
+    rand = np.random.RandomState(0)
+    samples = []
+    for kind, seconds in segments:
+        n = int(SAMPLE_RATE * seconds)
+        if kind == 'tone':
+            samples.append(3000 * np.sin(2 * np.pi * 300 * np.arange(n) / SAMPLE_RATE))
+        elif kind == 'hiss':
+            samples.append(rand.uniform(-300, 300, n))
+        else:
+            samples.append(rand.uniform(-20, 20, n))
+    return np.concatenate(samples).astype(np.int16).tobytes()
+
+
+def feed(endpointer, audio, chunk_bytes=1600):
+    """
+    Feed the audio to the endpointer chunk by chunk, as the capture service does.
+    :return: (bytes sent, bytes captured)
+    """
+    endpointer.reset()
+    data = memoryview(audio)
+    sent = b''
+    captured = 0
+    while captured < len(audio) and not endpointer.done:
+        captured = min(captured + chunk_bytes, len(audio))
+        sent += bytes(endpointer.process(data[:captured]))
+    if not endpointer.done:
+        sent += bytes(endpointer.finish(data[:captured]))
+    return sent, captured
+
+
+class VoiceActivityDetectorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.vad = VoiceActivityDetector(SAMPLE_RATE, frame_ms=20)
+
+    def test_is_speech(self):
+        speech = self.vad.is_speech(create_audio(('silence', 0.2), ('tone', 0.2), ('hiss', 0.2)))
+        self.assertEqual(len(speech), 30)
+        self.assertFalse(speech[:10].any())
+        self.assertTrue(speech[10:].all())
+
+    def test_incomplete_frame(self):
+        self.assertEqual(len(self.vad.is_speech(create_audio(('tone', 0.03)))), 1)
+
+
+class EndpointerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.endpointer = Endpointer(VoiceActivityDetector(SAMPLE_RATE, frame_ms=20),
+                                     trailing_silence=0.6, padding=0.2, no_speech_timeout=2)
+
+    def test_trims_silence(self):
+        audio = create_audio(('silence', 1), ('tone', 0.5), ('silence', 0.3), ('tone', 0.5), ('silence', 2))
+        sent, captured = feed(self.endpointer, audio)
+        self.assertEqual(sent, audio[int(0.8 * SAMPLE_RATE) * 2: int(2.5 * SAMPLE_RATE) * 2])
+        self.assertLess(captured, len(audio))
+        self.assertAlmostEqual(self.endpointer.report(memoryview(audio)[:captured])['sent_seconds'], 1.7)
+
+    def test_no_speech(self):
+        sent, captured = feed(self.endpointer, create_audio(('silence', 3)))
+        self.assertEqual(sent, b'')
+        self.assertEqual(captured, 2 * SAMPLE_RATE * 2)  # The timeout, 2 seconds of 16 bit samples
+
+    def test_max_length(self):
+        audio = create_audio(('silence', 0.1), ('tone', 1))
+        sent, captured = feed(self.endpointer, audio)
+        self.assertEqual(sent, audio)
@@ -0,0 +1,409 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import unittest
+import threading
+
+import grpc
+
+from vernacular.vernacular import KaldiServeClient, _ReplayableRequests
+from vernacular.vernacular_pb2 import RecognitionConfig, RecognitionAudio, RecognizeRequest
+from vernacular.fake_server import FakeKaldiServeServicer, serve, audio_fingerprint
+
+
+class StreamingRecognizeTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servicer = FakeKaldiServeServicer(transcript='what time is it')
+        cls.server, port = serve(cls.servicer)
+        cls.url = 'localhost:{0}'.format(port)
+        cls.client = KaldiServeClient(cls.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.stop(None)
+
+    def setUp(self):
+        self.servicer.request_received.clear()
+
+    def test_requests_are_sent_lazily(self):
+        received_during_capture = []
+
+        def audio_params():
+            config = RecognitionConfig(sample_rate_hertz=8000, raw=True, data_bytes=4)
+            yield config, RecognitionAudio(content=b'\x00\x01\x02\x03')
+            # The capture is not finished, the first chunk must have reached the server
+            received_during_capture.append(self.servicer.request_received.wait(timeout=5))
+            yield config, RecognitionAudio(content=b'\x04\x05\x06\x07')
+
+        response = self.client.streaming_recognize_raw(audio_params(), uuid='', timeout=10)
+
+        self.assertEqual(received_during_capture, [True])
+        self.assertEqual(len(self.servicer.requests), 2)
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'what time is it')
+
+    def test_config_once(self):
+        config = RecognitionConfig(sample_rate_hertz=8000, model='eng', raw=True)
+        chunks = [RecognitionAudio(content=bytes([i] * 4)) for i in range(3)]
+
+        response = self.client.streaming_recognize(config, chunks, uuid='utterance', timeout=10, config_once=True)
+
+        requests = [request for _, request in self.servicer.requests]
+        self.assertEqual([request.HasField('config') for request in requests], [True, False, False])
+        self.assertEqual(requests[0].uuid, 'utterance')
+        self.assertEqual([c.SerializeToString() for c in self.servicer.configs], [config.SerializeToString()] * 3)
+        self.assertEqual([request.audio.content for request in requests], [chunk.content for chunk in chunks])
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'what time is it')
+
+    def test_last_stream_report(self):
+        config = RecognitionConfig(raw=True)
+        audio = [RecognitionAudio(content=bytes(100))] * 3
+        self.client.streaming_recognize(config, audio, uuid='', config_once=True)
+
+        requests = [request for _, request in self.servicer.requests]
+        self.assertEqual(self.client.last_stream, {
+            'requests': 3, 'wire_bytes': sum(request.ByteSize() for request in requests)})
+
+    def test_bounded_replay(self):
+        client = KaldiServeClient(self.url, backoff=0, health_check_interval=0, max_replay_requests=2)
+        self.addCleanup(client.close)
+        config = RecognitionConfig(raw=True)
+        calls = self.servicer.calls
+
+        self.servicer.fail_next(1)
+        response = client.streaming_recognize(config, [RecognitionAudio(content=bytes(10))] * 2, uuid='')
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'what time is it')
+        self.assertEqual(self.servicer.calls - calls, 2)  # Replayed
+
+        self.servicer.fail_next(1)
+        with self.assertRaises(grpc.RpcError) as error:
+            client.streaming_recognize(config, [RecognitionAudio(content=bytes(10))] * 3, uuid='')
+        self.assertEqual(error.exception.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(self.servicer.calls - calls, 3)  # Not replayed
+        self.assertEqual(client.last_stream['requests'], 3)
+
+    def test_first_request_without_config(self):
+        with self.assertRaises(grpc.RpcError) as error:
+            self.client.streaming_recognize_raw([(None, RecognitionAudio(content=b'\x00\x01'))], uuid='', timeout=10)
+        self.assertEqual(error.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+
+class ChannelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.servicer = FakeKaldiServeServicer()
+        self.server, self.port = serve(self.servicer)
+        self.client = KaldiServeClient('localhost:{0}'.format(self.port), ready_timeout=5, deadline=10,
+                                       reconnect_attempts=5, backoff=0.05)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop(None)
+
+    def _recognize(self):
+        audio = [RecognitionAudio(content=b'\x00\x01')]
+        return self.client.streaming_recognize(RecognitionConfig(raw=True), audio, uuid='')
+
+    def test_ready_on_startup(self):
+        self.assertEqual(self.client.backends[0].channel.state, grpc.ChannelConnectivity.READY)
+        self.assertEqual(self.client.backends[0].channel.state_transitions[('CONNECTING', 'READY')], 1)
+
+    def test_not_ready(self):
+        server, port = serve(FakeKaldiServeServicer())
+        server.stop(None).wait()
+        client = KaldiServeClient('localhost:{0}'.format(port), ready_timeout=0.2)
+        self.assertFalse(client.backends[0].channel.wait_ready())
+        client.close()
+
+    def test_reconnect_after_server_restart(self):
+        self._recognize()
+        self.server.stop(None).wait()
+        self.server, _ = serve(self.servicer, self.port)
+
+        response = self._recognize()
+
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'hello world')
+        self.assertGreaterEqual(sum(self.client.backends[0].channel.state_transitions.values()), 2)
+
+    def test_replay_after_unavailable(self):
+        self.server.stop(None).wait()
+        threading.Timer(0.3, lambda: setattr(self, 'server', serve(self.servicer, self.port)[0])).start()
+
+        response = self._recognize()
+
+        self.assertEqual(response.results[0].alternatives[0].transcript, 'hello world')
+        self.assertGreater(self.client.backends[0].channel.reconnects, 0)
+        self.assertEqual(len(self.servicer.requests), 1)
+
+
+class GatedServicer(FakeKaldiServeServicer):
+    """
+    Holds every stream open until the gate is set.
+    """
+
+    def __init__(self, gate, transcript):
+        super().__init__(transcript)
+        self.gate = gate
+
+    def StreamingRecognize(self, request_iterator, context):
+        response = super().StreamingRecognize(request_iterator, context)
+        self.gate.wait(10)
+        return response
+
+
+class BalancingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.gate = threading.Event()
+        self.servers, self.urls = [], []
+        for i in range(3):
+            server, port = serve(GatedServicer(self.gate, transcript='backend {0}'.format(i)))
+            self.servers.append(server)
+            self.urls.append('localhost:{0}'.format(port))
+
+    def tearDown(self):
+        self.gate.set()
+        for server in self.servers:
+            server.stop(None)
+
+    def _create_client(self, **kwargs):
+        return KaldiServeClient(self.urls, deadline=10, backoff=0.05, **kwargs)
+
+    def _recognize(self, client):
+        audio = [RecognitionAudio(content=b'\x00\x01')]
+        return client.streaming_recognize(RecognitionConfig(raw=True), audio, uuid='')
+
+    @staticmethod
+    def _wait_until(condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_least_outstanding_requests(self):
+        client = self._create_client(health_check_interval=0)
+        threads = [threading.Thread(target=self._recognize, args=(client,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self._wait_until(lambda: sum(backend.outstanding for backend in client.backends) == 3)
+
+        self.assertEqual([backend.outstanding for backend in client.backends], [1, 1, 1])
+
+        self.gate.set()
+        for thread in threads:
+            thread.join()
+        stats = client.stats()
+        self.assertEqual([stats[url]['requests'] for url in self.urls], [1, 1, 1])
+        self.assertTrue(all(stats[url]['latency_p95'] > 0 for url in self.urls))
+        client.close()
+
+    def test_latency_since_the_end_of_the_stream(self):
+        self.gate.set()
+        client = self._create_client(health_check_interval=0)
+
+        def microphone():
+            for _ in range(3):
+                yield RecognitionAudio(content=b'\x00\x01')
+                time.sleep(0.1)
+
+        start = time.perf_counter()
+        client.streaming_recognize(RecognitionConfig(raw=True), microphone(), uuid='')
+        self.assertGreater(time.perf_counter() - start, 0.3)
+
+        # The capture time is not the latency of the backend
+        latencies = [stats['latency_mean'] for stats in client.stats().values() if stats['latency_mean'] is not None]
+        self.assertEqual(len(latencies), 1)
+        self.assertLess(latencies[0], 0.1)
+        client.close()
+
+    def test_eject_failing_backend(self):
+        self.gate.set()
+        self.servers[0].stop(None).wait()
+        client = self._create_client(wait_ready=False, health_check_interval=0, eject_after_failures=1)
+
+        transcripts = [self._recognize(client).results[0].alternatives[0].transcript for _ in range(6)]
+
+        stats = client.stats()
+        self.assertNotIn('backend 0', transcripts)
+        self.assertTrue(stats[self.urls[0]]['ejected'])
+        self.assertEqual(stats[self.urls[0]]['errors'], 1)
+        self.assertEqual(stats[self.urls[1]]['requests'] + stats[self.urls[2]]['requests'], 6)
+        client.close()
+
+    def test_health_check_reinstates_backend(self):
+        self.gate.set()
+        port = int(self.urls[0].split(':')[1])
+        self.servers[0].stop(None).wait()
+        client = self._create_client(wait_ready=False, health_check_interval=0.1, eject_seconds=60)
+        self._wait_until(lambda: client.stats()[self.urls[0]]['ejected'])
+        self.assertTrue(client.stats()[self.urls[0]]['ejected'])
+
+        self.servers[0], _ = serve(GatedServicer(self.gate, transcript='backend 0'), port)
+        self._wait_until(lambda: not client.stats()[self.urls[0]]['ejected'])
+
+        self.assertFalse(client.stats()[self.urls[0]]['ejected'])
+        client.close()
+
+
+class MidStreamFailureServicer(FakeKaldiServeServicer):
+    """
+    Aborts the first stream of all the servicers that share `failed` with UNAVAILABLE,
+    after its first request (while the client waits for the next one).
+    """
+
+    def __init__(self, failed, transcript):
+        super().__init__(transcript)
+        self.failed = failed
+
+    def StreamingRecognize(self, request_iterator, context):
+        if not self.failed.is_set():
+            next(request_iterator)
+            time.sleep(0.05)
+            self.failed.set()
+            context.abort(grpc.StatusCode.UNAVAILABLE, 'Injected failure')
+        return super().StreamingRecognize(request_iterator, context)
+
+
+class FailoverTests(unittest.TestCase):
+
+    def setUp(self):
+        failed = threading.Event()
+        self.servicers = [MidStreamFailureServicer(failed, 'backend {0}'.format(i)) for i in range(2)]
+        self.servers, urls = [], []
+        for servicer in self.servicers:
+            server, port = serve(servicer)
+            self.servers.append(server)
+            urls.append('localhost:{0}'.format(port))
+        self.client = KaldiServeClient(urls, deadline=10, backoff=0.05, health_check_interval=0)
+
+    def tearDown(self):
+        self.client.close()
+        for server in self.servers:
+            server.stop(None)
+
+    def test_failover_of_a_slow_stream(self):
+        chunks = [bytes([i]) * 16 for i in range(4)]
+
+        def microphone():
+            for chunk in chunks:
+                yield RecognitionAudio(content=chunk)
+                time.sleep(0.2)
+
+        response = self.client.streaming_recognize(RecognitionConfig(raw=True), microphone(), uuid='')
+
+        transcript = response.results[0].alternatives[0].transcript
+        servicer = self.servicers[int(transcript.split()[-1])]
+        # The retry replays the first request and continues with the rest, in order
+        self.assertEqual([request.audio.content for _, request in servicer.requests], chunks)
+        self.assertEqual(self.client.last_stream['requests'], 4)
+        self.assertEqual(sum(servicer.calls for servicer in self.servicers), 1)
+
+    def test_stopped_call_reads_no_more_requests(self):
+        chunks = [RecognizeRequest(uuid=str(i)) for i in range(3)]
+        requests = _ReplayableRequests(chunks)
+        failed_call = requests()
+        self.assertEqual(next(failed_call), chunks[0])
+        requests.stop()
+
+        self.assertEqual(list(failed_call), [])
+        self.assertEqual(list(requests()), chunks)
+
+
+class FakeServerTests(unittest.TestCase):
+
+    pcm = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.servicer = FakeKaldiServeServicer(transcript=None, seed=0)
+        self.server, port = serve(self.servicer)
+        self.client = KaldiServeClient('localhost:{0}'.format(port), deadline=10, reconnect_attempts=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop(None)
+
+    def _recognize(self, chunks):
+        audio = [RecognitionAudio(content=chunk) for chunk in chunks]
+        return self.client.streaming_recognize(RecognitionConfig(sample_rate_hertz=8000, raw=True), audio, uuid='')
+
+    def test_canned_transcripts(self):
+        self.servicer.add_transcript([self.pcm], 'open youtube')
+        self.servicer.add_transcript([self.pcm[:512]], [('what time is it', 0.9), ('what time is in', 0.1)])
+
+        wav_chunks = [b'RIFF' + bytes(40) + self.pcm[:300], b'RIFF' + bytes(40) + self.pcm[300:]]
+        for chunks in ([self.pcm], [self.pcm[:100], self.pcm[100:]], wav_chunks):
+            response = self._recognize(chunks)
+            self.assertEqual(response.results[0].alternatives[0].transcript, 'open youtube')
+
+        alternatives = self._recognize([self.pcm[:512]]).results[0].alternatives
+        self.assertEqual([alternative.transcript for alternative in alternatives],
+                         ['what time is it', 'what time is in'])
+        self.assertEqual(len(self._recognize([b'unknown audio']).results), 0)
+
+    def test_concurrent_records(self):
+        chunks = {name: [name.encode() * 10] * 3 for name in ('a', 'b')}
+
+        def recognize(name):
+            def audio():
+                for chunk in chunks[name]:
+                    yield RecognitionAudio(content=chunk)
+                    time.sleep(0.05)  # The streams overlap
+            self.client.streaming_recognize(RecognitionConfig(sample_rate_hertz=8000, raw=True), audio(), uuid='')
+
+        threads = [threading.Thread(target=recognize, args=(name,)) for name in sorted(chunks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.servicer.records), 2)
+        recorded = sorted([request.audio.content for _, request in record.requests]
+                          for record in self.servicer.records)
+        self.assertEqual(recorded, [chunks['a'], chunks['b']])
+        self.assertEqual(len(self.servicer.requests), 3)
+
+    def test_fingerprint(self):
+        self.assertEqual(audio_fingerprint([self.pcm]), audio_fingerprint([self.pcm[:7], self.pcm[7:]]))
+        self.assertNotEqual(audio_fingerprint([self.pcm]), audio_fingerprint([self.pcm[1:]]))
+
+    def test_latency(self):
+        self.servicer.latency = 0.1
+        self.servicer.real_time_factor = 1
+        start = time.perf_counter()
+        self._recognize([bytes(1600)])  # 0.1 sec of audio
+
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+    def test_failure_injection(self):
+        self.servicer.fail_next(2, grpc.StatusCode.RESOURCE_EXHAUSTED)
+        for _ in range(2):
+            with self.assertRaises(grpc.RpcError) as error:
+                self._recognize([self.pcm])
+            self.assertEqual(error.exception.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+        self._recognize([self.pcm])
+
+        self.servicer.failure_rate = 1
+        with self.assertRaises(grpc.RpcError):
+            self._recognize([self.pcm])
+        self.assertEqual((self.servicer.calls, self.servicer.failures), (4, 3))
@@ -0,0 +1,150 @@
+# MIT License
+
+# Copyright (c) 2019 Georgios Papachristou
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import wave
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from jarvis.engines.wake_word import MfccExtractor, WakeWordDetector, subsequence_dtw
+
+SAMPLE_RATE = 16000
+
+
+def synthesize_word(formants, seconds=0.6, pitch=120, gain=1.0, seed=0):
+    """
+    A voiced "word": harmonics of the pitch, shaped by a gliding (F1, F2) formant trajectory.
+    """
+    n = int(SAMPLE_RATE * seconds)
+    t = np.arange(n) / float(SAMPLE_RATE)
+    f0 = pitch * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    position = np.linspace(0, len(formants) - 1, n)
+    f1 = np.interp(position, np.arange(len(formants)), [f for f, _ in formants])
+    f2 = np.interp(position, np.arange(len(formants)), [f for _, f in formants])
+    signal = sum((np.exp(-((k * f0 - f1) / 150.0) ** 2) + 0.6 * np.exp(-((k * f0 - f2) / 200.0) ** 2) + 0.02) *
+                 np.sin(k * phase) / np.sqrt(k) for k in range(1, 30))
+    envelope = np.sqrt(np.sin(np.pi * np.linspace(0, 1, n)))
+    noise = np.random.RandomState(seed).normal(0, 30, n)
+    return (4000 * gain * envelope * signal / np.abs(signal).max() + noise).astype(np.int16)
+
+
+def silence(seconds, seed=0):
+    return np.random.RandomState(seed).normal(0, 30, int(SAMPLE_RATE * seconds)).astype(np.int16)
+
+
+WAKE_WORD = [(700, 1200), (300, 2300), (500, 900)]
+OTHER_WORD = [(350, 800), (600, 1800)]
+
+
+class MfccExtractorTests(unittest.TestCase):
+
+    def test_features(self):
+        mfcc = MfccExtractor(SAMPLE_RATE)
+        features, rms = mfcc.features(synthesize_word(WAKE_WORD, seconds=0.5).astype(np.float32))
+        self.assertEqual(features.shape, (48, 12))
+        self.assertEqual(rms.shape, (48,))
+        self.assertTrue(np.all(np.isfinite(features)))
+
+    def test_gain_invariance(self):
+        mfcc = MfccExtractor(SAMPLE_RATE)
+        word = synthesize_word(WAKE_WORD, seed=1).astype(np.float32)
+        loud, loud_rms = mfcc.features(word)
+        quiet, quiet_rms = mfcc.features(word / 4)
+        np.testing.assert_allclose(loud_rms, 4 * quiet_rms, rtol=1e-4)
+        cosine = np.sum(loud * quiet, axis=1) / np.linalg.norm(loud, axis=1) / np.linalg.norm(quiet, axis=1)
+        self.assertGreater(np.median(cosine), 0.95)
+
+
+class SubsequenceDtwTests(unittest.TestCase):
+
+    def test_match_in_stream(self):
+        rand = np.random.RandomState(0)
+        template = rand.normal(size=(20, 12))
+        template /= np.linalg.norm(template, axis=1, keepdims=True)
+        noise = rand.normal(size=(30, 12))
+        noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+        stretched = np.repeat(template, [1, 2] * 10, axis=0)  # 1.5x slower
+
+        self.assertAlmostEqual(subsequence_dtw(template, np.concatenate((noise, stretched))), 0, places=5)
+        self.assertGreater(subsequence_dtw(template, noise), 0.5)
+        # The match has to end in the last columns
+        self.assertGreater(subsequence_dtw(template, np.concatenate((stretched, noise)), last_columns=5), 0.5)
+
+
+class WakeWordDetectorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = WakeWordDetector(SAMPLE_RATE, threshold=0.1)
+        for i in range(3):
+            self.detector.enroll(synthesize_word(WAKE_WORD, seconds=0.55 + 0.05 * i, pitch=110 + 10 * i,
+                                                 seed=i).tobytes())
+
+    def feed(self, samples, chunk_size=800):
+        data = samples.tobytes()
+        return sum(self.detector.process(data[i:i + 2 * chunk_size]) for i in range(0, len(data), 2 * chunk_size))
+
+    def test_enroll_trims_silence(self):
+        frames = len(self.detector.templates[0])
+        self.detector.enroll(np.concatenate((silence(1), synthesize_word(WAKE_WORD, seconds=0.55),
+                                             silence(1))).tobytes())
+        self.assertLessEqual(abs(len(self.detector.templates[-1]) - frames), 2)
+        with self.assertRaises(ValueError):
+            self.detector.enroll(silence(1).tobytes())
+
+    def test_wake_word(self):
+        for chunk_size in (800, 333, 4000):
+            self.detector.reset()
+            word = synthesize_word(WAKE_WORD, seconds=0.7, pitch=140, gain=0.5, seed=10)
+            self.assertEqual(self.feed(np.concatenate((silence(1), word, silence(1))), chunk_size), 1)
+
+    def test_other_word(self):
+        word = synthesize_word(OTHER_WORD, seconds=0.6, seed=11)
+        self.assertEqual(self.feed(np.concatenate((silence(1), word, silence(1)))), 0)
+        self.assertGreater(self.detector.last_distance, self.detector.threshold)
+
+    def test_silence_is_not_matched(self):
+        self.assertEqual(self.feed(silence(5)), 0)
+        self.assertEqual(self.detector.matchings, 0)
+        self.assertAlmostEqual(self.detector.report()['audio_seconds'], 5)
+
+    def test_no_templates(self):
+        with self.assertRaises(ValueError):
+            WakeWordDetector(SAMPLE_RATE).process(silence(1).tobytes())
+
+    def test_load_templates(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.assertRaises(ValueError):  # Empty directory
+            WakeWordDetector(SAMPLE_RATE).load_templates(directory)
+        with self.assertRaises(ValueError):  # Not enrolled yet
+            WakeWordDetector(SAMPLE_RATE).load_templates(os.path.join(directory, 'missing'))
+
+        with wave.open(os.path.join(directory, 'sample.wav'), 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(synthesize_word(WAKE_WORD).tobytes())
+        self.assertEqual(WakeWordDetector(SAMPLE_RATE).load_templates(directory), 1)